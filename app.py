@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session, g
+from flask import Flask, render_template, jsonify, request, redirect, url_for, session, g, abort
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -7,19 +7,29 @@ from functools import wraps
 import stripe
 import json
 import os
-import re
 from datetime import datetime
 from config import Config
-from models import db, User, ImmigrationForm, Subscription, EnterpriseSettings, FormTemplate, EmailLead
+from models import db, User, ImmigrationForm, Subscription, EnterpriseSettings, FormTemplate, EmailLead, extract_form_number
 from team_models import Team, TeamMembership
-from form_guides import get_form_guide
+from identity import load_identity, get_current_user, get_entitlements
+import entitlements
+import branding
+import catalog
+import search
+import page_cache
+import compression
+import assets
+import pdf_cache
+import filing_registry
 
 def create_app():
-    app = Flask(__name__)
+    app = Flask(__name__, template_folder=Config.TEMPLATE_FOLDER)
     app.config.from_object(Config)
 
     # Initialize extensions
     db.init_app(app)
+    compression.init_app(app)
+    assets.init_app(app)
 
     # CORS - properly configured based on environment
     if app.config['ENV'] == 'production':
@@ -96,72 +106,20 @@ except Exception as e:
 @app.before_request
 def load_branding():
     """Load branding settings into g object for templates"""
-    # Default branding
-    g.branding = {
-        'site_name': 'Immigration Templates',
-        'logo_url': None,
-        'primary_color': '#667eea',
-        'secondary_color': '#764ba2',
-        'footer_text': None,
-        'show_powered_by': True
-    }
+    g.branding = branding.DEFAULT_BRANDING
+
+    # Static files, health checks and JSON APIs never render templates
+    if branding.should_skip(request.path):
+        return
 
     # If database tables don't exist yet, skip branding customization
     try:
         # If user is logged in, load branding from their team owner (if in a team)
-        user = get_current_user()
-        if user:
-            # Check if user is part of a team
-            team_membership = TeamMembership.query.filter_by(
-                user_id=user.id,
-                status='active'
-            ).first()
-
-            if team_membership:
-                # Load branding from team owner
-                team = team_membership.team
-                team_owner = team.owner
-
-                # If team owner has enterprise settings, use those
-                if team_owner.subscription_tier == 'enterprise':
-                    settings = EnterpriseSettings.query.filter_by(user_id=team_owner.id).first()
-                    if settings:
-                        g.branding = {
-                            'site_name': settings.site_name,
-                            'logo_url': settings.logo_url,
-                            'primary_color': settings.primary_color,
-                            'secondary_color': settings.secondary_color,
-                            'footer_text': settings.footer_text,
-                            'show_powered_by': settings.show_powered_by
-                        }
-            elif user.subscription_tier == 'enterprise':
-                # User is not in a team but has business tier (they are the owner)
-                settings = EnterpriseSettings.query.filter_by(user_id=user.id).first()
-                if settings:
-                    g.branding = {
-                        'site_name': settings.site_name,
-                        'logo_url': settings.logo_url,
-                        'primary_color': settings.primary_color,
-                        'secondary_color': settings.secondary_color,
-                        'footer_text': settings.footer_text,
-                        'show_powered_by': settings.show_powered_by
-                    }
+        g.branding = branding.get_branding(session.get('clerk_user_id'), load_identity)
     except Exception:
         # Database tables don't exist yet or other DB error - use default branding
         pass
 
-# Helper function to get current user from Clerk session
-def get_current_user():
-    """Get current user from session"""
-    try:
-        clerk_user_id = session.get('clerk_user_id')
-        if clerk_user_id:
-            return User.query.filter_by(clerk_user_id=clerk_user_id).first()
-        return None
-    except Exception:
-        # Database tables don't exist yet
-        return None
-
 # Authentication decorator
 def login_required(f):
     @wraps(f)
@@ -180,11 +138,7 @@ def subscription_required(required_tier='basic'):
             if not user:
                 return jsonify({'error': 'Authentication required'}), 401
 
-            tier_hierarchy = {'free': 0, 'basic': 1, 'pro': 2, 'enterprise': 3}
-            user_tier_level = tier_hierarchy.get(user.subscription_tier, 0)
-            required_tier_level = tier_hierarchy.get(required_tier, 1)
-
-            if user_tier_level < required_tier_level or not user.has_active_subscription():
+            if not get_entitlements().can_access_level(required_tier):
                 return jsonify({
                     'error': 'Subscription required',
                     'required_tier': required_tier,
@@ -209,16 +163,19 @@ def health_check():
     })
 
 @app.route('/')
+@page_cache.cached_page
 def home():
     user = get_current_user()
     return render_template('home.html', user=user, config=Config)
 
 @app.route('/forms')
+@page_cache.cached_page
 def forms():
     user = get_current_user()
     return render_template('index.html', user=user, config=Config)
 
 @app.route('/pricing')
+@page_cache.cached_page
 def pricing():
     user = get_current_user()
     return render_template('pricing.html',
@@ -235,11 +192,13 @@ def signup():
     return render_template('auth.html', config=Config)
 
 @app.route('/privacy')
+@page_cache.cached_page
 def privacy_policy():
     user = get_current_user()
     return render_template('privacy.html', user=user, config=Config)
 
 @app.route('/terms')
+@page_cache.cached_page
 def terms_of_service():
     user = get_current_user()
     return render_template('terms.html', user=user, config=Config)
@@ -253,151 +212,56 @@ def dashboard():
 
 # ============== API ROUTES ==============
 
+def parse_list_query():
+    """Parse ?after=&limit=&category=&access_level=&q=&fields= (None if not a list request)"""
+    if not catalog.ListQuery.requested(request.args):
+        return None
+    try:
+        return catalog.ListQuery(request.args)
+    except ValueError:
+        abort(400)
+
 @app.route('/api/documents')
 def get_documents():
-    """Get all documents with access control"""
+    """Get all documents with access control
+
+    Without query parameters returns the full array; with any of after, limit,
+    category, access_level, q or fields returns one page:
+    {"items": [...], "next_after": <id or null>, "total": <matches>}
+    """
+    query = parse_list_query()
     try:
         user = get_current_user()
-
-        forms = ImmigrationForm.query.all()
-        documents = []
-
-        # Free trial forms - Full access without login
-        FREE_TRIAL_FORMS = ['I-130', 'I-485', 'N-400']
-
-        for form in forms:
-            form_dict = form.to_dict()
-
-            # Extract form number from title (e.g., "Form I-130 - Description" -> "I-130")
-            form_number_match = re.search(r'Form\s+([\w-]+)', form.title)
-            form_number = form_number_match.group(1) if form_number_match else ''
-
-            # Check if this is a free trial form
-            is_free_trial = form_number in FREE_TRIAL_FORMS
-
-            # Access control logic:
-            # 1. Free trial forms (I-130, I-485, N-400) - FULL access to everyone (no login needed)
-            # 2. Other free tier forms show PREVIEW to anonymous users, FULL to logged-in users
-            # 3. Paid tier forms require login AND appropriate subscription
-            if form.access_level == 'free':
-                if is_free_trial:
-                    # Anonymous users get FULL access to I-130, I-485, N-400
-                    form_dict['has_access'] = True
-                    form_dict['requires_login'] = False
-                    form_dict['is_preview'] = False
-                    form_dict['is_free_trial'] = True
-                elif user:
-                    # Logged in users get full access to all free forms
-                    form_dict['has_access'] = True
-                    form_dict['requires_login'] = False
-                    form_dict['is_preview'] = False
-                    form_dict['is_free_trial'] = False
-                else:
-                    # Anonymous users get preview (first 3 items) for other forms
-                    checklist = form.get_checklist()
-                    if checklist and len(checklist) > 3:
-                        form_dict['checklist'] = checklist[:3]  # Only first 3 items
-                        form_dict['checklist_total'] = len(checklist)
-                        form_dict['is_preview'] = True
-                    else:
-                        form_dict['checklist_total'] = len(checklist) if checklist else 0
-                        form_dict['is_preview'] = False
-                    form_dict['has_access'] = True  # Can still view modal
-                    form_dict['requires_login'] = True  # But needs login for full list
-                    form_dict['is_free_trial'] = False
-            elif user and user.can_access_form(form):
-                # User is logged in and has appropriate subscription
-                form_dict['has_access'] = True
-                form_dict['requires_login'] = False
-                form_dict['is_preview'] = False
-                form_dict['is_free_trial'] = False
-            elif user:
-                # User is logged in but needs to upgrade
-                form_dict['has_access'] = False
-                form_dict['requires_login'] = False
-                form_dict['requires_upgrade'] = True
-                form_dict['is_preview'] = False
-                form_dict['checklist'] = []  # Hide checklist
-                form_dict['is_free_trial'] = False
-            else:
-                # User not logged in - needs to sign up
-                form_dict['has_access'] = False
-                form_dict['requires_login'] = True
-                form_dict['is_preview'] = False
-                form_dict['checklist'] = []  # Hide checklist
-                form_dict['is_free_trial'] = False
-
-            form_dict['required_tier'] = form.access_level
-            documents.append(form_dict)
-
-        return jsonify(documents)
+        user_entitlements = get_entitlements() if user else None
+        snapshot = catalog.get_snapshot()
+        if query:
+            variant = snapshot.page(query, user_entitlements)
+        else:
+            variant = snapshot.variant(user_entitlements)
     except Exception as e:
         # Database not initialized yet
         return jsonify([])
 
+    return catalog.respond(variant, public=user is None)
+
 @app.route('/api/documents/<int:doc_id>')
 def get_document(doc_id):
     """Get single document with access control"""
     user = get_current_user()
-    form = ImmigrationForm.query.get_or_404(doc_id)
-
-    form_dict = form.to_dict()
-
-    # Free trial forms - Full access without login
-    FREE_TRIAL_FORMS = ['I-130', 'I-485', 'N-400']
-
-    # Extract form number from title (e.g., "Form I-130 - Description" -> "I-130")
-    form_number_match = re.search(r'Form\s+([\w-]+)', form.title)
-    form_number = form_number_match.group(1) if form_number_match else ''
-
-    is_free_trial = form_number in FREE_TRIAL_FORMS
-
-    # Access control - free forms show preview to anonymous, full to logged-in
-    if form.access_level == 'free':
-        if is_free_trial:
-            # Anonymous users get FULL access to I-130, I-485, N-400
-            form_dict['has_access'] = True
-            form_dict['requires_login'] = False
-            form_dict['is_preview'] = False
-            form_dict['is_free_trial'] = True
-        elif user:
-            # Logged in users get full access to all free forms
-            form_dict['has_access'] = True
-            form_dict['requires_login'] = False
-            form_dict['is_preview'] = False
-            form_dict['is_free_trial'] = False
-        else:
-            # Anonymous users get preview (first 3 items) for other free forms
-            checklist = form.get_checklist()
-            if checklist and len(checklist) > 3:
-                form_dict['checklist'] = checklist[:3]
-                form_dict['checklist_total'] = len(checklist)
-                form_dict['is_preview'] = True
-            else:
-                form_dict['checklist_total'] = len(checklist) if checklist else 0
-                form_dict['is_preview'] = False
-            form_dict['has_access'] = True
-            form_dict['requires_login'] = True
-            form_dict['is_free_trial'] = False
-    elif user and user.can_access_form(form):
-        # User has appropriate subscription
-        form_dict['has_access'] = True
-        form_dict['requires_login'] = False
-        form_dict['is_preview'] = False
-        form_dict['is_free_trial'] = False
-    else:
-        # Access denied
-        form_dict['has_access'] = False
-        form_dict['is_preview'] = False
-        form_dict['checklist'] = []
-        form_dict['is_free_trial'] = False
+    snapshot = catalog.get_snapshot()
+    entry = snapshot.by_id.get(doc_id)
+    if entry is None:
+        abort(404)
 
+    user_entitlements = get_entitlements() if user else None
+
+    if entry.access_level != 'free' and not (user and user_entitlements.can_access_level(entry.access_level)):
         if not user:
             # Not logged in
             return jsonify({
                 'error': 'Login required',
-                'message': f'Sign up for {form.access_level.title()} plan to access this form',
-                'required_tier': form.access_level,
+                'message': f'Sign up for {entry.access_level.title()} plan to access this form',
+                'required_tier': entry.access_level,
                 'requires_login': True,
                 'upgrade_url': '/pricing'
             }), 401
@@ -405,38 +269,71 @@ def get_document(doc_id):
             # Logged in but need to upgrade
             return jsonify({
                 'error': 'Subscription required',
-                'message': f'Upgrade to {form.access_level.title()} plan to access this form',
-                'required_tier': form.access_level,
+                'message': f'Upgrade to {entry.access_level.title()} plan to access this form',
+                'required_tier': entry.access_level,
                 'requires_upgrade': True,
                 'upgrade_url': '/pricing'
             }), 403
 
-    return jsonify(form_dict)
+    return jsonify(snapshot.form_dict(entry, user_entitlements))
 
 @app.route('/api/categories')
 def get_categories():
     """Get all unique categories"""
-    forms = ImmigrationForm.query.with_entities(ImmigrationForm.category).distinct().all()
-    categories = [f[0] for f in forms]
-    return jsonify(categories)
+    return catalog.respond(catalog.get_snapshot().categories(), public=True)
 
 @app.route('/api/form-guide/<int:form_id>')
 def get_form_guide_api(form_id):
     """Get step-by-step filling guide for a form"""
-    form = ImmigrationForm.query.get_or_404(form_id)
-    guide = get_form_guide(form.title)
+    snapshot = catalog.get_snapshot()
+    entry = snapshot.by_id.get(form_id)
+    if entry is None:
+        abort(404)
+
+    return catalog.respond(snapshot.guide(entry), public=True)
+
+@app.route('/api/form-guide/<int:form_id>/outline')
+def get_form_guide_outline(form_id):
+    """Get a filling guide with each part reduced to its title, for loading parts on demand"""
+    snapshot = catalog.get_snapshot()
+    entry = snapshot.by_id.get(form_id)
+    variant = snapshot.guide_outline(entry) if entry else None
+    if variant is None:
+        abort(404)
+
+    return catalog.respond(variant, public=True)
+
+@app.route('/api/form-guide/<int:form_id>/parts/<int:part_index>')
+def get_form_guide_part(form_id, part_index):
+    """Get one filling_steps part of a filling guide"""
+    snapshot = catalog.get_snapshot()
+    entry = snapshot.by_id.get(form_id)
+    variant = snapshot.guide_part(entry, part_index) if entry else None
+    if variant is None:
+        abort(404)
+
+    return catalog.respond(variant, public=True)
+
+@app.route('/api/search')
+@limiter.limit("120 per minute")
+def search_catalog():
+    """Ranked full-text search over forms, checklists, filling guides and templates
+
+    ?q=<text>&limit=<n>&type=form,guide,template - the last term matches as a
+    prefix, so this also serves autocomplete. Results are the same for every
+    user; access is enforced when the item itself is opened.
+    """
+    text = request.args.get('q', '')
+    doc_types = [t for t in request.args.get('type', '').split(',') if t]
+    if any(t not in search.DOC_TYPES for t in doc_types):
+        abort(400)
+    try:
+        limit = int(request.args.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        abort(400)
 
-    if guide:
-        return jsonify({
-            'available': True,
-            'form_title': form.title,
-            'guide': guide
-        })
-    else:
-        return jsonify({
-            'available': False,
-            'message': 'Filling guide not available for this form yet. Check back soon!'
-        })
+    results = search.search(text, limit, doc_types)
+    return catalog.respond(catalog.CatalogVariant({'query': text, 'results': results}), public=True)
 
 @app.route('/api/user/profile')
 @login_required
@@ -745,6 +642,7 @@ def sync_subscription():
             db.session.add(sub)
 
         db.session.commit()
+        branding.invalidate_all()
 
         return jsonify({
             'success': True,
@@ -797,7 +695,7 @@ def create_tool_checkout():
     user = get_current_user()
 
     # Check if user already has Complete Package or Agency tier (these include all tools)
-    if user.subscription_tier in ['complete', 'agency', 'basic', 'pro', 'enterprise'] and user.subscription_status == 'active':
+    if get_entitlements().includes_all_tools:
         return jsonify({
             'error': 'Tool already included in your subscription',
             'message': f'This tool is already included in your {user.subscription_tier.title()} subscription. No additional purchase needed!',
@@ -805,11 +703,13 @@ def create_tool_checkout():
         }), 400
 
     # Check if user already purchased this specific tool
-    existing_purchase = OneTimePurchase.query.filter_by(
-        user_id=user.id,
-        tool_type=tool_type,
-        status='completed'
-    ).first()
+    existing_purchase = None
+    if get_entitlements().has_purchased(tool_type):
+        existing_purchase = OneTimePurchase.query.filter_by(
+            user_id=user.id,
+            tool_type=tool_type,
+            status='completed'
+        ).first()
 
     if existing_purchase:
         return jsonify({
@@ -870,7 +770,7 @@ def get_purchased_tools():
     user = get_current_user()
 
     # If user has Complete Package or Agency, they have access to all tools
-    if user.subscription_tier in ['complete', 'agency', 'basic', 'pro', 'enterprise'] and user.subscription_status == 'active':
+    if get_entitlements().includes_all_tools:
         return jsonify({
             'has_all_tools': True,
             'via_subscription': user.subscription_tier,
@@ -1041,6 +941,7 @@ def handle_checkout_completed(session):
             )
             db.session.add(sub)
             db.session.commit()
+            branding.invalidate_all()
 
             print(f"[WEBHOOK SUCCESS] User {user.email} upgraded to {tier}!")
             print(f"  - New tier: {user.subscription_tier}")
@@ -1077,6 +978,7 @@ def handle_subscription_deleted(subscription):
             sub.ended_at = datetime.utcnow()
 
         db.session.commit()
+        branding.invalidate_all()
 
 
 # ============== ADMIN ROUTES ==============
@@ -1088,11 +990,14 @@ def admin_forms():
     user = get_current_user()
 
     # Simple admin check (you can enhance this)
-    if user.subscription_tier != 'enterprise':
+    if not get_entitlements().has(entitlements.ADMIN):
         return jsonify({'error': 'Admin access required'}), 403
 
     if request.method == 'POST':
         data = request.json
+        error = registry_fee_error(data, data.get('title'))
+        if error:
+            return jsonify({'error': error}), 400
         form = ImmigrationForm(
             title=data['title'],
             category=data['category'],
@@ -1112,6 +1017,8 @@ def admin_forms():
 
         db.session.add(form)
         db.session.commit()
+        catalog.invalidate()
+        warm_checklist_pdf(form)
 
         return jsonify(form.to_dict()), 201
 
@@ -1119,19 +1026,45 @@ def admin_forms():
         forms = ImmigrationForm.query.all()
         return jsonify([f.to_dict() for f in forms])
 
+def registry_fee_error(data, title, current_fee=None):
+    """Error for a fee edit on a form whose fee is set in the filing registry, else None
+
+    The catalog, cover letters and checklist PDFs quote registered fees from
+    the registry file, so a fee stored on the form would never be shown.
+    Sending the fee back unchanged (or equal to the registered one) is fine.
+    """
+    if data.get('fee') is None:
+        return None
+    form_number = extract_form_number(title or '')
+    registered = filing_registry.get_filings().fee(form_number)
+    if registered is None or data['fee'] in (registered, current_fee):
+        return None
+    return (f"The {form_number} fee ({registered}) comes from the filing registry; "
+            f"edit {os.path.basename(Config.FILING_REGISTRY_PATH)} to change it")
+
+def warm_checklist_pdf(form):
+    """Pre-render a form's checklist PDF after an admin edit (a failure only costs a later render)"""
+    try:
+        pdf_cache.warm_checklist(form)
+    except Exception as e:
+        app.logger.error(f"Failed to warm checklist PDF for form {form.id}: {str(e)}")
+
 @app.route('/api/admin/forms/<int:form_id>', methods=['PUT', 'DELETE'])
 @login_required
 def admin_form_detail(form_id):
     """Admin: Update or delete a form"""
     user = get_current_user()
 
-    if user.subscription_tier != 'enterprise':
+    if not get_entitlements().has(entitlements.ADMIN):
         return jsonify({'error': 'Admin access required'}), 403
 
     form = ImmigrationForm.query.get_or_404(form_id)
 
     if request.method == 'PUT':
         data = request.json
+        error = registry_fee_error(data, data.get('title', form.title), form.fee)
+        if error:
+            return jsonify({'error': error}), 400
 
         form.title = data.get('title', form.title)
         form.category = data.get('category', form.category)
@@ -1149,17 +1082,22 @@ def admin_form_detail(form_id):
             form.last_updated = datetime.strptime(data['last_updated'], '%Y-%m-%d').date()
 
         db.session.commit()
+        catalog.invalidate()
+        warm_checklist_pdf(form)
         return jsonify(form.to_dict())
 
     elif request.method == 'DELETE':
         db.session.delete(form)
         db.session.commit()
+        catalog.invalidate()
+        pdf_cache.purge_checklist(form_id)
         return jsonify({'success': True})
 
 
 # ============== FORM TEMPLATES ==============
 
 @app.route('/templates')
+@page_cache.cached_page
 def form_templates():
     """Browse fillable form templates"""
     user = get_current_user()
@@ -1167,29 +1105,16 @@ def form_templates():
 
 @app.route('/api/templates')
 def get_templates():
-    """Get all form templates with access control"""
+    """Get all form templates with access control (paginated like /api/documents)"""
+    query = parse_list_query()
     user = get_current_user()
-    templates = FormTemplate.query.all()
-
-    result = []
-    for template in templates:
-        template_dict = template.to_dict()
-
-        # Access control
-        if template.access_level == 'free':
-            template_dict['has_access'] = True
-        elif user and user.can_access_template(template):
-            template_dict['has_access'] = True
-        else:
-            template_dict['has_access'] = False
-            if not user:
-                template_dict['requires_login'] = True
-            else:
-                template_dict['requires_upgrade'] = True
-
-        result.append(template_dict)
-
-    return jsonify(result)
+    user_entitlements = get_entitlements() if user else None
+    snapshot = catalog.templates.get()
+    if query:
+        variant = snapshot.page(query, user_entitlements)
+    else:
+        variant = snapshot.variant(user_entitlements)
+    return catalog.respond(variant, public=user is None)
 
 @app.route('/templates/client-intake-family')
 def template_client_intake():
@@ -1216,7 +1141,7 @@ def template_evidence_index():
     user = get_current_user()
 
     # Basic tier required
-    if user.subscription_tier == 'free':
+    if not get_entitlements().has(entitlements.PAID_TIER):
         return redirect('/pricing')
 
     return render_template('form_evidence_index.html', user=user)
@@ -1228,8 +1153,7 @@ def template_retainer():
     user = get_current_user()
 
     # Agency tier required (professional/attorney tool)
-    allowed_tiers = ['agency', 'pro', 'enterprise']  # Include legacy tiers for backward compatibility
-    if user.subscription_tier not in allowed_tiers:
+    if not get_entitlements().has(entitlements.AGENCY_TEMPLATES):
         return redirect('/pricing')
 
     return render_template('form_retainer_agreement.html', user=user)
@@ -1241,8 +1165,7 @@ def template_employer_letter():
     user = get_current_user()
 
     # Agency tier required
-    allowed_tiers = ['agency', 'pro', 'enterprise']
-    if user.subscription_tier not in allowed_tiers:
+    if not get_entitlements().has(entitlements.AGENCY_TEMPLATES):
         return redirect('/pricing')
 
     return render_template('form_employer_letter.html', user=user)
@@ -1254,7 +1177,7 @@ def template_marriage_bona_fide():
     user = get_current_user()
 
     # Basic tier required
-    if user.subscription_tier == 'free':
+    if not get_entitlements().has(entitlements.PAID_TIER):
         return redirect('/pricing')
 
     return render_template('form_marriage_bona_fide.html', user=user)
@@ -1266,8 +1189,7 @@ def template_hardship_declaration():
     user = get_current_user()
 
     # Agency tier required
-    allowed_tiers = ['agency', 'pro', 'enterprise']
-    if user.subscription_tier not in allowed_tiers:
+    if not get_entitlements().has(entitlements.AGENCY_TEMPLATES):
         return redirect('/pricing')
 
     return render_template('form_hardship_declaration.html', user=user)
@@ -1279,8 +1201,7 @@ def template_rfe_response():
     user = get_current_user()
 
     # Agency tier required
-    allowed_tiers = ['agency', 'pro', 'enterprise']
-    if user.subscription_tier not in allowed_tiers:
+    if not get_entitlements().has(entitlements.AGENCY_TEMPLATES):
         return redirect('/pricing')
 
     return render_template('form_rfe_response.html', user=user)
@@ -1292,7 +1213,7 @@ def template_job_offer():
     user = get_current_user()
 
     # Basic tier required
-    if user.subscription_tier == 'free':
+    if not get_entitlements().has(entitlements.PAID_TIER):
         return redirect('/pricing')
 
     return render_template('form_job_offer_letter.html', user=user)
@@ -1304,7 +1225,7 @@ def template_spouse_affidavit():
     user = get_current_user()
 
     # Basic tier required
-    if user.subscription_tier == 'free':
+    if not get_entitlements().has(entitlements.PAID_TIER):
         return redirect('/pricing')
 
     return render_template('form_spouse_affidavit.html', user=user)
@@ -1316,8 +1237,7 @@ def template_hardship_worksheet():
     user = get_current_user()
 
     # Agency tier required (attorney tool)
-    allowed_tiers = ['agency', 'pro', 'enterprise']
-    if user.subscription_tier not in allowed_tiers:
+    if not get_entitlements().has(entitlements.AGENCY_TEMPLATES):
         return redirect('/pricing')
 
     return render_template('form_extreme_hardship_worksheet.html', user=user)
@@ -1329,7 +1249,7 @@ def template_immigration_history():
     user = get_current_user()
 
     # Basic tier required
-    if user.subscription_tier == 'free':
+    if not get_entitlements().has(entitlements.PAID_TIER):
         return redirect('/pricing')
 
     return render_template('form_immigration_history.html', user=user)
@@ -1347,8 +1267,7 @@ def template_client_intake_employment():
     user = get_current_user()
 
     # Agency tier required
-    allowed_tiers = ['agency', 'pro', 'enterprise']
-    if user.subscription_tier not in allowed_tiers:
+    if not get_entitlements().has(entitlements.AGENCY_TEMPLATES):
         return redirect('/pricing')
 
     return render_template('form_client_intake_employment.html', user=user)
@@ -1360,7 +1279,7 @@ def template_marriage_evidence():
     user = get_current_user()
 
     # Basic tier required
-    if user.subscription_tier == 'free':
+    if not get_entitlements().has(entitlements.PAID_TIER):
         return redirect('/pricing')
 
     return render_template('form_marriage_evidence.html', user=user)
@@ -1374,7 +1293,7 @@ def enterprise_settings_page():
     """Enterprise settings page"""
     user = get_current_user()
 
-    if user.subscription_tier != 'enterprise':
+    if not get_entitlements().has(entitlements.ADMIN):
         return redirect('/pricing')
 
     return render_template('enterprise_settings.html', user=user)
@@ -1385,7 +1304,7 @@ def enterprise_settings():
     """Get or update enterprise branding settings"""
     user = get_current_user()
 
-    if user.subscription_tier != 'enterprise':
+    if not get_entitlements().has(entitlements.ADMIN):
         return jsonify({'error': 'Enterprise subscription required'}), 403
 
     if request.method == 'GET':
@@ -1425,6 +1344,7 @@ def enterprise_settings():
             settings.custom_domain = data['custom_domain']
 
         db.session.commit()
+        branding.invalidate_all()
 
         return jsonify({
             'success': True,
@@ -0,0 +1,73 @@
+"""
+Fingerprinted static assets
+
+build_assets.py moves the inline <style>/<script> blocks of the built
+templates into content-hashed files under static/dist/ and records them in
+static/dist/manifest.json (logical name -> hashed path). Templates emit the
+URLs through the asset_url() Jinja global, and the hashed files are served
+with a one-year immutable Cache-Control since their names change whenever
+their content does.
+
+Without a manifest (development, source templates) asset_url() just points
+at the file under static/.
+"""
+import os
+import json
+import threading
+from flask import current_app, url_for, request
+from config import Config
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+
+class Manifest:
+    """Logical name -> hashed path map, reloaded when manifest.json changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+
+    def load(self, static_folder):
+        path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return {}
+        version = (path, mtime)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    with open(path, encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                    self._version = version
+        return self._entries
+
+
+manifest = Manifest()
+
+
+def asset_url(name):
+    """URL of a static asset, fingerprinted when the build manifest lists it"""
+    entries = manifest.load(current_app.static_folder)
+    return url_for('static', filename=entries.get(name, name))
+
+
+def is_fingerprinted(path):
+    """Check whether a request path is a hashed file under static/dist/"""
+    return path.startswith(f'/static/{DIST_DIR}/') and not path.endswith(MANIFEST_NAME)
+
+
+def init_app(app):
+    """Register asset_url() and immutable caching for fingerprinted files"""
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.after_request
+    def cache_fingerprinted_assets(response):
+        if response.status_code in (200, 304) and is_fingerprinted(request.path):
+            response.cache_control.public = True
+            response.cache_control.max_age = Config.ASSET_CACHE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+"""
+Performance measurements for the hot paths
+
+Runs against a throwaway in-memory SQLite database, so it is safe to run
+anywhere:
+    python benchmarks.py route-queries
+    python benchmarks.py search --scale 100
+    python benchmarks.py guides
+    python benchmarks.py page-bytes   (after python build_assets.py)
+    python benchmarks.py pdf
+    python benchmarks.py batch --items 200
+    python benchmarks.py i94
+    python benchmarks.py presence --years 30
+    python benchmarks.py fragments
+    python benchmarks.py branding
+    python benchmarks.py fills --pages 10 --fields 40
+"""
+import os
+import sys
+import time
+import argparse
+
+# Keep benchmarks off the real database
+os.environ['DATABASE_URL'] = os.getenv('BENCHMARK_DATABASE_URL', 'sqlite://')
+
+
+def seed_user(db, tier='complete', with_team=True, tools=('travel_history',)):
+    """Create a logged-in user with a team membership and purchases"""
+    from models import User, OneTimePurchase, ImmigrationForm
+    from team_models import Team, TeamMembership
+
+    user = User(
+        clerk_user_id='bench_user',
+        email='bench@example.com',
+        full_name='Bench User',
+        subscription_tier=tier,
+        subscription_status='active'
+    )
+    db.session.add(user)
+    db.session.flush()
+
+    if with_team:
+        team = Team(name='Bench Team', owner_id=user.id)
+        db.session.add(team)
+        db.session.flush()
+        db.session.add(TeamMembership(team_id=team.id, user_id=user.id, role='owner', status='active'))
+
+    for tool in tools:
+        db.session.add(OneTimePurchase(user_id=user.id, tool_type=tool, price_paid=0, status='completed'))
+
+    form = ImmigrationForm(title='Form I-130 - Petition for Alien Relative', category='Family-Based Immigration')
+    form.set_checklist(['Completed Form I-130', 'Filing fee', 'Proof of citizenship', 'Marriage certificate'])
+    db.session.add(form)
+    db.session.commit()
+    return user
+
+
+def route_queries(args):
+    """Count SQL statements issued per route for a logged-in user"""
+    from sqlalchemy import event
+    from app import app
+    from models import db
+
+    routes = [
+        '/', '/forms', '/pricing', '/dashboard',
+        '/api/documents', '/api/documents/1', '/api/templates',
+        '/api/user/profile', '/api/user/purchased-tools',
+        '/file-compressor', '/api/file-compressor/usage',
+        '/documents/passport', '/api/passport/applications',
+        '/documents/i94-history', '/api/team/my-teams', '/health',
+    ]
+
+    statements = []
+    with app.app_context():
+        db.create_all()
+        seed_user(db, tier=args.tier)
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *rest: statements.append(statement))
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['clerk_user_id'] = 'bench_user'
+
+    print(f"{'Route':40s} {'Status':>6s} {'Queries':>8s}")
+    print('-' * 56)
+    for route in routes:
+        statements.clear()
+        response = client.get(route)
+        print(f"{route:40s} {response.status_code:>6d} {len(statements):>8d}")
+        if args.verbose:
+            for statement in statements:
+                print(f"    {' '.join(statement.split())[:120]}")
+
+
+def seed_catalog(app, db, scale):
+    """Fill the catalog with scale copies of every form and template in init_db.py"""
+    from init_db import init_database
+    from models import ImmigrationForm, FormTemplate
+
+    init_database(app)
+    forms = ImmigrationForm.query.all()
+    if not FormTemplate.query.count():
+        for i, category in enumerate(['Client Intake', 'Retainer', 'Employment', 'Family']):
+            db.session.add(FormTemplate(title=f'{category} Template', category=category,
+                                        description=f'Fillable {category.lower()} template for attorneys',
+                                        use_case=category, access_level='free'))
+        db.session.flush()
+    templates = FormTemplate.query.all()
+
+    for copy in range(1, scale):
+        for form in forms:
+            clone = ImmigrationForm(
+                title=form.title.replace(' - ', f'-{copy} - ', 1),
+                category=form.category,
+                description=form.description,
+                access_level=form.access_level
+            )
+            clone.set_checklist(form.get_checklist())
+            db.session.add(clone)
+        for template in templates:
+            db.session.add(FormTemplate(title=f'{template.title} {copy}', category=template.category,
+                                        description=template.description, use_case=template.use_case,
+                                        access_level=template.access_level))
+    db.session.commit()
+    return ImmigrationForm.query.count(), FormTemplate.query.count()
+
+
+def search_latency(args):
+    """Time /api/search queries against a catalog scaled up from init_db.py"""
+    import search
+    from app import app
+    from models import db
+
+    queries = ['i-130', 'i-4', 'marriage certificate', 'natur', 'employment auth',
+               'birth certificate translation', 'fee', 'passport photo', 'sponsor income', 'intake']
+
+    with app.app_context():
+        db.create_all()
+        form_count, template_count = seed_catalog(app, db, args.scale)
+
+        start = time.perf_counter()
+        documents = search.rebuild()
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"Catalog: {form_count} forms, {template_count} templates -> {documents} documents "
+              f"indexed in {build_ms:.0f} ms ({db.engine.dialect.name})")
+
+        search.search(queries[0])  # Warm the catalog snapshots
+        print(f"\n{'Query':32s} {'Hits':>5s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        print('-' * 56)
+        worst = 0.0
+        for query in queries:
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                results = search.search(query)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p50, p95 = timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+            worst = max(worst, p95)
+            print(f"{query:32s} {len(results):>5d} {p50:>8.2f} {p95:>8.2f}")
+
+    status = 'OK' if worst < args.target_ms else 'SLOW'
+    print(f"\nWorst p95: {worst:.2f} ms (target < {args.target_ms:.0f} ms) {status}")
+    return 0 if worst < args.target_ms else 1
+
+
+def guide_loading(args):
+    """Time compiling the form guide registry at import and serving a guide per request"""
+    import subprocess
+    import form_guides
+    from app import app
+    from models import db
+    import catalog
+
+    def best_ms(func, runs):
+        best = float('inf')
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    compile_ms = best_ms(lambda: form_guides.compile_guides(form_guides.FORM_GUIDES), args.runs)
+    import_output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import form_guides'],
+        capture_output=True, text=True
+    ).stderr
+    # Self time only: json and hashlib are already imported by Flask in the app
+    import_us = [int(line.split(':')[1].split('|')[0]) for line in import_output.splitlines()
+                 if line.endswith('| form_guides')]
+
+    print(f"Guides: {len(form_guides.GUIDE_REGISTRY)}, "
+          f"{sum(len(guide.body) for guide in form_guides.GUIDE_REGISTRY.values())} bytes serialized")
+    print(f"compile_guides():            {compile_ms:8.3f} ms")
+    if import_us:
+        print(f"import form_guides (self):   {import_us[0] / 1000:8.3f} ms")
+
+    with app.app_context():
+        db.create_all()
+        seed_user(db)
+        snapshot = catalog.get_snapshot()
+        entry = snapshot.by_number['I-130']
+        guide = form_guides.FORM_GUIDES['I-130']
+
+        def serialize_per_request():
+            app.json.dumps({'available': True, 'form_title': entry.title, 'guide': guide})
+
+        def lookup_per_request():
+            catalog.get_snapshot().guide(entry).body
+
+        print(f"\n{'Per request (best of ' + str(args.runs) + ')':32s} {'us':>8s}")
+        print('-' * 42)
+        print(f"{'serialize FORM_GUIDES dict':32s} {best_ms(serialize_per_request, args.runs) * 1000:8.1f}")
+        print(f"{'precompiled snapshot body':32s} {best_ms(lookup_per_request, args.runs) * 1000:8.1f}")
+        print(f"{'one part (after first hit)':32s} "
+              f"{best_ms(lambda: snapshot.guide_part(entry, 0).body, args.runs) * 1000:8.1f}")
+
+
+def page_bytes(args):
+    """Compare HTML bytes per page for the source templates and build/templates"""
+    import gzip
+    from app import app
+    from models import db
+    import page_cache
+
+    pages = ['/', '/forms', '/pricing', '/privacy', '/terms', '/templates', '/free-i130-checklist']
+    build_folder = os.path.join(app.root_path, 'build', 'templates')
+    if not os.path.isdir(build_folder):
+        print("❌ build/templates not found - run python build_assets.py first")
+        return 1
+
+    with app.app_context():
+        db.create_all()
+
+    def measure(template_folder):
+        app.template_folder = template_folder
+        app.__dict__.pop('jinja_loader', None)  # Loader is a cached property of the folder
+        app.jinja_env.cache.clear()
+        page_cache.invalidate()
+        client = app.test_client()
+        sizes = {}
+        for page in pages:
+            body = client.get(page, headers={'Accept-Encoding': 'identity'}).data
+            sizes[page] = (len(body), len(gzip.compress(body)))
+        return sizes
+
+    source = measure('templates')
+    built = measure(build_folder)
+    app.template_folder = 'templates'
+    app.__dict__.pop('jinja_loader', None)
+
+    print(f"{'Page':24s} {'source':>9s} {'built':>9s} {'source gz':>10s} {'built gz':>9s}")
+    print('-' * 66)
+    for page in pages:
+        print(f"{page:24s} {source[page][0]:>9,d} {built[page][0]:>9,d} {source[page][1]:>10,d} {built[page][1]:>9,d}")
+    totals = [sum(sizes[page][i] for page in pages) for sizes in (source, built) for i in (0, 1)]
+    print(f"{'total':24s} {totals[0]:>9,d} {totals[2]:>9,d} {totals[1]:>10,d} {totals[3]:>9,d}")
+
+
+def pdf_setup(args):
+    """Time PDFGenerator setup (shared theme vs per-document stylesheet) and full checklist renders"""
+    from pdf_generator import ChecklistPDFGenerator
+    from pdf_styles import PDFTheme, DEFAULT_PRIMARY_COLOR
+
+    def mean_ms(func, runs):
+        start = time.perf_counter()
+        for _ in range(runs):
+            func()
+        return (time.perf_counter() - start) * 1000 / runs
+
+    items = [f"Supporting document {i}" for i in range(20)]
+
+    def render(generator):
+        generator.save_to_bytes(generator.generate('Form I-130', items, 'Jane Doe'))
+
+    # Building a PDFTheme is what every PDFGenerator() used to do
+    per_document_setup = mean_ms(lambda: PDFTheme(DEFAULT_PRIMARY_COLOR), args.runs)
+    shared_setup = mean_ms(ChecklistPDFGenerator, args.runs)
+    per_document_render = mean_ms(lambda: render(ChecklistPDFGenerator(PDFTheme(DEFAULT_PRIMARY_COLOR))), args.runs)
+    shared_render = mean_ms(lambda: render(ChecklistPDFGenerator()), args.runs)
+
+    print(f"{'Mean of ' + str(args.runs) + ' runs':28s} {'per-document':>13s} {'shared':>9s}")
+    print('-' * 52)
+    print(f"{'generator setup (ms)':28s} {per_document_setup:13.3f} {shared_setup:9.3f}")
+    print(f"{'checklist PDF (ms)':28s} {per_document_render:13.3f} {shared_render:9.3f}")
+
+
+def batch_throughput(args):
+    """Render a batch of cover letters with 1..N pool processes and report the speedup"""
+    import pdf_batch
+
+    items = [{
+        'user_data': {'full_name': f'Client {i}', 'email': f'client{i}@example.com', 'phone': '', 'case_number': ''},
+        'form_info': {'title': 'Petition for Alien Relative', 'form_number': 'I-130', 'documents': [], 'mailing_address': ''}
+    } for i in range(args.items)]
+    max_processes = args.processes or os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, max_processes} & set(range(1, max_processes + 1)))
+
+    print(f"{args.items} cover letters, {os.cpu_count()} CPU(s)")
+    print(f"{'processes':>9s} {'seconds':>9s} {'docs/s':>9s} {'speedup':>8s}")
+    print('-' * 38)
+    baseline = None
+    for processes in counts:
+        executor = pdf_batch.create_executor(processes)
+        # Start the workers (and import reportlab in them) outside the timing
+        list(executor.map(pdf_batch.render_item, ['cover_letter'] * processes, items[:processes]))
+        start = time.perf_counter()
+        total = sum(len(body) for body in pdf_batch.render_all('cover_letter', items, executor))
+        elapsed = time.perf_counter() - start
+        executor.shutdown()
+        baseline = baseline or elapsed
+        print(f"{processes:>9d} {elapsed:>9.2f} {args.items / elapsed:>9.1f} {baseline / elapsed:>7.2f}x")
+    print(f"\n{total:,} bytes per batch")
+
+
+def i94_scaling(args):
+    """Time and peak memory of I-94 history PDFs from 10 to 10,000 travel records"""
+    import tracemalloc
+    from reportlab.platypus import Table
+    from pdf_generator import I94HistoryGenerator
+
+    def records(count):
+        return [{
+            'entry_date': f'20{i % 25:02d}-01-15', 'departure_date': f'20{i % 25:02d}-02-20',
+            'i94_number': f'{i:011d}', 'port_of_entry': 'New York (JFK)', 'status': 'B-2'
+        } for i in range(count)]
+
+    def render(generator, history):
+        return generator.save_to_bytes(generator.generate({'full_name': 'Frequent Traveler'}, history))
+
+    def single_table(generator, history):
+        # Layout before PagedTable: every record in one Table
+        rows = [generator.TABLE_HEADER] + [[r.get(f, '') for f in generator.RECORD_FIELDS] for r in history]
+        table = Table(rows, colWidths=generator.COL_WIDTHS)
+        table.setStyle(generator.theme.tables['travel_history'])
+        return generator.save_to_bytes([table])
+
+    generator = I94HistoryGenerator()
+    print(f"{'records':>8s} {'ms':>9s} {'us/record':>10s} {'peak MB':>8s} {'single Table ms':>16s}")
+    print('-' * 56)
+    for count in args.sizes:
+        history = records(count)
+        start = time.perf_counter()
+        render(generator, history)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        render(generator, history)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        legacy = '-'
+        if count <= args.legacy_max:
+            start = time.perf_counter()
+            single_table(generator, history)
+            legacy = f'{(time.perf_counter() - start) * 1000:.0f}'
+        print(f"{count:>8,d} {elapsed * 1000:>9.0f} {elapsed * 1e6 / count:>10.1f} {peak:>8.1f} {legacy:>16s}")
+
+
+def presence_summary(args):
+    """Import and N-400 summary time for a CBP export of frequent travel"""
+    from datetime import date, timedelta
+    import travel_history
+
+    # Newest first, as CBP lists it: a 4-day trip every week
+    lines, day = ['Date,Type,Location'], date.today() - timedelta(days=365 * args.years)
+    while day < date.today():
+        lines.append(f'{day.isoformat()},Departure,JFK')
+        lines.append(f'{(day + timedelta(days=4)).isoformat()},Arrival,JFK')
+        day += timedelta(days=7)
+    lines = lines[:1] + lines[:0:-1]
+
+    start = time.perf_counter()
+    events = travel_history.sort_events(travel_history.parse_events(lines))
+    parsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        summary = travel_history.summarize(events)
+    summarized = (time.perf_counter() - start) / args.runs
+
+    print(f"{len(events):,} events over {args.years} years")
+    print(f"parse + sort: {parsed * 1000:.1f} ms")
+    print(f"summary:      {summarized * 1000:.2f} ms ({summary['days_abroad']} days abroad in 5 years)")
+
+
+def fragment_cache(args):
+    """Render time of each generator with static text re-laid out per document vs from the fragment cache"""
+    from reportlab.platypus import Paragraph
+    import pdf_generator
+    from pdf_generator import (CoverLetterGenerator, I94HistoryGenerator, ChecklistPDFGenerator,
+                               PassportPDFGenerator, PDFGenerator)
+
+    documents = {
+        'cover letter': (CoverLetterGenerator, ({'full_name': 'Jane Doe', 'email': 'jane@example.com'},
+                                                {'title': 'Form I-130', 'form_number': 'I-130'})),
+        'I-94 history (20)': (I94HistoryGenerator, ({'full_name': 'Jane Doe'}, [{
+            'entry_date': '2020-01-15', 'departure_date': '2020-02-20', 'i94_number': '12345678901',
+            'port_of_entry': 'New York (JFK)', 'status': 'B-2'}] * 20)),
+        'checklist': (ChecklistPDFGenerator, ('Form N-400', [f"Supporting document {i}" for i in range(20)], 'Jane Doe')),
+        'passport guide': (PassportPDFGenerator, ({'full_name': 'Jane Doe', 'date_of_birth': '1990-01-01',
+                                                   'email': 'jane@example.com', 'occupation': 'Engineer'},)),
+    }
+
+    def mean_ms(generator_class, inputs, runs):
+        start = time.perf_counter()
+        for _ in range(runs):
+            generator = generator_class()
+            generator.save_to_bytes(generator.generate(*inputs))
+        return (time.perf_counter() - start) * 1000 / runs
+
+    def uncached_static(self, text, style_name='Normal'):
+        # Before: every static paragraph parsed and line-broken per document
+        return Paragraph(text, self.styles[style_name])
+
+    cached_static = PDFGenerator._static
+    results = {}
+    for name, (generator_class, inputs) in documents.items():
+        pdf_generator.fragments.clear()
+        mean_ms(generator_class, inputs, 5)  # Warm fonts, imports and the cache
+        # Alternate the two modes in rounds and keep each one's best round, to shrink noise
+        before, after = [], []
+        for _ in range(args.rounds):
+            PDFGenerator._static = uncached_static
+            before.append(mean_ms(generator_class, inputs, args.runs))
+            PDFGenerator._static = cached_static
+            after.append(mean_ms(generator_class, inputs, args.runs))
+        results[name] = (min(before), min(after))
+
+    print(f"{'Best of ' + str(args.rounds) + ' x ' + str(args.runs) + ' runs (ms)':28s} {'per render':>11s} {'cached':>8s} {'saved':>7s}")
+    print('-' * 58)
+    for name, (before, after) in results.items():
+        print(f"{name:28s} {before:11.2f} {after:8.2f} {(1 - after / before) * 100:6.0f}%")
+
+
+def branded_pdfs(args):
+    """Checklist render time unbranded, branded from the cached profile, and re-decoding the logo per document"""
+    import tempfile
+    from PIL import Image
+    import pdf_branding
+    from pdf_generator import ChecklistPDFGenerator
+
+    # A throwaway static/ root, so nothing is written into the real one
+    static_root = tempfile.TemporaryDirectory()
+    static_root_before, pdf_branding.STATIC_ROOT = pdf_branding.STATIC_ROOT, static_root.name
+    os.mkdir(os.path.join(static_root.name, 'uploads'))
+    # Noise compresses about as badly as a detailed logo (~25 KB as a JPEG)
+    Image.effect_noise((1600, 400), 60).save(os.path.join(static_root.name, 'uploads', 'logo.png'))
+    branding = {'site_name': 'Acme Immigration Law', 'logo_url': '/static/uploads/logo.png',
+                'primary_color': '#1a2b3c', 'footer_text': 'Acme Immigration Law, Suite 100',
+                'show_powered_by': True, 'updated_at': '2026-01-01T00:00:00'}
+    inputs = ('Form N-400', [f"Supporting document {i}" for i in range(20)], 'Jane Doe')
+
+    def uncached():
+        # Before: settings resolved into a new profile (and logo decode) per document
+        pdf_branding.profiles.clear()
+        return pdf_branding.profile_for_branding(branding)
+
+    modes = {
+        'unbranded': lambda: pdf_branding.profile_for_branding(None),
+        'branded (cached profile)': lambda: pdf_branding.profile_for_branding(branding),
+        'branded (decode per doc)': uncached,
+    }
+
+    def mean_ms(profile_for, runs):
+        start = time.perf_counter()
+        for _ in range(runs):
+            generator = ChecklistPDFGenerator(branding=profile_for())
+            generator.save_to_bytes(generator.generate(*inputs))
+        return (time.perf_counter() - start) * 1000 / runs
+
+    try:
+        best = {name: float('inf') for name in modes}
+        for mode in modes.values():
+            mean_ms(mode, 3)  # Warm fonts, imports and the caches
+        for _ in range(args.rounds):
+            for name, mode in modes.items():
+                best[name] = min(best[name], mean_ms(mode, args.runs))
+    finally:
+        pdf_branding.STATIC_ROOT = static_root_before
+        static_root.cleanup()
+        pdf_branding.profiles.clear()
+
+    print(f"{'Best of ' + str(args.rounds) + ' x ' + str(args.runs) + ' runs':28s} {'ms/render':>10s} {'vs unbranded':>13s}")
+    print('-' * 53)
+    for name, ms in best.items():
+        print(f"{name:28s} {ms:10.2f} {(ms / best['unbranded'] - 1) * 100:+12.0f}%")
+
+
+def form_fills(args):
+    """Fills per second on one core: re-parsing the template per fill vs the cached FormTemplate"""
+    from io import BytesIO
+    from reportlab.pdfgen import canvas
+    import form_filler
+
+    # A template shaped like a USCIS form: many text fields and check boxes per page
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(args.pages):
+        pdf.drawString(72, 760, f'Part {page + 1}')
+        for line in range(args.fields):
+            name = f'form1[0].#subform[{page}].Pt{page + 1}Line{line + 1}'
+            x, y = 72 + (line % 2) * 260, 720 - (line // 2) * 30
+            if line % 5 == 4:
+                pdf.acroForm.checkbox(name=name + '_Yes[0]', x=x, y=y, size=14)
+            else:
+                pdf.acroForm.textfield(name=name + '[0]', x=x, y=y, width=220, height=18)
+        pdf.showPage()
+    pdf.save()
+
+    start = time.perf_counter()
+    data = form_filler.normalize(buffer.getvalue())
+    template = form_filler.FormTemplate(data)
+    parse_ms = (time.perf_counter() - start) * 1000
+    values = {field.name: True if field.kind == 'checkbox' else f'Value {index}'
+              for index, field in enumerate(template.fields.values())}
+
+    def rate(fill, seconds):
+        count, start = 0, time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            fill()
+            count += 1
+        return count / (time.perf_counter() - start)
+
+    modes = {
+        'parse per fill': lambda: form_filler.FormTemplate(data).fill(values),
+        'cached template': lambda: template.fill(values),
+        'cached + flatten': lambda: template.fill(values, flatten=True),
+    }
+    print(f"Template: {args.pages} pages, {len(template.fields)} fields, {len(data) / 1024:.0f} KB, "
+          f"fetched-file normalize + parse {parse_ms:.0f} ms")
+    print(f"{'Mode':20s} {'fills/s':>9s} {'ms/fill':>9s}")
+    print('-' * 40)
+    for name, fill in modes.items():
+        fill()  # Warm up
+        per_second = rate(fill, args.seconds)
+        print(f"{name:20s} {per_second:9.1f} {1000 / per_second:9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_queries = subparsers.add_parser('route-queries', help=route_queries.__doc__)
+    parser_queries.add_argument('--tier', default='complete')
+    parser_queries.add_argument('--verbose', action='store_true', help='Print each statement')
+    parser_queries.set_defaults(func=route_queries)
+
+    parser_search = subparsers.add_parser('search', help=search_latency.__doc__)
+    parser_search.add_argument('--scale', type=int, default=100, help='Copies of the init_db.py catalog')
+    parser_search.add_argument('--runs', type=int, default=50, help='Timed runs per query')
+    parser_search.add_argument('--target-ms', type=float, default=20.0)
+    parser_search.set_defaults(func=search_latency)
+
+    parser_guides = subparsers.add_parser('guides', help=guide_loading.__doc__)
+    parser_guides.add_argument('--runs', type=int, default=200)
+    parser_guides.set_defaults(func=guide_loading)
+
+    parser_bytes = subparsers.add_parser('page-bytes', help=page_bytes.__doc__)
+    parser_bytes.set_defaults(func=page_bytes)
+
+    parser_pdf = subparsers.add_parser('pdf', help=pdf_setup.__doc__)
+    parser_pdf.add_argument('--runs', type=int, default=200)
+    parser_pdf.set_defaults(func=pdf_setup)
+
+    parser_batch = subparsers.add_parser('batch', help=batch_throughput.__doc__)
+    parser_batch.add_argument('--items', type=int, default=200)
+    parser_batch.add_argument('--processes', type=int, default=None, help='Largest pool size (default: CPU count)')
+    parser_batch.set_defaults(func=batch_throughput)
+
+    parser_i94 = subparsers.add_parser('i94', help=i94_scaling.__doc__)
+    parser_i94.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser_i94.add_argument('--legacy-max', type=int, default=3000, help='Largest size to also time as one Table')
+    parser_i94.set_defaults(func=i94_scaling)
+
+    parser_presence = subparsers.add_parser('presence', help=presence_summary.__doc__)
+    parser_presence.add_argument('--years', type=int, default=30)
+    parser_presence.add_argument('--runs', type=int, default=20)
+    parser_presence.set_defaults(func=presence_summary)
+
+    parser_fragments = subparsers.add_parser('fragments', help=fragment_cache.__doc__)
+    parser_fragments.add_argument('--runs', type=int, default=50, help='Renders per round')
+    parser_fragments.add_argument('--rounds', type=int, default=5)
+    parser_fragments.set_defaults(func=fragment_cache)
+
+    parser_branding = subparsers.add_parser('branding', help=branded_pdfs.__doc__)
+    parser_branding.add_argument('--runs', type=int, default=50, help='Renders per round')
+    parser_branding.add_argument('--rounds', type=int, default=5)
+    parser_branding.set_defaults(func=branded_pdfs)
+
+    parser_fills = subparsers.add_parser('fills', help=form_fills.__doc__)
+    parser_fills.add_argument('--pages', type=int, default=10)
+    parser_fills.add_argument('--fields', type=int, default=40, help='Fields per page')
+    parser_fills.add_argument('--seconds', type=float, default=3.0, help='Time per mode')
+    parser_fills.set_defaults(func=form_fills)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
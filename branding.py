@@ -0,0 +1,219 @@
+"""
+White-label branding resolution
+
+Resolves the branding dict a logged-in user's pages render with (their own
+EnterpriseSettings, or their team owner's) and caches it per user in a
+process-local LRU with a TTL. When BRANDING_CACHE_URL points at Redis and the
+redis package is installed, resolved branding is also shared across workers.
+
+Cache entries are keyed by clerk_user_id so a warm hit needs no database
+access at all. invalidate_user() drops one user (membership changes);
+invalidate_all() bumps a generation counter (settings edits, tier changes),
+since one owner's settings fan out to every member of their team. Other
+workers' local entries age out within BRANDING_CACHE_TTL.
+"""
+import json
+import time
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from config import Config
+
+try:
+    import redis
+except ImportError:  # Shared cache is optional
+    redis = None
+
+DEFAULT_BRANDING = {
+    'site_name': 'Immigration Templates',
+    'logo_url': None,
+    'primary_color': '#667eea',
+    'secondary_color': '#764ba2',
+    'footer_text': None,
+    'show_powered_by': True,
+    'updated_at': None
+}
+
+# Paths that never render a template, so they don't need branding
+SKIP_PREFIXES = ('/static/', '/api/')
+SKIP_PATHS = frozenset(['/health'])
+
+_SHARED_PREFIX = 'branding:'
+_SHARED_GENERATION_KEY = 'branding:generation'
+
+
+class BrandingCache:
+    """Thread-safe LRU of resolved branding with a TTL and generation counter"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, generation, branding = entry
+            if expires_at < time.monotonic() or generation != self.generation:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return branding
+
+    def set(self, key, branding):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, self.generation, branding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+_local = BrandingCache(Config.BRANDING_CACHE_SIZE, Config.BRANDING_CACHE_TTL)
+_shared = None
+
+
+def _shared_client():
+    """Redis client for the shared cache, or None when not configured"""
+    global _shared
+    if _shared is None:
+        url = Config.BRANDING_CACHE_URL or ''
+        if redis is not None and url.startswith(('redis://', 'rediss://')):
+            _shared = redis.Redis.from_url(url, socket_timeout=0.2)
+        else:
+            _shared = False
+    return _shared or None
+
+
+def _shared_key(clerk_user_id, generation):
+    return f'{_SHARED_PREFIX}{generation}:{clerk_user_id}'
+
+
+def _shared_get(clerk_user_id):
+    client = _shared_client()
+    if client is None:
+        return None
+    try:
+        generation = int(client.get(_SHARED_GENERATION_KEY) or 0)
+        cached = client.get(_shared_key(clerk_user_id, generation))
+        return json.loads(cached) if cached else None
+    except Exception:
+        # Shared cache is best effort - fall back to the database
+        return None
+
+
+def _shared_set(clerk_user_id, branding):
+    client = _shared_client()
+    if client is None:
+        return
+    try:
+        generation = int(client.get(_SHARED_GENERATION_KEY) or 0)
+        client.set(_shared_key(clerk_user_id, generation), json.dumps(branding), ex=Config.BRANDING_CACHE_TTL)
+    except Exception:
+        pass
+
+
+def _settings_branding(settings):
+    return {
+        'site_name': settings.site_name,
+        'logo_url': settings.logo_url,
+        'primary_color': settings.primary_color,
+        'secondary_color': settings.secondary_color,
+        'footer_text': settings.footer_text,
+        'show_powered_by': settings.show_powered_by,
+        # Versions cached PDF branding (see pdf_branding.py)
+        'updated_at': (settings.updated_at or settings.created_at or datetime.utcnow()).isoformat()
+    }
+
+
+def resolve_branding(identity):
+    """Resolve branding from the database for an identity (uncached)"""
+    import entitlements
+    from models import EnterpriseSettings
+
+    user = identity.user
+    if not user:
+        return DEFAULT_BRANDING
+
+    # Members of a team use their team owner's branding
+    team_membership = identity.membership
+    if team_membership:
+        owner = team_membership.team.owner
+        if not entitlements.for_user(owner).has(entitlements.ADMIN):
+            return DEFAULT_BRANDING
+    elif identity.entitlements.has(entitlements.ADMIN):
+        # User is not in a team but has business tier (they are the owner)
+        owner = user
+    else:
+        return DEFAULT_BRANDING
+
+    settings = EnterpriseSettings.query.filter_by(user_id=owner.id).first()
+    return _settings_branding(settings) if settings else DEFAULT_BRANDING
+
+
+def get_branding(clerk_user_id, load_identity):
+    """Get branding for a user, resolving it through load_identity on a cache miss"""
+    if not clerk_user_id:
+        return DEFAULT_BRANDING
+
+    branding = _local.get(clerk_user_id)
+    if branding is not None:
+        return branding
+
+    branding = _shared_get(clerk_user_id)
+    if branding is None:
+        branding = resolve_branding(load_identity())
+        _shared_set(clerk_user_id, branding)
+
+    _local.set(clerk_user_id, branding)
+    return branding
+
+
+def should_skip(path):
+    """Check whether a request path never renders a template"""
+    return path in SKIP_PATHS or path.startswith(SKIP_PREFIXES)
+
+
+def invalidate_user(clerk_user_id):
+    """Drop cached branding for one user (their team membership changed)"""
+    _local.delete(clerk_user_id)
+    client = _shared_client()
+    if client is None:
+        return
+    try:
+        generation = int(client.get(_SHARED_GENERATION_KEY) or 0)
+        client.delete(_shared_key(clerk_user_id, generation))
+    except Exception:
+        pass
+
+
+def invalidate_all():
+    """Drop all cached branding (settings or subscription tier changed)"""
+    _local.clear()
+    client = _shared_client()
+    if client is None:
+        return
+    try:
+        client.incr(_SHARED_GENERATION_KEY)
+    except Exception:
+        pass
+
+
+def generation():
+    """This worker's branding generation (bumped by invalidate_all)"""
+    return _local.generation
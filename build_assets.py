@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Build step for templates and static files
+
+Run once per deploy (before starting gunicorn):
+    python build_assets.py
+
+- Moves each template's inline <style>/<script> blocks that contain no Jinja
+  into content-hashed files under static/dist/, listed in
+  static/dist/manifest.json, and replaces them with <link>/<script src>
+  tags built by asset_url() (see assets.py). Browsers then cache them for a
+  year instead of downloading them with every page.
+- Minifies every template into build/templates: HTML comments, indentation
+  and blank lines are removed. <pre> and <textarea> blocks are left alone,
+  and remaining inline <script>/<style> blocks only lose indentation and
+  blank lines (line breaks are kept so // comments and ASI still work).
+  Serve them with TEMPLATE_FOLDER=build/templates.
+- Writes .gz (and .br, when the brotli package is installed) copies of the
+  text files under static/, which compression.py serves to clients that
+  accept them.
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import assets
+import compression
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(ROOT, 'templates')
+BUILD_TEMPLATES_DIR = os.path.join(ROOT, 'build', 'templates')
+STATIC_DIR = os.path.join(ROOT, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, assets.DIST_DIR)
+
+# User uploads live under static/ but are not build artifacts
+STATIC_SKIP_DIRS = frozenset(['uploads', 'downloads'])
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt', '.map')
+
+PROTECTED_RE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+
+# Plain CSS/JS blocks only: typed scripts (JSON-LD, modules) and tagged styles stay inline
+INLINE_ASSET_RE = re.compile(
+    r'<(style|script)(?:\s+type=["\']text/(?:css|javascript)["\'])?\s*>(.*?)</\1\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+JINJA_MARKERS = ('{{', '{%', '{#')
+# Relative url() targets would resolve against static/dist/ instead of the page
+RELATIVE_URL_RE = re.compile(r'url\(\s*[\'"]?(?![a-z][a-z0-9+.-]*:|/|#)', re.IGNORECASE)
+
+
+def squeeze_lines(text):
+    """Strip every line and drop the blank ones"""
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def strip_comment(match):
+    """Drop an HTML comment unless it wraps Jinja tags (removing those could unbalance blocks)"""
+    comment = match.group(0)
+    return comment if '{%' in comment or '{{' in comment else ''
+
+
+def minify_html(text):
+    """Whitespace/comment minification that is safe for Jinja templates with inline JS"""
+    # split() yields: markup, protected block, its tag name, markup, ...
+    pieces = PROTECTED_RE.split(text)
+    parts = []
+    for index in range(0, len(pieces), 3):
+        parts.append(squeeze_lines(COMMENT_RE.sub(strip_comment, pieces[index])))
+        if index + 1 < len(pieces):
+            block, tag = pieces[index + 1], pieces[index + 2].lower()
+            parts.append(block if tag in ('pre', 'textarea') else squeeze_lines(block))
+    return '\n'.join(part for part in parts if part) + '\n'
+
+
+class AssetWriter:
+    """Writes extracted blocks as content-hashed files and collects the manifest"""
+
+    def __init__(self, dist_dir=DIST_DIR):
+        self.dist_dir = dist_dir
+        self.manifest = {}
+        self.bytes_written = 0
+
+    def add(self, name, body):
+        """Write one asset; returns its path relative to static/"""
+        stem, extension = name.rsplit('.', 1)
+        data = body.encode()
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        filename = f'{stem}.{digest}.{extension}'
+        with open(os.path.join(self.dist_dir, filename), 'wb') as f:
+            f.write(data)
+        self.manifest[name] = f'{assets.DIST_DIR}/{filename}'
+        self.bytes_written += len(data)
+        return self.manifest[name]
+
+    def write_manifest(self):
+        with open(os.path.join(self.dist_dir, assets.MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+
+def extract_inline_assets(text, stem, writer):
+    """Replace extractable inline <style>/<script> blocks with asset_url() tags"""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        tag, body = match.group(1).lower(), match.group(2)
+        if not body.strip() or any(marker in body for marker in JINJA_MARKERS):
+            return match.group(0)
+        if tag == 'style' and RELATIVE_URL_RE.search(body):
+            return match.group(0)
+
+        count += 1
+        extension = 'css' if tag == 'style' else 'js'
+        name = f'{stem}.{count}.{extension}'
+        writer.add(name, squeeze_lines(body) + '\n')
+        if extension == 'css':
+            return f'<link rel="stylesheet" href="{{{{ asset_url(\'{name}\') }}}}">'
+        return f'<script src="{{{{ asset_url(\'{name}\') }}}}"></script>'
+
+    return INLINE_ASSET_RE.sub(replace, text)
+
+
+def build_templates(source=TEMPLATES_DIR, target=BUILD_TEMPLATES_DIR, writer=None):
+    """Minify every template into target, extracting inline assets when a writer is given
+
+    Returns (files, bytes before, bytes after).
+    """
+    files = before = after = 0
+    for directory, _, names in os.walk(source):
+        for name in names:
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, source)
+            destination = os.path.join(target, relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            output = text
+            if name.endswith('.html'):
+                if writer is not None:
+                    stem = relative[:-len('.html')].replace(os.sep, '-')
+                    output = extract_inline_assets(output, stem, writer)
+                output = minify_html(output)
+            with open(destination, 'w', encoding='utf-8') as f:
+                f.write(output)
+            files += 1
+            before += len(text.encode())
+            after += len(output.encode())
+    return files, before, after
+
+
+def precompress_static(static_dir=STATIC_DIR):
+    """Write .gz/.br copies of compressible static files; returns the number written"""
+    written = 0
+    for directory, subdirectories, names in os.walk(static_dir):
+        subdirectories[:] = [d for d in subdirectories if d not in STATIC_SKIP_DIRS]
+        for name in names:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                body = f.read()
+            for encoding in compression.available_encodings():
+                with open(f'{path}.{compression.SUFFIXES[encoding]}', 'wb') as f:
+                    f.write(compression.compress(body, encoding, 'static'))
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skip-templates', action='store_true')
+    parser.add_argument('--skip-static', action='store_true')
+    parser.add_argument('--keep-inline', action='store_true', help='Do not move inline CSS/JS to static/dist')
+    args = parser.parse_args()
+
+    if not args.skip_templates:
+        writer = None
+        if not args.keep_inline:
+            shutil.rmtree(DIST_DIR, ignore_errors=True)
+            os.makedirs(DIST_DIR)
+            writer = AssetWriter()
+        files, before, after = build_templates(writer=writer)
+        saved = 100 * (before - after) / before if before else 0
+        print(f"✓ Minified {files} templates: {before:,} -> {after:,} bytes ({saved:.1f}% smaller)")
+        if writer is not None:
+            writer.write_manifest()
+            print(f"✓ Moved {len(writer.manifest)} inline blocks ({writer.bytes_written:,} bytes) "
+                  f"to static/{assets.DIST_DIR}/")
+    if not args.skip_static:
+        written = precompress_static()
+        print(f"✓ Wrote {written} precompressed static file(s) ({', '.join(compression.available_encodings())})")
+    print("\n✅ Asset build complete!")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,470 @@
+"""
+Versioned snapshots of the forms and templates catalogs
+
+The catalogs only change through the admin form endpoints and the template
+migration scripts, so /api/documents, /api/templates, /api/categories and
+/api/form-guide are served from in-memory snapshots instead of reloading and
+re-serializing rows per request. The forms snapshot holds each form's
+serialized fields, form number and the anonymous checklist preview, which the
+database computes without shipping the whole list. Full checklists are
+fetched in one query the first time a variant needs them. The JSON body for
+each access variant (anonymous, logged-in free, each set of paid access
+levels) is serialized the first time it is requested and reused until the
+catalog version changes.
+
+A catalog version changes when:
+- an admin endpoint calls invalidate() (immediate in that worker), or
+- the table's (count, max(updated_at)) fingerprint changes, which every
+  worker re-checks at most once per CATALOG_CHECK_INTERVAL, or
+- for forms, the filing registry is reloaded (fees of registered forms come
+  from there, see filing_registry.py; the admin endpoints reject edits to
+  those fees, so the forms table only holds fees the registry does not).
+
+Every body carries a strong ETag (a hash of its bytes, so all workers agree),
+and respond() answers If-None-Match/If-Modified-Since with a 304 from memory.
+
+List endpoints also accept keyset pagination, filters and sparse fieldsets
+(see ListQuery). These are answered from per-snapshot secondary indexes on
+the same columns the database indexes (category, access_level).
+"""
+import time
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from flask import current_app, request
+from sqlalchemy import func
+from sqlalchemy.orm import defer
+from config import Config
+from models import db, ImmigrationForm, FormTemplate, extract_form_number
+from form_guides import get_compiled_guide
+import filing_registry
+
+# Free trial forms - Full access without login
+FREE_TRIAL_FORMS = frozenset(['I-130', 'I-485', 'N-400'])
+
+# Anonymous visitors see this many checklist items of other free forms
+PREVIEW_ITEMS = 3
+
+ANONYMOUS_VARIANT = 'anonymous'
+
+# List parameters for /api/documents and /api/templates (none given = legacy full array)
+LIST_PARAMS = frozenset(['after', 'limit', 'category', 'access_level', 'q', 'fields'])
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def variant_key(user_entitlements):
+    """Access variant for a logged-in user's entitlements, or None for anonymous visitors"""
+    if user_entitlements is None:
+        return ANONYMOUS_VARIANT
+    return user_entitlements.access_levels
+
+
+class ListQuery:
+    """Keyset pagination, filter and sparse fieldset parameters of a list request"""
+
+    def __init__(self, args):
+        """Parse request args (raises ValueError on malformed numbers)"""
+        self.after = int(args['after']) if args.get('after') else None
+        self.limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        self.category = args.get('category') or None
+        self.access_level = args.get('access_level') or None
+        self.terms = args.get('q', '').lower().split()
+        fields = args.get('fields')
+        self.fields = None
+        if fields:
+            self.fields = {field.strip() for field in fields.split(',') if field.strip()} | {'id'}
+
+    @staticmethod
+    def requested(args):
+        """Check whether a request uses any list parameter"""
+        return not LIST_PARAMS.isdisjoint(args)
+
+
+class ListIndex:
+    """Secondary indexes over a snapshot's rows (kept in id order)"""
+
+    def __init__(self, rows):
+        """rows: (id, category, access_level, search_text) tuples sorted by id"""
+        self.ids = [row[0] for row in rows]
+        self.search_text = [row[3] for row in rows]
+        self.by_category = defaultdict(list)
+        self.by_access_level = defaultdict(list)
+        for position, (_, category, access_level, _) in enumerate(rows):
+            self.by_category[category].append(position)
+            self.by_access_level[access_level].append(position)
+
+    def page(self, items, query):
+        """One page of items matching a ListQuery, with the next cursor"""
+        positions = range(len(self.ids))
+        if query.category is not None:
+            positions = self.by_category.get(query.category, [])
+        if query.access_level is not None:
+            by_level = self.by_access_level.get(query.access_level, [])
+            positions = by_level if query.category is None else sorted(set(positions).intersection(by_level))
+        if query.terms:
+            positions = [p for p in positions if all(term in self.search_text[p] for term in query.terms)]
+
+        start = 0
+        if query.after is not None:
+            start = bisect_right(positions, query.after, key=self.ids.__getitem__)
+        window = positions[start:start + query.limit]
+
+        page = [items[p] for p in window]
+        if query.fields is not None:
+            page = [{key: value for key, value in item.items() if key in query.fields} for item in page]
+
+        has_more = start + query.limit < len(positions)
+        return {
+            'items': page,
+            'next_after': self.ids[window[-1]] if has_more and window else None,
+            'total': len(positions),
+        }
+
+
+def search_text(*values):
+    """Lowercased text the q= filter matches against"""
+    return ' '.join(value for value in values if value).lower()
+
+
+class CatalogVariant:
+    """Serialized JSON body with its strong ETag"""
+    __slots__ = ('body', 'etag', 'last_modified')
+
+    def __init__(self, payload, last_modified=None):
+        self.body = f'{current_app.json.dumps(payload)}\n'.encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_body(cls, body, last_modified=None):
+        """Variant for JSON bytes that were serialized ahead of time"""
+        variant = cls.__new__(cls)
+        variant.body = body + b'\n'
+        variant.etag = hashlib.sha1(variant.body).hexdigest()[:20]
+        variant.last_modified = last_modified
+        return variant
+
+
+class CatalogEntry:
+    """One form with everything the access variants need precomputed"""
+    __slots__ = ('id', 'title', 'category', 'data', 'checklist', 'preview', 'checklist_count',
+                 'form_number', 'access_level', 'is_free_trial')
+
+    def __init__(self, form, preview, filings):
+        self.id = form.id
+        self.title = form.title
+        self.category = form.category
+        self.data = form.to_dict(include_checklist=False)
+        self.checklist = None  # Loaded on demand by CatalogSnapshot.load_checklists
+        self.preview = preview or []
+        self.checklist_count = form.checklist_count or 0
+        # Fall back to parsing the title for rows that predate the backfill
+        self.form_number = form.form_number or extract_form_number(form.title)
+        # Cover letters and checklist PDFs quote the registry fee, so the catalog does too
+        # (admin edits to a registered fee are rejected, see registry_fee_error in app.py)
+        self.data['fee'] = filings.fee(self.form_number, self.data['fee'])
+        self.access_level = form.access_level
+        self.is_free_trial = self.form_number in FREE_TRIAL_FORMS
+
+    def shows_full_checklist(self, variant, user_entitlements=None):
+        """Check whether a variant sees the full checklist of this form"""
+        is_anonymous = variant == ANONYMOUS_VARIANT
+        if self.access_level == 'free':
+            return self.is_free_trial or not is_anonymous
+        return not is_anonymous and user_entitlements.can_access_level(self.access_level)
+
+    def to_dict(self, variant, user_entitlements=None):
+        """Form dict with the access fields for one variant"""
+        form_dict = dict(self.data, checklist=self.checklist)
+        is_anonymous = variant == ANONYMOUS_VARIANT
+
+        # Access control logic:
+        # 1. Free trial forms (I-130, I-485, N-400) - FULL access to everyone (no login needed)
+        # 2. Other free tier forms show PREVIEW to anonymous users, FULL to logged-in users
+        # 3. Paid tier forms require login AND appropriate subscription
+        if self.access_level == 'free':
+            if self.is_free_trial or not is_anonymous:
+                form_dict['has_access'] = True
+                form_dict['requires_login'] = False
+                form_dict['is_preview'] = False
+            else:
+                # Anonymous users get preview (first 3 items) for other forms
+                form_dict['checklist'] = self.preview
+                form_dict['checklist_total'] = self.checklist_count
+                form_dict['is_preview'] = self.checklist_count > PREVIEW_ITEMS
+                form_dict['has_access'] = True  # Can still view modal
+                form_dict['requires_login'] = True  # But needs login for full list
+            form_dict['is_free_trial'] = self.is_free_trial
+        elif not is_anonymous and user_entitlements.can_access_level(self.access_level):
+            # User is logged in and has appropriate subscription
+            form_dict['has_access'] = True
+            form_dict['requires_login'] = False
+            form_dict['is_preview'] = False
+            form_dict['is_free_trial'] = False
+        else:
+            form_dict['has_access'] = False
+            if is_anonymous:
+                # User not logged in - needs to sign up
+                form_dict['requires_login'] = True
+            else:
+                # User is logged in but needs to upgrade
+                form_dict['requires_login'] = False
+                form_dict['requires_upgrade'] = True
+            form_dict['is_preview'] = False
+            form_dict['checklist'] = []  # Hide checklist
+            form_dict['is_free_trial'] = False
+
+        return form_dict
+
+
+class CatalogSnapshot:
+    """Immutable view of the forms catalog at one version"""
+
+    def __init__(self, fingerprint, local_version):
+        rows = db.session.query(
+            ImmigrationForm, ImmigrationForm.checklist_preview(PREVIEW_ITEMS)
+        ).options(defer(ImmigrationForm.checklist)).order_by(ImmigrationForm.id).all()
+
+        filings = filing_registry.get_filings()
+        self.entries = [CatalogEntry(form, preview, filings) for form, preview in rows]
+        self.by_id = {entry.id: entry for entry in self.entries}
+        self.by_number = {entry.form_number: entry for entry in self.entries if entry.form_number}
+        self.index = ListIndex([
+            (entry.id, entry.category, entry.access_level,
+             search_text(entry.title, entry.form_number, entry.data['description']))
+            for entry in self.entries
+        ])
+        self.fingerprint = fingerprint
+        self.local_version = local_version
+        self.last_modified = max(filter(None, [fingerprint[1], filings.modified]), default=None)
+        self._items = {}
+        self._variants = {}
+        self._guides = {}
+        self._categories = None
+
+    def load_checklists(self, entries):
+        """Fetch full checklists for the entries that don't have them yet"""
+        missing = {entry.id: entry for entry in entries if entry.checklist is None}
+        if not missing:
+            return
+        rows = db.session.query(ImmigrationForm.id, ImmigrationForm.checklist).filter(
+            ImmigrationForm.id.in_(list(missing))
+        ).all()
+        for form_id, checklist in rows:
+            missing[form_id].checklist = checklist or []
+
+    def form_dict(self, entry, user_entitlements=None):
+        """Single form dict for anonymous visitors (None) or a logged-in user"""
+        key = variant_key(user_entitlements)
+        if entry.shows_full_checklist(key, user_entitlements):
+            self.load_checklists([entry])
+        return entry.to_dict(key, user_entitlements)
+
+    def items(self, user_entitlements=None):
+        """Form dicts for anonymous visitors (None) or a logged-in user, in id order"""
+        key = variant_key(user_entitlements)
+        documents = self._items.get(key)
+        if documents is None:
+            self.load_checklists([
+                entry for entry in self.entries if entry.shows_full_checklist(key, user_entitlements)
+            ])
+            documents = []
+            for entry in self.entries:
+                form_dict = entry.to_dict(key, user_entitlements)
+                form_dict['required_tier'] = entry.access_level
+                documents.append(form_dict)
+            self._items[key] = documents
+        return documents
+
+    def variant(self, user_entitlements=None):
+        """Serialized catalog for anonymous visitors (None) or a logged-in user"""
+        key = variant_key(user_entitlements)
+        variant = self._variants.get(key)
+        if variant is None:
+            variant = self._variants[key] = CatalogVariant(self.items(user_entitlements), self.last_modified)
+        return variant
+
+    def page(self, query, user_entitlements=None):
+        """Serialized page of the catalog for a ListQuery"""
+        return CatalogVariant(self.index.page(self.items(user_entitlements), query), self.last_modified)
+
+    def categories(self):
+        """Serialized list of unique categories (same for every caller)"""
+        if self._categories is None:
+            categories = list(dict.fromkeys(entry.category for entry in self.entries))
+            self._categories = CatalogVariant(categories, self.last_modified)
+        return self._categories
+
+    def guide(self, entry):
+        """Serialized filling guide response for a form (same for every caller)"""
+        variant = self._guides.get(entry.id)
+        if variant is None:
+            guide = get_compiled_guide(entry.form_number)
+            if guide:
+                # {"available": true, "form_title": ..., "guide": ...} around the precompiled guide bytes
+                form_title = current_app.json.dumps(entry.title).encode()
+                body = b'{"available": true, "form_title": ' + form_title + b', "guide": ' + guide.body + b'}'
+                variant = CatalogVariant.from_body(body, self.last_modified)
+            else:
+                variant = CatalogVariant({
+                    'available': False,
+                    'message': 'Filling guide not available for this form yet. Check back soon!'
+                }, self.last_modified)
+            self._guides[entry.id] = variant
+        return variant
+
+    def guide_outline(self, entry):
+        """Serialized guide outline (part titles instead of full parts), or None"""
+        key = ('outline', entry.id)
+        if key not in self._guides:
+            guide = get_compiled_guide(entry.form_number)
+            self._guides[key] = CatalogVariant.from_body(guide.outline(), self.last_modified) if guide else None
+        return self._guides[key]
+
+    def guide_part(self, entry, index):
+        """Serialized single filling_steps part, or None"""
+        key = ('part', entry.id, index)
+        if key not in self._guides:
+            guide = get_compiled_guide(entry.form_number)
+            body = guide.part(index) if guide else None
+            if body is None:
+                return None
+            self._guides[key] = CatalogVariant.from_body(body, self.last_modified)
+        return self._guides[key]
+
+
+class TemplateSnapshot:
+    """Immutable view of the form templates catalog at one version"""
+
+    def __init__(self, fingerprint, local_version):
+        rows = FormTemplate.query.order_by(FormTemplate.id).all()
+        self.templates = [(template.to_dict(), template.access_level) for template in rows]
+        self.index = ListIndex([
+            (template.id, template.category, template.access_level,
+             search_text(template.title, template.description, template.use_case))
+            for template in rows
+        ])
+        self.fingerprint = fingerprint
+        self.local_version = local_version
+        self.last_modified = fingerprint[1]
+        self._items = {}
+        self._variants = {}
+
+    def items(self, user_entitlements=None):
+        """Template dicts for anonymous visitors (None) or a logged-in user, in id order"""
+        key = variant_key(user_entitlements)
+        result = self._items.get(key)
+        if result is None:
+            result = []
+            for data, access_level in self.templates:
+                template_dict = dict(data)
+
+                # Access control
+                if access_level == 'free':
+                    template_dict['has_access'] = True
+                elif key != ANONYMOUS_VARIANT and user_entitlements.can_access_level(access_level):
+                    template_dict['has_access'] = True
+                else:
+                    template_dict['has_access'] = False
+                    if key == ANONYMOUS_VARIANT:
+                        template_dict['requires_login'] = True
+                    else:
+                        template_dict['requires_upgrade'] = True
+
+                result.append(template_dict)
+            self._items[key] = result
+        return result
+
+    def variant(self, user_entitlements=None):
+        """Serialized templates for anonymous visitors (None) or a logged-in user"""
+        key = variant_key(user_entitlements)
+        variant = self._variants.get(key)
+        if variant is None:
+            variant = self._variants[key] = CatalogVariant(self.items(user_entitlements), self.last_modified)
+        return variant
+
+    def page(self, query, user_entitlements=None):
+        """Serialized page of the templates for a ListQuery"""
+        return CatalogVariant(self.index.page(self.items(user_entitlements), query), self.last_modified)
+
+
+class VersionedCatalog:
+    """Holds the current snapshot of one table and rebuilds it when its version changes"""
+
+    def __init__(self, model, snapshot_class):
+        self.model = model
+        self.snapshot_class = snapshot_class
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._local_version = 0
+        self._next_check = 0.0
+
+    def fingerprint(self):
+        count, last_updated = db.session.query(
+            func.count(self.model.id), func.max(self.model.updated_at)
+        ).one()
+        return count, last_updated
+
+    def get(self):
+        """Current snapshot, rebuilt when the catalog version changed"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and snapshot.local_version == self._local_version and now < self._next_check:
+            return snapshot
+
+        with self._lock:
+            local_version = self._local_version
+            fingerprint = self.fingerprint()
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.fingerprint != fingerprint or snapshot.local_version != local_version:
+                self._snapshot = self.snapshot_class(fingerprint, local_version)
+            self._next_check = now + Config.CATALOG_CHECK_INTERVAL
+            return self._snapshot
+
+    def invalidate(self):
+        """Bump the version so the next request rebuilds the snapshot"""
+        with self._lock:
+            self._local_version += 1
+
+
+class FormsCatalog(VersionedCatalog):
+    """Forms catalog that is also rebuilt when the filing registry (fees) changes"""
+
+    def fingerprint(self):
+        return super().fingerprint() + (filing_registry.get_filings().version,)
+
+
+forms = FormsCatalog(ImmigrationForm, CatalogSnapshot)
+templates = VersionedCatalog(FormTemplate, TemplateSnapshot)
+
+
+def get_snapshot():
+    """Current forms catalog snapshot"""
+    return forms.get()
+
+
+def invalidate():
+    """Bump the forms catalog version after an admin edit"""
+    forms.invalidate()
+
+
+def respond(variant, public):
+    """Response for a serialized variant, or a 304 if the caller's copy is current
+
+    Anonymous variants are public so browsers and a CDN can cache them;
+    logged-in variants are private and always revalidated.
+    """
+    response = current_app.response_class(variant.body, mimetype='application/json')
+    response.set_etag(variant.etag)
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = Config.CATALOG_CACHE_MAX_AGE
+        if variant.last_modified:
+            response.last_modified = variant.last_modified
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
@@ -0,0 +1,168 @@
+"""
+Response compression (gzip, and brotli when the brotli package is installed)
+
+init_app() registers an after_request hook that compresses text responses
+(HTML, JSON, CSS, JS, SVG) for clients that accept it. PDFs, ZIPs, images
+and streamed file downloads are already compressed or streamed from disk and
+pass through untouched.
+
+Responses with a strong ETag (the catalog, search and page cache variants)
+are cacheable: their compressed bytes are kept in an LRU keyed by
+(ETag, encoding) so each body is compressed once per worker, and the ETag gets
+an encoding suffix so conditional requests still answer 304.
+
+Static files are not compressed at request time. build_assets.py writes .gz
+and .br copies next to them and the hook swaps them in when the client
+accepts that encoding.
+"""
+import os
+import gzip
+import threading
+from collections import OrderedDict
+from flask import request, send_from_directory
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset([
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+])
+
+# Suffix for ETags and precompressed file names
+SUFFIXES = {'br': 'br', 'gzip': 'gz'}
+
+# Compression effort: build step and page cache > cached responses > one-off responses
+LEVELS = {
+    'static': {'br': 11, 'gzip': 9},
+    'cached': {'br': 8, 'gzip': 9},
+    'dynamic': {'br': 4, 'gzip': 6},
+}
+
+
+def available_encodings():
+    """Encodings this worker can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encodings, encodings=None):
+    """Best encoding the client accepts (highest q, brotli on ties), or None"""
+    best, best_quality = None, 0
+    for encoding in encodings or available_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding, effort='dynamic'):
+    """Compress bytes with gzip or brotli"""
+    level = LEVELS[effort][encoding]
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class CompressedCache:
+    """Thread-safe LRU of compressed bodies keyed by (etag, encoding)"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = CompressedCache(Config.COMPRESSION_CACHE_SIZE)
+
+
+def precompressed_static(app, response, encoding):
+    """Swap a static file response for its build_assets.py .gz/.br copy, if one is current"""
+    filename = request.view_args.get('filename', '')
+    source = os.path.join(app.static_folder, filename)
+    compressed = f'{source}.{SUFFIXES[encoding]}'
+    try:
+        if os.path.getmtime(compressed) < os.path.getmtime(source):
+            return response
+    except OSError:
+        return response
+
+    response.close()
+    compressed_response = send_from_directory(app.static_folder, f'{filename}.{SUFFIXES[encoding]}',
+                                              mimetype=response.mimetype)
+    for header in ('Cache-Control', 'Expires'):
+        if header in response.headers:
+            compressed_response.headers[header] = response.headers[header]
+    compressed_response.content_encoding = encoding
+    compressed_response.vary.add('Accept-Encoding')
+    return compressed_response
+
+
+def compress_response(app, response):
+    """Compress a response for the client if it is worth it (after_request hook)"""
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    encoding = negotiate(request.accept_encodings)
+    if request.endpoint == 'static':
+        if encoding is None:
+            response.vary.add('Accept-Encoding')
+            return response
+        return precompressed_static(app, response, encoding)
+
+    if response.direct_passthrough or response.is_streamed:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if encoding is None or len(body) < Config.COMPRESSION_MIN_SIZE:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        key = (etag, encoding)
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(body, encoding, 'cached')
+            cache.set(key, compressed)
+    else:
+        compressed = compress(body, encoding)
+
+    response.set_data(compressed)
+    response.content_encoding = encoding
+    if etag:
+        response.set_etag(f'{etag}-{SUFFIXES[encoding]}', weak)
+        response = response.make_conditional(request)
+    return response
+
+
+def init_app(app):
+    """Register the compression hook on an app"""
+    if not Config.COMPRESSION_ENABLED:
+        return
+
+    @app.after_request
+    def compress_after_request(response):
+        return compress_response(app, response)
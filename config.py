@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -61,6 +62,54 @@ class Config:
     RATELIMIT_DEFAULT = "200 per day;50 per hour"
     RATELIMIT_HEADERS_ENABLED = True
 
+    # Branding cache (per-user white-label settings resolved in load_branding)
+    BRANDING_CACHE_TTL = int(os.getenv('BRANDING_CACHE_TTL', 60))  # seconds
+    BRANDING_CACHE_SIZE = int(os.getenv('BRANDING_CACHE_SIZE', 10000))
+    BRANDING_CACHE_URL = os.getenv('BRANDING_CACHE_URL', os.getenv('REDIS_URL'))  # Optional shared Redis cache
+
+    # Forms catalog snapshot (see catalog.py)
+    CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', 5))  # seconds between version checks
+    CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))  # browser/CDN max-age for anonymous responses
+
+    # USCIS addresses, enclosure lists and fees by form (see filing_registry.py)
+    FILING_REGISTRY_PATH = os.getenv('FILING_REGISTRY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'uscis_filings.json'))
+    FILING_REGISTRY_CHECK_INTERVAL = float(os.getenv('FILING_REGISTRY_CHECK_INTERVAL', 5))  # seconds between file mtime checks
+
+    # Anonymous marketing page cache (see page_cache.py)
+    PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    PAGE_CACHE_CHECK_INTERVAL = float(os.getenv('PAGE_CACHE_CHECK_INTERVAL', 5))  # seconds between template mtime scans
+    PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', 60))  # browser/CDN max-age
+
+    # Response compression (see compression.py) and minified templates (see build_assets.py)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))  # bytes; smaller bodies are sent as-is
+    COMPRESSION_CACHE_SIZE = int(os.getenv('COMPRESSION_CACHE_SIZE', 256))  # compressed bodies kept per worker
+    TEMPLATE_FOLDER = os.getenv('TEMPLATE_FOLDER', 'templates')  # 'build/templates' after build_assets.py
+    ASSET_CACHE_MAX_AGE = int(os.getenv('ASSET_CACHE_MAX_AGE', 31536000))  # fingerprinted static/dist files (immutable)
+
+    # PDF generation (see pdf_styles.py and pdf_cache.py)
+    PDF_THEME_CACHE_SIZE = int(os.getenv('PDF_THEME_CACHE_SIZE', 64))  # per-tenant style variants kept per worker
+    PDF_CACHE_SIZE = int(os.getenv('PDF_CACHE_SIZE', 256))  # rendered PDFs kept in memory per worker
+    PDF_FRAGMENT_CACHE_SIZE = int(os.getenv('PDF_FRAGMENT_CACHE_SIZE', 2048))  # laid-out static paragraphs per worker (0 disables)
+    PDF_LOGO_DIR = os.getenv('PDF_LOGO_DIR', os.path.join(tempfile.gettempdir(), 'immigration-pdf-logos'))  # normalized tenant logos (see pdf_branding.py)
+    PDF_LOGO_MAX_BYTES = int(os.getenv('PDF_LOGO_MAX_BYTES', 2 * 1024 * 1024))  # larger logos are left out of PDFs
+    PDF_LOGO_FETCH_TIMEOUT = float(os.getenv('PDF_LOGO_FETCH_TIMEOUT', 3))  # seconds to fetch a remote logo
+    PDF_LOGO_RETRY_INTERVAL = float(os.getenv('PDF_LOGO_RETRY_INTERVAL', 300))  # seconds before a logo that failed to load is tried again
+    FORM_TEMPLATE_DIR = os.getenv('FORM_TEMPLATE_DIR', os.path.join(tempfile.gettempdir(), 'immigration-form-templates'))  # normalized USCIS PDFs (see form_filler.py)
+    FORM_TEMPLATE_CACHE_SIZE = int(os.getenv('FORM_TEMPLATE_CACHE_SIZE', 16))  # parsed fillable templates kept per worker
+    FORM_TEMPLATE_MAX_AGE = int(os.getenv('FORM_TEMPLATE_MAX_AGE', 7 * 24 * 3600))  # seconds before a template is re-fetched
+    FORM_TEMPLATE_MAX_BYTES = int(os.getenv('FORM_TEMPLATE_MAX_BYTES', 25 * 1024 * 1024))  # largest official PDF fetched
+    FORM_TEMPLATE_FETCH_TIMEOUT = float(os.getenv('FORM_TEMPLATE_FETCH_TIMEOUT', 20))  # seconds to fetch an official PDF
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'immigration-pdf-cache'))  # shared by workers, not web-served
+    PDF_CACHE_MAX_AGE = int(os.getenv('PDF_CACHE_MAX_AGE', 7 * 24 * 3600))  # seconds before a cached render is pruned from PDF_CACHE_DIR
+    PDF_DOWNLOAD_DIR = os.getenv('PDF_DOWNLOAD_DIR', os.path.join(tempfile.gettempdir(), 'immigration-pdf-downloads'))  # see pdf_delivery.py
+    PDF_DOWNLOAD_MAX_AGE = int(os.getenv('PDF_DOWNLOAD_MAX_AGE', 900))  # seconds a signed download link stays valid
+    PDF_DOWNLOAD_CACHE_SIZE = int(os.getenv('PDF_DOWNLOAD_CACHE_SIZE', 64))  # generated PDFs kept in memory per worker
+    RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 2))  # background render threads per gunicorn worker (see render_jobs.py)
+    RENDER_JOB_TIMEOUT = int(os.getenv('RENDER_JOB_TIMEOUT', 300))  # seconds before an unfinished job is considered lost
+    BATCH_RENDER_PROCESSES = int(os.getenv('BATCH_RENDER_PROCESSES', os.cpu_count() or 1))  # see pdf_batch.py
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 200))  # documents per /api/documents/batch request
+
     # Subscription Tiers (Marriage-Based Immigration Focus)
     SUBSCRIPTION_TIERS = {
         'free': {
@@ -77,7 +126,12 @@ class Config:
                 'Required forms list',
                 'Evidence categories overview'
             ],
-            'document_processing': False
+            'document_processing': False,
+            'access_rank': 0,  # Forms/templates with a lower or equal rank are included
+            'includes_tools': False,  # Standalone tools included while active
+            'agency_templates': False,  # Attorney/agency-only templates
+            'admin': False,  # Catalog admin and white-label settings
+            'batch_documents': False  # Batch document generation (see pdf_batch.py)
         },
         'complete': {
             'name': 'Complete Package',
@@ -99,7 +153,12 @@ class Config:
                 'RFE response templates (if needed)',
                 '30-day money-back guarantee'
             ],
-            'document_processing': True
+            'document_processing': True,
+            'access_rank': 2,
+            'includes_tools': True,
+            'agency_templates': False,
+            'admin': False,
+            'batch_documents': False
         },
         'agency': {
             'name': 'Immigration Preparer',
@@ -119,7 +178,12 @@ class Config:
                 'Remove "Powered by" footer',
                 'Priority support'
             ],
-            'document_processing': True
+            'document_processing': True,
+            'access_rank': 3,
+            'includes_tools': True,
+            'agency_templates': True,
+            'admin': False,
+            'batch_documents': True
         },
         # OLD TIERS (Keep for backward compatibility with existing subscriptions)
         'basic': {
@@ -137,7 +201,12 @@ class Config:
                 'Unlimited PDF compression included (premium quality)',
                 'Passport processing available ($12 per application)'
             ],
-            'document_processing': True
+            'document_processing': True,
+            'access_rank': 1,
+            'includes_tools': True,
+            'agency_templates': False,
+            'admin': False,
+            'batch_documents': False
         },
         'pro': {
             'name': 'Team (Legacy)',
@@ -153,7 +222,12 @@ class Config:
                 'Work together safely with up to 5 team members',
                 'Unlimited PDF compression for entire team'
             ],
-            'document_processing': True
+            'document_processing': True,
+            'access_rank': 2,
+            'includes_tools': True,
+            'agency_templates': True,
+            'admin': False,
+            'batch_documents': True
         },
         'enterprise': {
             'name': 'Business (Legacy)',
@@ -170,7 +244,12 @@ class Config:
                 'Your brand, your clients - white-label platform',
                 'Unlimited PDF compression for all members'
             ],
-            'document_processing': True
+            'document_processing': True,
+            'access_rank': 3,
+            'includes_tools': True,
+            'agency_templates': True,
+            'admin': True,
+            'batch_documents': True
         }
     }
 
@@ -183,7 +262,8 @@ class Config:
             'price_id': os.getenv('STRIPE_PRICE_ID_PASSPORT'),
             'form_type': 'DS-11',
             'required_tier': None,  # Available as standalone purchase
-            'redirect_url': '/documents/passport'
+            'redirect_url': '/documents/passport',
+            'included_with': 'document_processing'  # Subscription capability that unlocks the tool without a purchase
         },
         'pdf_evidence_pack': {
             'name': 'USCIS PDF & Evidence Pack',
@@ -192,7 +272,8 @@ class Config:
             'price_id': os.getenv('STRIPE_PRICE_ID_PDF_EVIDENCE_PACK'),
             'form_type': 'pdf_tools',
             'required_tier': None,  # Available as standalone purchase
-            'redirect_url': '/file-compressor'
+            'redirect_url': '/file-compressor',
+            'included_with': 'includes_tools'
         },
         'travel_history': {
             'name': 'I-94 Travel History Worksheet',
@@ -201,7 +282,8 @@ class Config:
             'price_id': os.getenv('STRIPE_PRICE_ID_TRAVEL_HISTORY'),
             'form_type': 'i94_history',
             'required_tier': None,  # Available as standalone purchase
-            'redirect_url': '/documents/i94-history'
+            'redirect_url': '/documents/i94-history',
+            'included_with': 'active_subscription'
         }
         # NOTE: PDF Compression is now bundled into PAID subscriptions ONLY
         # No longer offered as separate $5 purchase or free tier access
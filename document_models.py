@@ -1,10 +1,15 @@
-from models import db
+from models import db, JSONType
 from datetime import datetime
-import json
 
 class PassportApplication(db.Model):
     """Model for passport application processing"""
     __tablename__ = 'passport_applications'
+    __table_args__ = (
+        # Applications are listed per user, newest first
+        db.Index('ix_passport_applications_user_created', 'user_id', 'created_at'),
+        # Containment/key queries on additional_data (JSONB only)
+        db.Index('ix_passport_applications_additional_data_gin', 'additional_data', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -59,7 +64,7 @@ class PassportApplication(db.Model):
     parent2_dob = db.Column(db.Date)
 
     # Additional Data (JSON for flexibility)
-    additional_data = db.Column(db.Text)  # JSON field for extra information
+    additional_data = db.Column(JSONType)  # JSON field for extra information
 
     # Generated Files
     pdf_url = db.Column(db.String(500))  # URL to generated PDF
@@ -110,14 +115,12 @@ class PassportApplication(db.Model):
         }
 
     def set_additional_data(self, data):
-        """Set additional data as JSON"""
-        self.additional_data = json.dumps(data)
+        """Set additional data (assign a new dict so the change is tracked)"""
+        self.additional_data = dict(data)
 
     def get_additional_data(self):
-        """Get additional data from JSON"""
-        if self.additional_data:
-            return json.loads(self.additional_data)
-        return {}
+        """Get additional data as a Python dict"""
+        return self.additional_data or {}
 
     def is_complete(self):
         """Check if all required fields are filled"""
@@ -155,7 +158,7 @@ class DocumentProcessingTransaction(db.Model):
 
     # Metadata
     description = db.Column(db.String(500))
-    extra_metadata = db.Column(db.Text)  # JSON for additional info
+    extra_metadata = db.Column(JSONType)  # JSON for additional info
 
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -185,6 +188,10 @@ class DocumentProcessingTransaction(db.Model):
 class FileCompressionJob(db.Model):
     """Model for tracking file compression jobs"""
     __tablename__ = 'file_compression_jobs'
+    __table_args__ = (
+        # Usage limits count completed jobs per user; job lists sort by created_at
+        db.Index('ix_file_compression_jobs_user_status_created', 'user_id', 'status', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -246,3 +253,43 @@ class FileCompressionJob(db.Model):
         self.compressed_file_size = compressed_size
         self.compression_ratio = compression_ratio
         self.completed_at = datetime.utcnow()
+
+
+class RenderJob(db.Model):
+    """A generated document rendered off the request path (see render_jobs.py)"""
+    __tablename__ = 'render_jobs'
+    __table_args__ = (
+        # Identical in-flight requests are coalesced by inputs hash
+        db.Index('ix_render_jobs_user_inputs_status', 'user_id', 'job_type', 'inputs_hash', 'status'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # Random hex, used in status URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    # Job Details
+    job_type = db.Column(db.String(50), nullable=False)  # cover_letter, i94_history, passport
+    inputs_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the inputs (inputs are not stored)
+    status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed
+    error = db.Column(db.Text)
+
+    # Output
+    output_key = db.Column(db.String(100))  # Name in the pdf_delivery store
+    download_name = db.Column(db.String(255))
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<RenderJob {self.job_type} - {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+        }
@@ -1,21 +1,25 @@
 """Routes for document processing (checklists, cover letters, I-94 history)"""
-from flask import jsonify, request, render_template, session, send_file
+import io
+from flask import jsonify, request, render_template, session, Response
 from functools import wraps
-from datetime import datetime
+from datetime import date, datetime
 from models import db, User, ImmigrationForm
-from pdf_generator import ChecklistPDFGenerator, CoverLetterGenerator, I94HistoryGenerator
-import os
+from config import Config
+from document_models import RenderJob
+from identity import load_identity, get_current_user
+import entitlements
+import branding
+import pdf_branding
+import pdf_cache
+import pdf_delivery
+import pdf_batch
+import form_filler
+import render_jobs
+import travel_history
 
 def register_document_routes(app, limiter):
     """Register all document processing routes"""
 
-    def get_current_user():
-        """Get current user from session"""
-        clerk_user_id = session.get('clerk_user_id')
-        if clerk_user_id:
-            return User.query.filter_by(clerk_user_id=clerk_user_id).first()
-        return None
-
     def login_required(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -28,14 +32,14 @@ def register_document_routes(app, limiter):
         """Check if user has active subscription OR purchased standalone tool"""
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            from models import OneTimePurchase
-
-            user = get_current_user()
+            identity = load_identity()
+            user = identity.user
             if not user:
                 return jsonify({'error': 'Authentication required'}), 401
 
             # Check if user has subscription
-            has_subscription = user.subscription_tier != 'free' and user.has_active_subscription()
+            user_entitlements = identity.entitlements
+            has_subscription = user_entitlements.has(entitlements.ACTIVE_SUBSCRIPTION)
 
             # Check if user purchased standalone tool for this specific route
             has_standalone_access = False
@@ -44,11 +48,7 @@ def register_document_routes(app, limiter):
             # Map routes to tool types
             if 'i94' in route or 'i94-history' in request.path:
                 # Check for travel_history purchase
-                has_standalone_access = OneTimePurchase.query.filter_by(
-                    user_id=user.id,
-                    tool_type='travel_history',
-                    status='completed'
-                ).first() is not None
+                has_standalone_access = user_entitlements.can_use_tool('travel_history')
             elif 'cover-letter' in request.path:
                 # Cover letter is always subscription-only (no standalone purchase)
                 has_standalone_access = False
@@ -66,6 +66,100 @@ def register_document_routes(app, limiter):
             return f(*args, **kwargs)
         return decorated_function
 
+    def tenant_branding():
+        """White-label branding for the signed-in user's PDFs (see pdf_branding.py)"""
+        return branding.get_branding(session.get('clerk_user_id'), load_identity)
+
+    def cover_letter_inputs(data, user):
+        """CoverLetterGenerator inputs from a request body"""
+        # Prepare user data
+        user_data = {
+            'full_name': data.get('full_name', user.full_name),
+            'email': data.get('email', user.email),
+            'phone': data.get('phone', ''),
+            'case_number': data.get('case_number', '')
+        }
+
+        # Prepare form info
+        form_info = {
+            'title': data.get('form_title', 'Immigration Application'),
+            'form_number': data.get('form_number', ''),
+            'documents': data.get('documents', []),
+            'mailing_address': data.get('mailing_address', '')
+        }
+        return {'user_data': user_data, 'form_info': form_info, 'branding': tenant_branding()}
+
+    COVER_LETTER_TEXT_FIELDS = ('full_name', 'email', 'phone', 'case_number',
+                                'form_title', 'form_number', 'mailing_address')
+
+    def cover_letter_error(data):
+        """Error message for cover letter input of the wrong type, else None"""
+        if not isinstance(data, dict):
+            return 'Request body must be a JSON object'
+        for field in COVER_LETTER_TEXT_FIELDS:
+            if data.get(field) is not None and not isinstance(data[field], str):
+                return f'{field} must be a string'
+        documents = data.get('documents')
+        if documents is not None and not (isinstance(documents, list) and all(isinstance(d, str) for d in documents)):
+            return 'documents must be a list of strings'
+        return None
+
+    def checklist_item_error(data):
+        """Error message for a batch checklist item of the wrong type, else None"""
+        if data.get('user_name') is not None and not isinstance(data['user_name'], str):
+            return 'user_name must be a string'
+        return None
+
+    def i94_history_error(data):
+        """Error message for travel history input of the wrong type, else None"""
+        if not isinstance(data, dict):
+            return 'Request body must be a JSON object'
+        if data.get('cbp_history') is not None and not isinstance(data['cbp_history'], str):
+            return 'cbp_history must be the text of a CBP travel history export'
+        records = data.get('travel_history')
+        if records is not None and not (isinstance(records, list) and all(isinstance(r, dict) for r in records)):
+            return 'travel_history must be a list of objects'
+        return None
+
+    def i94_history_inputs(data, user):
+        """I94HistoryGenerator inputs from a request body"""
+        # Prepare user data
+        user_data = {
+            'full_name': data.get('full_name', user.full_name),
+            'date_of_birth': data.get('date_of_birth', ''),
+            'passport_number': data.get('passport_number', ''),
+            'country': data.get('country', '')
+        }
+
+        # Prepare travel history, imported from a pasted CBP export if one is sent
+        as_of = travel_history.parse_date(data.get('as_of')) or date.today()
+        years = data.get('residence_years', 5)
+        if data.get('cbp_history'):
+            records, summary = travel_history.import_history(data['cbp_history'].splitlines(), as_of, years)
+        else:
+            records = data.get('travel_history', [])
+            summary = travel_history.summarize_records(records, as_of, years)
+        return {'user_data': user_data, 'travel_history': records, 'summary': summary,
+                'branding': tenant_branding()}
+
+    def render_document(job_type, user, inputs, filename):
+        """Queue a render job; the client polls it and downloads the stored output"""
+        job = render_jobs.submit(job_type, user.id, inputs, filename)
+        return jsonify(render_jobs.job_status(job)), 202
+
+    # ============== RENDER JOBS ==============
+
+    @app.route('/api/documents/jobs/<job_id>')
+    @login_required
+    @limiter.limit("120 per minute")
+    def get_render_job(job_id):
+        """Poll a render job; completed jobs include a signed download_url"""
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        job = RenderJob.query.filter_by(id=job_id, user_id=user.id).first_or_404()
+        return jsonify(render_jobs.job_status(job))
+
     # ============== CHECKLIST PDF ROUTES ==============
 
     @app.route('/api/forms/<int:form_id>/checklist-pdf', methods=['GET'])
@@ -78,29 +172,74 @@ def register_document_routes(app, limiter):
         form = ImmigrationForm.query.get_or_404(form_id)
 
         # Check if user can access this form
-        if not user.can_access_form(form):
+        if not load_identity().entitlements.can_access_level(form.access_level):
             return jsonify({'error': 'You do not have access to this form'}), 403
 
         try:
-            # Create uploads directory
-            uploads_dir = os.path.join(app.root_path, 'static', 'uploads', 'checklists')
-            os.makedirs(uploads_dir, exist_ok=True)
+            # Rendered once per form version and branding, then personalized (see pdf_cache.py)
+            user_branding = tenant_branding()
+            pdf = pdf_cache.get_checklist_pdf(
+                form, user.full_name, branding=pdf_branding.profile_for_branding(user_branding)
+            )
+            return pdf_delivery.pdf_response(pdf, f"{form.title.replace('/', '-')}_Checklist.pdf")
 
-            # Generate PDF
-            generator = ChecklistPDFGenerator()
-            checklist_items = form.get_checklist() or []
-            pdf_elements = generator.generate(form.title, checklist_items, user.full_name)
+        except Exception as e:
+            return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
-            # Save PDF
-            filename = f"checklist_{form.id}_{user.id}_{datetime.now().strftime('%Y%m%d')}.pdf"
-            filepath = os.path.join(uploads_dir, filename)
-            generator.save_to_file(pdf_elements, filepath)
+    @app.route('/api/forms/<int:form_id>/fields', methods=['GET'])
+    @login_required
+    @subscription_required
+    @limiter.limit("30 per minute")
+    def get_form_fields(form_id):
+        """Fillable fields of a form's official PDF"""
+        form = ImmigrationForm.query.get_or_404(form_id)
+        if not load_identity().entitlements.can_access_level(form.access_level):
+            return jsonify({'error': 'You do not have access to this form'}), 403
+        if not form.pdf_url:
+            return jsonify({'error': 'This form has no official PDF'}), 404
 
-            # Return file
-            return send_file(filepath, as_attachment=True, download_name=f"{form.title.replace('/', '-')}_Checklist.pdf")
+        try:
+            template = form_filler.get_template(form.pdf_url)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 502
+        return jsonify({'form_id': form.id, 'fields': [field.to_dict() for field in template.fields.values()]})
 
-        except Exception as e:
-            return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+    @app.route('/api/forms/<int:form_id>/fill', methods=['POST'])
+    @login_required
+    @subscription_required
+    @limiter.limit("30 per minute")
+    def fill_form_pdf(form_id):
+        """Fill a form's official PDF
+
+        Body: {"fields": {<field name or short name>: value}, "flatten": false,
+               "strict": true}. strict=false ignores keys that are not fields.
+        """
+        user = get_current_user()
+        form = ImmigrationForm.query.get_or_404(form_id)
+        if not load_identity().entitlements.can_access_level(form.access_level):
+            return jsonify({'error': 'You do not have access to this form'}), 403
+        if not form.pdf_url:
+            return jsonify({'error': 'This form has no official PDF'}), 404
+
+        data = request.get_json(silent=True) or {}
+        values = data.get('fields')
+        if not isinstance(values, dict) or not values:
+            return jsonify({'error': 'fields must be a non-empty object'}), 400
+
+        try:
+            template = form_filler.get_template(form.pdf_url)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 502
+        try:
+            # Parsed once per worker; a fill only appends to the template bytes (see form_filler.py)
+            pdf = template.fill(values, bool(data.get('flatten')), data.get('strict', True) is not False)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        filename = f"{form.title.replace('/', '-')}_Filled.pdf"
+        if pdf_delivery.wants_pdf():
+            return pdf_delivery.pdf_response(pdf, filename)
+        return jsonify({'download_url': pdf_delivery.issue_download_url(pdf, user.id, filename)})
 
     # ============== COVER LETTER ROUTES ==============
 
@@ -120,41 +259,13 @@ def register_document_routes(app, limiter):
         """Generate USCIS cover letter PDF"""
         user = get_current_user()
         data = request.json
+        error = cover_letter_error(data)
+        if error:
+            return jsonify({'error': error}), 400
 
         try:
-            # Create uploads directory
-            uploads_dir = os.path.join(app.root_path, 'static', 'uploads', 'cover-letters')
-            os.makedirs(uploads_dir, exist_ok=True)
-
-            # Prepare user data
-            user_data = {
-                'full_name': data.get('full_name', user.full_name),
-                'email': data.get('email', user.email),
-                'phone': data.get('phone', ''),
-                'case_number': data.get('case_number', '')
-            }
-
-            # Prepare form info
-            form_info = {
-                'title': data.get('form_title', 'Immigration Application'),
-                'documents': data.get('documents', []),
-                'mailing_address': data.get('mailing_address', '')
-            }
-
-            # Generate PDF
-            generator = CoverLetterGenerator()
-            pdf_elements = generator.generate(user_data, form_info)
-
-            # Save PDF
-            filename = f"cover_letter_{user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            filepath = os.path.join(uploads_dir, filename)
-            generator.save_to_file(pdf_elements, filepath)
-
-            return jsonify({
-                'success': True,
-                'message': 'Cover letter generated successfully',
-                'download_url': f"/static/uploads/cover-letters/{filename}"
-            })
+            filename = f"cover_letter_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            return render_document('cover_letter', user, cover_letter_inputs(data, user), filename)
 
         except Exception as e:
             return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
@@ -177,40 +288,133 @@ def register_document_routes(app, limiter):
         """Generate I-94 travel history PDF"""
         user = get_current_user()
         data = request.json
+        error = i94_history_error(data)
+        if error:
+            return jsonify({'error': error}), 400
 
         try:
-            # Create uploads directory
-            uploads_dir = os.path.join(app.root_path, 'static', 'uploads', 'i94-history')
-            os.makedirs(uploads_dir, exist_ok=True)
-
-            # Prepare user data
-            user_data = {
-                'full_name': data.get('full_name', user.full_name),
-                'date_of_birth': data.get('date_of_birth', ''),
-                'passport_number': data.get('passport_number', ''),
-                'country': data.get('country', '')
-            }
-
-            # Prepare travel history
-            travel_history = data.get('travel_history', [])
-
-            # Generate PDF
-            generator = I94HistoryGenerator()
-            pdf_elements = generator.generate(user_data, travel_history)
-
-            # Save PDF
-            filename = f"i94_history_{user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            filepath = os.path.join(uploads_dir, filename)
-            generator.save_to_file(pdf_elements, filepath)
+            filename = f"i94_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            return render_document('i94_history', user, i94_history_inputs(data, user), filename)
 
+        except Exception as e:
+            return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+
+    @app.route('/api/documents/i94-history/import', methods=['POST'])
+    @login_required
+    @subscription_required
+    @limiter.limit("20 per minute")
+    def import_i94_history():
+        """Parse a CBP travel history export (uploaded file or pasted text)
+
+        Returns the travel_history records for the generator form and the N-400
+        physical presence summary. Uploads are read line by line.
+        """
+        upload = request.files.get('file')
+        if upload:
+            lines = io.TextIOWrapper(upload.stream, encoding='utf-8', errors='replace')
+            options = request.form
+        else:
+            options = request.get_json(silent=True) or request.form
+            error = i94_history_error(options)
+            if error:
+                return jsonify({'error': error}), 400
+            lines = (options.get('cbp_history') or '').splitlines()
+
+        as_of = travel_history.parse_date(options.get('as_of')) or date.today()
+        records, summary = travel_history.import_history(lines, as_of, options.get('residence_years', 5))
+        if not records:
+            return jsonify({'error': 'No travel records found in the CBP history'}), 400
+        return jsonify({'travel_history': records, 'summary': summary})
+
+    @app.route('/api/documents/download/<token>')
+    @login_required
+    @limiter.limit("60 per minute")
+    def download_generated_pdf(token):
+        """Download a generated PDF through its signed, expiring link"""
+        user = get_current_user()
+        download = pdf_delivery.read_download(token, user.id) if user else None
+        if download is None:
+            return jsonify({'error': 'Download link is invalid or has expired'}), 404
+        pdf, filename = download
+        return pdf_delivery.pdf_response(pdf, filename)
+
+    # ============== BATCH GENERATION ==============
+
+    @app.route('/api/documents/batch', methods=['POST'])
+    @login_required
+    @limiter.limit("5 per minute")
+    def generate_batch():
+        """Generate one document type for many clients (one bookmarked PDF or a ZIP)
+
+        Body: {"type": "cover_letter" | "i94_history" | "checklist",
+               "format": "pdf" | "zip", "form_id": <checklist form>,
+               "items": [<generate endpoint body>, ...]}
+        Checklist items only take a user_name.
+        """
+        identity = load_identity()
+        user = identity.user
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        if not identity.entitlements.has(entitlements.BATCH_DOCUMENTS):
             return jsonify({
-                'success': True,
-                'message': 'I-94 travel history generated successfully',
-                'download_url': f"/static/uploads/i94-history/{filename}"
-            })
+                'error': 'Batch generation requires an active agency plan',
+                'current_tier': user.subscription_tier,
+                'redirect': '/pricing'
+            }), 403
+
+        data = request.get_json(silent=True) or {}
+        job_type = data.get('type')
+        output_format = data.get('format', 'pdf')
+        items = data.get('items')
+        if job_type not in pdf_batch.BATCH_TYPES:
+            return jsonify({'error': f"type must be one of: {', '.join(pdf_batch.BATCH_TYPES)}"}), 400
+        if output_format not in pdf_batch.FORMATS:
+            return jsonify({'error': f"format must be one of: {', '.join(pdf_batch.FORMATS)}"}), 400
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': 'items must be a non-empty list of objects'}), 400
+        if len(items) > Config.BATCH_MAX_ITEMS:
+            return jsonify({'error': f'A batch can have at most {Config.BATCH_MAX_ITEMS} items'}), 400
+
+        item_error = {'cover_letter': cover_letter_error, 'i94_history': i94_history_error,
+                      'checklist': checklist_item_error}[job_type]
+        for index, item in enumerate(items, 1):
+            error = item_error(item)
+            if error:
+                return jsonify({'error': f'Item {index}: {error}'}), 400
+
+        if job_type == 'checklist':
+            form = ImmigrationForm.query.get_or_404(data.get('form_id'))
+            if not identity.entitlements.can_access_level(form.access_level):
+                return jsonify({'error': 'You do not have access to this form'}), 403
+            user_branding = tenant_branding()
+            inputs = [{
+                'form_title': form.title,
+                'checklist_items': form.get_checklist(),
+                'user_name': item.get('user_name'),
+                'branding': user_branding
+            } for item in items]
+            titles = [item.get('user_name') or form.title for item in items]
+        elif job_type == 'cover_letter':
+            inputs = [cover_letter_inputs(item, user) for item in items]
+            titles = [f"{i['user_data']['full_name'] or 'Client'} - {i['form_info']['title']}" for i in inputs]
+        else:
+            inputs = [i94_history_inputs(item, user) for item in items]
+            titles = [i['user_data']['full_name'] or 'Client' for i in inputs]
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if output_format == 'zip':
+            # Failed items become an error note in the archive, since the 200 is already sent
+            filenames = [pdf_batch.filename_for(index, title) for index, title in enumerate(titles, 1)]
+            renders = pdf_batch.submit_all(job_type, inputs)
+            response = Response(pdf_batch.stream_zip(filenames, renders), mimetype='application/zip')
+            response.headers['Content-Disposition'] = f'attachment; filename="{job_type}_batch_{stamp}.zip"'
+            return response
 
+        try:
+            pdf = pdf_batch.combine(titles, pdf_batch.render_all(job_type, inputs))
         except Exception as e:
             return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+        return pdf_delivery.pdf_response(pdf, f"{job_type}_batch_{stamp}.pdf")
 
     # ============== DASHBOARD - MY DOCUMENTS ==============
 
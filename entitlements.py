@@ -0,0 +1,169 @@
+"""
+Entitlement engine
+
+Compiles Config.SUBSCRIPTION_TIERS and Config.DOCUMENT_TYPES once at import
+into an immutable capability bitset per (tier, active) pair. One-time tool
+purchases are OR-ed in on top, so every access check is a bitmask test with
+no database access.
+"""
+from types import MappingProxyType
+from config import Config
+
+# Tier capabilities
+PAID_TIER = 1 << 0            # Any tier other than 'free' (status not considered)
+ACTIVE_SUBSCRIPTION = 1 << 1  # Paid tier with an active status (User.has_active_subscription)
+DOCUMENT_PROCESSING = 1 << 2  # Tier config 'document_processing' (status not considered)
+INCLUDES_TOOLS = 1 << 3       # Tier config 'includes_tools' (status not considered)
+ALL_TOOLS = 1 << 4            # 'includes_tools' tier with an active status
+AGENCY_TEMPLATES = 1 << 5     # Attorney/agency-only templates
+ADMIN = 1 << 6                # Catalog admin and white-label settings
+BATCH_DOCUMENTS = 1 << 7      # Tier config 'batch_documents' with an active status (multi-client packets)
+
+_DYNAMIC_BITS_START = 8
+
+# One bit per standalone tool that can be bought with a one-time purchase
+TOOL_BITS = MappingProxyType({
+    tool_type: 1 << (_DYNAMIC_BITS_START + i)
+    for i, tool_type in enumerate(Config.DOCUMENT_TYPES)
+})
+
+# One bit per access level (forms and templates use tier names as levels)
+LEVEL_BITS = MappingProxyType({
+    tier: 1 << (_DYNAMIC_BITS_START + len(TOOL_BITS) + i)
+    for i, tier in enumerate(Config.SUBSCRIPTION_TIERS)
+})
+
+_NAMED_CAPABILITIES = {
+    'active_subscription': ACTIVE_SUBSCRIPTION,
+    'document_processing': DOCUMENT_PROCESSING,
+    'includes_tools': ALL_TOOLS,
+}
+
+# Capability mask that unlocks each tool: its purchase bit or the subscription capability
+TOOL_MASKS = MappingProxyType({
+    tool_type: TOOL_BITS[tool_type] | _NAMED_CAPABILITIES.get(tool_info.get('included_with'), 0)
+    for tool_type, tool_info in Config.DOCUMENT_TYPES.items()
+})
+
+# Key used for tiers that are not in Config.SUBSCRIPTION_TIERS
+_UNKNOWN_TIER = None
+
+
+def _tier_rank(tier):
+    return Config.SUBSCRIPTION_TIERS.get(tier, {}).get('access_rank', 0)
+
+
+def _compile_profile(tier, active):
+    """Build the capability bitset for one tier and subscription status"""
+    tier_info = Config.SUBSCRIPTION_TIERS.get(tier, {})
+    is_paid = tier != 'free'
+    is_active = active and is_paid
+
+    caps = 0
+    if is_paid:
+        caps |= PAID_TIER
+    if is_active:
+        caps |= ACTIVE_SUBSCRIPTION
+    if tier_info.get('document_processing'):
+        caps |= DOCUMENT_PROCESSING
+    if tier_info.get('includes_tools'):
+        caps |= INCLUDES_TOOLS
+        if is_active:
+            caps |= ALL_TOOLS
+    if tier_info.get('agency_templates'):
+        caps |= AGENCY_TEMPLATES
+    if tier_info.get('admin'):
+        caps |= ADMIN
+    if tier_info.get('batch_documents') and is_active:
+        caps |= BATCH_DOCUMENTS
+
+    # Paid access levels need an active subscription of an equal or higher rank
+    if is_active:
+        rank = _tier_rank(tier)
+        for level, level_bit in LEVEL_BITS.items():
+            if rank >= _tier_rank(level):
+                caps |= level_bit
+
+    return caps
+
+
+def _compile_profiles():
+    profiles = {}
+    for tier in list(Config.SUBSCRIPTION_TIERS) + [_UNKNOWN_TIER]:
+        for active in (True, False):
+            profiles[(tier, active)] = _compile_profile(tier, active)
+    return MappingProxyType(profiles)
+
+
+PROFILES = _compile_profiles()
+
+
+class Entitlements:
+    """Immutable capability set for one user"""
+    __slots__ = ('tier', 'caps')
+
+    def __init__(self, tier, caps):
+        object.__setattr__(self, 'tier', tier)
+        object.__setattr__(self, 'caps', caps)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Entitlements are immutable')
+
+    def __repr__(self):
+        return f'<Entitlements {self.tier} {self.caps:#x}>'
+
+    def __eq__(self, other):
+        return isinstance(other, Entitlements) and (self.tier, self.caps) == (other.tier, other.caps)
+
+    def __hash__(self):
+        return hash((self.tier, self.caps))
+
+    def has(self, capability):
+        """Check that every bit of a capability is granted"""
+        return self.caps & capability == capability
+
+    def can_access_level(self, access_level):
+        """Check access to a form or template with the given access level"""
+        if access_level == 'free':
+            return True
+        # Unknown levels rank lowest, so any active subscription covers them
+        return self.has(LEVEL_BITS.get(access_level, ACTIVE_SUBSCRIPTION))
+
+    def can_use_tool(self, tool_type):
+        """Check access to a standalone tool via purchase or subscription"""
+        return bool(self.caps & TOOL_MASKS.get(tool_type, 0))
+
+    def has_purchased(self, tool_type):
+        """Check for a completed one-time purchase of a tool"""
+        tool_bit = TOOL_BITS.get(tool_type)
+        return tool_bit is not None and self.has(tool_bit)
+
+    @property
+    def includes_all_tools(self):
+        return self.has(ALL_TOOLS)
+
+    @property
+    def access_levels(self):
+        """Paid access levels this user can open (frozenset of level names)"""
+        return frozenset(level for level, bit in LEVEL_BITS.items() if self.caps & bit)
+
+
+def for_tier(tier, status, purchased_tools=()):
+    """Entitlements for a tier, subscription status and set of purchased tools"""
+    active = status == 'active'
+    caps = PROFILES.get((tier, active))
+    if caps is None:
+        caps = PROFILES[(_UNKNOWN_TIER, active)]
+    for tool_type in purchased_tools:
+        caps |= TOOL_BITS.get(tool_type, 0)
+    return Entitlements(tier, caps)
+
+
+def for_user(user, purchased_tools=()):
+    """Entitlements for a User row (anonymous visitors get the free profile)"""
+    if user is None:
+        return ANONYMOUS
+    return for_tier(user.subscription_tier, user.subscription_status, purchased_tools)
+
+
+ANONYMOUS = for_tier('free', 'inactive')
@@ -6,6 +6,8 @@ from dateutil.relativedelta import relativedelta
 from document_models import FileCompressionJob
 from models import db, User
 from config import Config
+from identity import load_identity, get_current_user
+import entitlements
 import stripe
 import os
 from werkzeug.utils import secure_filename
@@ -13,13 +15,6 @@ from werkzeug.utils import secure_filename
 def register_file_compressor_routes(app, limiter):
     """Register all file compressor routes"""
 
-    def get_current_user():
-        """Get current user from session"""
-        clerk_user_id = session.get('clerk_user_id')
-        if clerk_user_id:
-            return User.query.filter_by(clerk_user_id=clerk_user_id).first()
-        return None
-
     def login_required(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -30,8 +25,6 @@ def register_file_compressor_routes(app, limiter):
 
     def check_compression_limits(user):
         """Check if user can compress files based on their subscription tier OR standalone purchase"""
-        from models import OneTimePurchase
-
         # Legacy unlimited tiers (backward compatibility)
         if user.subscription_tier in ['basic', 'pro', 'enterprise']:
             return {
@@ -73,13 +66,7 @@ def register_file_compressor_routes(app, limiter):
             }
 
         # Check if free user purchased PDF Evidence Pack standalone
-        pdf_pack_purchase = OneTimePurchase.query.filter_by(
-            user_id=user.id,
-            tool_type='pdf_evidence_pack',
-            status='completed'
-        ).first()
-
-        if pdf_pack_purchase:
+        if load_identity().entitlements.has_purchased('pdf_evidence_pack'):
             # User bought PDF Evidence Pack - give them 100 compressions
             lifetime_limit = 100
 
@@ -255,7 +242,8 @@ def register_file_compressor_routes(app, limiter):
 
             # Create compression job record
             # Use user's subscription tier for tracking (not requested_tier)
-            compression_tier_for_job = user.subscription_tier if user.subscription_tier in ['complete', 'agency', 'basic', 'pro', 'enterprise'] else 'free'
+            includes_tools = load_identity().entitlements.has(entitlements.INCLUDES_TOOLS)
+            compression_tier_for_job = user.subscription_tier if includes_tools else 'free'
 
             job = FileCompressionJob(
                 user_id=user.id,
@@ -0,0 +1,146 @@
+"""
+USCIS filing registry: mailing addresses, enclosure lists and fees by form
+
+Cover letters used to uppercase the form title and walk hard-coded address
+and document tables on every render, with fees that disagreed with the
+forms catalog. This data now lives in one file, FILING_REGISTRY_PATH
+(data/uscis_filings.json), keyed by form number ("I-130"). Cover letters,
+checklist PDFs and /api/documents all read it from here. A registered fee
+is the only source for that form: the admin form endpoints reject fee edits
+for it, and ImmigrationForm.fee is only used for forms not in the file.
+
+The file is parsed once per worker into an immutable Filings snapshot.
+get() re-checks the file's mtime at most once per
+FILING_REGISTRY_CHECK_INTERVAL, so an edited file is picked up by every
+worker without a restart. A file that fails to parse is logged and the
+previous snapshot is kept. Snapshots carry a version (a hash of the file)
+that render caches include in their keys.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Filing:
+    """Filing instructions for one form"""
+    __slots__ = ('form_code', 'fee', 'address_lines', 'documents')
+
+    def __init__(self, form_code, fee, address_lines, documents):
+        self.form_code = form_code
+        self.fee = fee
+        self.address_lines = tuple(address_lines)
+        self.documents = tuple(documents)
+
+    @property
+    def address(self):
+        """Mailing address as reportlab paragraph markup"""
+        return '<br/>'.join(self.address_lines)
+
+    def document_list(self, title):
+        """Numbered enclosure list for a cover letter"""
+        return [
+            f"{number}. {document.format(title=title, fee=self.fee or 'as listed in the form instructions')}"
+            for number, document in enumerate(self.documents, 1)
+        ]
+
+
+class Filings:
+    """Immutable view of the registry file at one version"""
+
+    def __init__(self, data, version, modified=None):
+        default = data.get('default', {})
+        self.version = version
+        self.modified = modified  # File mtime (naive UTC datetime)
+        self.default = Filing('', None, default.get('address', []), default.get('documents', []))
+        self.by_code = {
+            code.upper(): Filing(
+                code.upper(),
+                entry.get('fee'),
+                entry.get('address') or self.default.address_lines,
+                entry.get('documents') or self.default.documents,
+            )
+            for code, entry in data.get('forms', {}).items()
+        }
+        # Longest codes first so "I-130A" is not matched as "I-130"
+        codes = sorted(self.by_code, key=len, reverse=True)
+        self._code_re = re.compile(
+            r'(?<![\w-])(' + '|'.join(re.escape(code) for code in codes) + r')(?![\w-])', re.IGNORECASE
+        ) if codes else None
+
+    def get(self, form_code):
+        """Filing for a form number, or the generic default"""
+        return self.by_code.get((form_code or '').upper(), self.default)
+
+    def match(self, text):
+        """First registered form number mentioned in free text ("I-130 petition for my wife"), or ''"""
+        if not text or self._code_re is None:
+            return ''
+        found = self._code_re.search(text)
+        return found.group(1).upper() if found else ''
+
+    def fee(self, form_code, fallback=None):
+        """Registered fee for a form number, else fallback"""
+        filing = self.by_code.get((form_code or '').upper())
+        return filing.fee if filing is not None and filing.fee is not None else fallback
+
+
+class FilingRegistry:
+    """Holds the current Filings snapshot and reloads it when the file changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._filings = None
+        self._mtime = None
+        self._next_check = 0.0
+
+    def _load(self, mtime):
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        return Filings(json.loads(raw), hashlib.sha1(raw).hexdigest()[:12], datetime.utcfromtimestamp(mtime))
+
+    def get(self):
+        """Current snapshot, reloaded if the file changed since the last check"""
+        filings = self._filings
+        now = time.monotonic()
+        if filings is not None and now < self._next_check:
+            return filings
+
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            # A missing file keeps the last good snapshot (or an empty one)
+            if self._filings is None or mtime != self._mtime:
+                try:
+                    self._filings = self._load(mtime)
+                except (OSError, ValueError, TypeError, AttributeError) as e:
+                    logger.error(f"Could not load filing registry {self.path}: {str(e)}")
+                    if self._filings is None:
+                        self._filings = Filings({}, 'empty')
+                self._mtime = mtime
+            self._next_check = now + Config.FILING_REGISTRY_CHECK_INTERVAL
+            return self._filings
+
+    def reload(self):
+        """Re-read the file on the next get()"""
+        with self._lock:
+            self._mtime = None
+            self._next_check = 0.0
+
+
+registry = FilingRegistry(Config.FILING_REGISTRY_PATH)
+
+
+def get_filings():
+    """Current filing registry snapshot"""
+    return registry.get()
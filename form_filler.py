@@ -0,0 +1,691 @@
+"""
+AcroForm filling for the official USCIS PDFs
+
+ImmigrationForm.pdf_url points at the fillable USCIS PDF for a form. The
+first fill fetches it (from static/ or a public http(s) host, see
+safe_fetch.py, at most FORM_TEMPLATE_MAX_BYTES) and stores a normalized
+copy under FORM_TEMPLATE_DIR, which the workers on a host share: decrypted
+(USCIS PDFs carry an owner password), without object streams and with one
+classic cross-reference table. Templates are re-fetched after
+FORM_TEMPLATE_MAX_AGE so new form editions are picked up.
+
+Each worker parses a template once into a FormTemplate (an LRU of
+FORM_TEMPLATE_CACHE_SIZE): the field tree with qualified names, kinds,
+fonts, options and widgets, and every dictionary a fill may change,
+pre-serialized. A fill never parses the PDF again. It appends an
+incremental update to the template bytes: the changed field and widget
+dictionaries, a generated appearance stream per filled text widget, and a
+new cross-reference section. Flattening, in the same pass, draws each
+widget's appearance into its page and drops the form.
+
+Payload keys are full field names ("form1[0].#subform[0].Pt1Line1a_FamilyName[0]")
+or short names without the path and indexes ("Pt1Line1a_FamilyName"); a
+short name fills every field that has it, like the A-Number repeated on
+each page. The XFA copy of the form and any usage-rights signature are
+removed, since viewers would otherwise show the XFA data or reject the
+edited file. Appearances are drawn with the form's own fonts, so
+characters outside Latin-1 show as "?" in the printed value (the field
+value itself keeps them).
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from PyPDF2 import PdfReader
+from PyPDF2.generic import IndirectObject, StreamObject, ArrayObject, DictionaryObject
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.utils import simpleSplit
+from config import Config
+import safe_fetch
+
+logger = logging.getLogger(__name__)
+
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Field flags (PDF 32000-1, 12.7.3)
+FF_MULTILINE = 1 << 12
+FF_RADIO = 1 << 15
+FF_PUSHBUTTON = 1 << 16
+FF_COMB = 1 << 24
+# Annotation flags: Hidden, NoView
+F_NOT_SHOWN = (1 << 1) | (1 << 5)
+
+TRUE_VALUES = {'true', 'yes', 'y', 'on', '1', 'x', 'checked'}
+FALSE_VALUES = {'false', 'no', 'n', 'off', '0', ''}
+
+PADDING = 2  # points between the widget border and its text
+_DA_FONT = re.compile(rb'/([^\s/\[\]()<>]+)\s+([\d.]+)\s+Tf')
+_INDEX = re.compile(r'\[\d+\]$')
+# Entries a fill may replace; the rest of each dictionary is serialized once
+_PATCHED_KEYS = {b'/V', b'/AS', b'/AP', b'/Contents', b'/Resources', b'/Annots', b'/AcroForm', b'/Perms'}
+_ESCAPES = ((b'\\', b'\\\\'), (b'(', b'\\('), (b')', b'\\)'), (b'\r', b'\\r'), (b'\n', b'\\n'))
+
+
+def _serialize(obj):
+    """PDF syntax for a PyPDF2 object (references are kept as "n g R")"""
+    buffer = BytesIO()
+    obj.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+def _entries(obj):
+    """A dictionary's entries as {name: serialized value}, references unresolved"""
+    return {key.encode('latin-1'): _serialize(value) for key, value in obj.items()}
+
+
+def _get(obj, key, default=None):
+    """A dictionary value with references resolved (PyPDF2's get() returns them as is)"""
+    value = obj.get(key)
+    if isinstance(value, IndirectObject):
+        value = value.get_object()
+    return default if value is None else value
+
+
+def _dictionary(entries):
+    return b'<<' + b''.join(key + b' ' + value for key, value in entries.items()) + b'>>'
+
+
+def _number(value):
+    return (b'%.3f' % value).rstrip(b'0').rstrip(b'.')
+
+
+def _literal(data):
+    for char, escaped in _ESCAPES:
+        data = data.replace(char, escaped)
+    return b'(' + data + b')'
+
+
+def pdf_string(text):
+    """A PDF text string: Latin-1 where possible, else UTF-16 with a byte order mark"""
+    try:
+        return _literal(text.encode('latin-1'))
+    except UnicodeEncodeError:
+        return b'<' + (b'\xfe\xff' + text.encode('utf-16-be')).hex().encode() + b'>'
+
+
+def normalize(raw):
+    """Rewrite a PDF as one decrypted revision with a classic cross-reference table
+
+    Object numbers are kept, so references inside the objects stay valid.
+    """
+    reader = PdfReader(BytesIO(raw))
+    if reader.is_encrypted and not reader.decrypt(''):
+        raise ValueError('template requires a password')
+
+    numbers = {}
+    for generation, entries in reader.xref.items():
+        for number in entries:
+            if number and generation != 65535 and generation >= numbers.get(number, 0):
+                numbers[number] = generation
+    for number in reader.xref_objStm:
+        numbers.setdefault(number, 0)
+
+    out = BytesIO()
+    out.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for number in sorted(numbers):
+        obj = reader.get_object(IndirectObject(number, numbers[number], reader))
+        if obj is None or (isinstance(obj, StreamObject) and _get(obj, '/Type') in ('/XRef', '/ObjStm')):
+            continue
+        offsets[number] = out.tell()
+        out.write(b'%d %d obj\n' % (number, numbers[number]))
+        obj.write_to_stream(out, None)
+        out.write(b'\nendobj\n')
+
+    size = max(offsets, default=0) + 1
+    startxref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+    for number in range(1, size):
+        if number in offsets:
+            out.write(b'%010d %05d n \n' % (offsets[number], numbers[number]))
+        else:
+            out.write(b'0000000000 00001 f \n')
+    trailer = {b'/Size': b'%d' % size}
+    for key in ('/Root', '/Info', '/ID'):
+        if key in reader.trailer:
+            trailer[key.encode()] = _serialize(reader.trailer.raw_get(key))
+    out.write(b'trailer\n' + _dictionary(trailer) + b'\nstartxref\n%d\n%%%%EOF\n' % startxref)
+    return out.getvalue()
+
+
+class Appearance:
+    """An appearance stream and the box it is drawn into (form space, after its /Matrix)"""
+    __slots__ = ('ref', 'box')
+
+    def __init__(self, ref, box):
+        self.ref = ref
+        self.box = box
+
+
+class Widget:
+    """One on-page annotation of a field"""
+    __slots__ = ('num', 'page', 'rect', 'shown', 'state', 'on_state', 'appearances', 'size')
+
+    def __init__(self, num, page, rect, shown, state, on_state, appearances):
+        self.num = num
+        self.page = page
+        self.rect = rect  # (x1, y1, x2, y2)
+        self.shown = shown
+        self.state = state  # Current /AS name (bytes) of a check box or radio button
+        self.on_state = on_state  # Its "checked" state name (bytes)
+        self.appearances = appearances  # {state name or None: Appearance}
+        self.size = _number(self.width) + b' ' + _number(self.height)  # For appearance stream boxes
+
+    @property
+    def width(self):
+        return self.rect[2] - self.rect[0]
+
+    @property
+    def height(self):
+        return self.rect[3] - self.rect[1]
+
+
+class Field:
+    """A terminal form field"""
+    __slots__ = ('name', 'short_name', 'kind', 'nums', 'flags', 'da', 'font', 'font_size', 'metrics', 'align',
+                 'max_len', 'options', 'widgets')
+
+    def __init__(self, name, kind, num, flags, da, font, font_size, metrics, align, max_len, options, widgets):
+        self.name = name
+        self.short_name = _INDEX.sub('', name.rsplit('.', 1)[-1])
+        self.kind = kind  # text, checkbox, radio, choice, button, signature
+        self.nums = [num]  # Field dictionaries (several when separate fields share the name)
+        self.flags = flags
+        self.da = da
+        self.font = font
+        self.font_size = font_size
+        self.metrics = metrics  # Standard font used to measure text
+        self.align = align
+        self.max_len = max_len
+        self.options = options
+        self.widgets = widgets
+
+    @property
+    def states(self):
+        """On-state names of a check box or radio group"""
+        return list(OrderedDict.fromkeys(w.on_state.decode('latin-1')[1:] for w in self.widgets if w.on_state))
+
+    def to_dict(self):
+        data = {'name': self.name, 'short_name': self.short_name, 'kind': self.kind}
+        if self.kind in ('checkbox', 'radio'):
+            data['states'] = self.states
+        if self.options:
+            data['options'] = self.options
+        if self.max_len:
+            data['max_len'] = self.max_len
+        return data
+
+
+class FormTemplate:
+    """A normalized fillable PDF, parsed once and filled any number of times"""
+
+    def __init__(self, data):
+        self.data = data if data.endswith(b'\n') else data + b'\n'
+        reader = PdfReader(BytesIO(self.data))
+        self.startxref = int(self.data[self.data.rindex(b'startxref') + 9:].split()[0])
+        self.size = int(reader.trailer['/Size'])
+        self.trailer = {key.encode(): _serialize(reader.trailer.raw_get(key))
+                        for key in ('/Root', '/Info', '/ID') if key in reader.trailer}
+        self._objects = {}  # number -> (generation, fixed entries, {patchable key: value}) of changeable dictionaries
+
+        root_ref = reader.trailer.raw_get('/Root')
+        root = self._remember(root_ref)
+        self.root_num = root_ref.idnum
+        acroform = _get(root, '/AcroForm') or DictionaryObject()
+        self.acroform = {key: value for key, value in _entries(acroform).items()
+                         if key not in (b'/XFA', b'/NeedAppearances')}
+        self._fonts = self._font_resources(acroform)
+
+        # Pages, and the annotations on each
+        self.pages = {}  # page index -> {'num', 'annots', 'resources', 'xobjects', 'contents'}
+        annot_pages = {}
+        for index, page in enumerate(reader.pages):
+            for annot in _get(page, '/Annots') or []:
+                if isinstance(annot, IndirectObject):
+                    annot_pages[annot.idnum] = index
+
+        self.fields = OrderedDict()
+        for ref in _get(acroform, '/Fields') or []:
+            self._walk(ref, '', {}, annot_pages, _get(acroform, '/DA'))
+        self.by_short_name = {}
+        for field in self.fields.values():
+            self.by_short_name.setdefault(field.short_name, []).append(field)
+
+        for index in sorted({w.page for f in self.fields.values() for w in f.widgets if w.page is not None}):
+            self._remember_page(index, reader.pages[index])
+
+    # -- Parsing ---------------------------------------------------------
+
+    def _remember(self, ref):
+        obj = ref.get_object()
+        if ref.idnum not in self._objects:
+            self._store(ref, _entries(obj))
+        return obj
+
+    def _store(self, ref, entries):
+        fixed = b''.join(key + b' ' + value for key, value in entries.items() if key not in _PATCHED_KEYS)
+        self._objects[ref.idnum] = (ref.generation, fixed,
+                                    {key: value for key, value in entries.items() if key in _PATCHED_KEYS})
+
+    @staticmethod
+    def _font_resources(acroform):
+        fonts = {}
+        resources = _get(acroform, '/DR') or {}
+        for name, ref in (_get(resources, '/Font') or {}).items():
+            base = str(_get(ref.get_object(), '/BaseFont', ''))
+            metrics = 'Courier' if 'Courier' in base else 'Times-Roman' if 'Times' in base else 'Helvetica'
+            fonts[name[1:].encode('latin-1')] = (_serialize(ref), metrics)
+        return fonts
+
+    def _walk(self, ref, parent_name, inherited, annot_pages, default_da):
+        node = self._remember(ref)
+        partial = _get(node, '/T')
+        name = f'{parent_name}.{partial}' if parent_name and partial else str(partial or parent_name)
+        inherited = dict(inherited)
+        for key in ('/FT', '/Ff', '/DA', '/Q', '/MaxLen', '/Opt'):
+            if key in node:
+                inherited[key] = node[key]
+
+        kids = _get(node, '/Kids') or []
+        child_fields = [kid for kid in kids if '/T' in kid.get_object()]
+        for kid in child_fields:
+            self._walk(kid, name, inherited, annot_pages, default_da)
+        if child_fields:
+            return
+
+        widget_refs = [kid for kid in kids if kid not in child_fields] if kids else [ref]
+        widgets = [self._widget(widget_ref, annot_pages) for widget_ref in widget_refs
+                   if _get(widget_ref.get_object(), '/Subtype') == '/Widget']
+
+        field_type, flags = _get(inherited, '/FT'), int(_get(inherited, '/Ff', 0))
+        if field_type == '/Tx':
+            kind = 'text'
+        elif field_type == '/Ch':
+            kind = 'choice'
+        elif field_type == '/Sig':
+            kind = 'signature'
+        elif flags & FF_PUSHBUTTON:
+            kind = 'button'
+        else:
+            kind = 'radio' if flags & FF_RADIO else 'checkbox'
+
+        da = str(_get(inherited, '/DA') or default_da or '/Helv 0 Tf 0 g').encode('latin-1')
+        match = _DA_FONT.search(da)
+        font, font_size = (match.group(1), float(match.group(2))) if match else (b'Helv', 0.0)
+        metrics = self._fonts.get(font, (None, 'Helvetica'))[1]
+        options = [str(option[-1] if isinstance(option, ArrayObject) else option)
+                   for option in _get(inherited, '/Opt') or []]
+        if name in self.fields:
+            # Fields with the same name hold the same value (viewers fill them together)
+            self.fields[name].nums.append(ref.idnum)
+            self.fields[name].widgets.extend(widgets)
+            return
+        self.fields[name] = Field(name, kind, ref.idnum, flags, da, font, font_size, metrics,
+                                  int(_get(inherited, '/Q', 0)), int(_get(inherited, '/MaxLen', 0)), options, widgets)
+
+    def _widget(self, ref, annot_pages):
+        widget = self._remember(ref)
+        x1, y1, x2, y2 = (float(value) for value in _get(widget, '/Rect', (0, 0, 0, 0)))
+        # Widgets missing from every page's /Annots are never drawn, so they are not flattened either
+        page = annot_pages.get(ref.idnum)
+
+        appearances, on_state = {}, None
+        normal = _get(_get(widget, '/AP') or {}, '/N')
+        if isinstance(normal, StreamObject):
+            appearances[None] = self._appearance(widget['/AP'].raw_get('/N'), normal)
+        elif isinstance(normal, DictionaryObject):
+            for state, stream_ref in normal.items():
+                state = state.encode('latin-1')
+                if isinstance(stream_ref, IndirectObject):
+                    appearances[state] = self._appearance(stream_ref, stream_ref.get_object())
+                if state != b'/Off' and on_state is None:
+                    on_state = state
+        state = _get(widget, '/AS')
+        return Widget(ref.idnum, page, (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)),
+                      not int(_get(widget, '/F', 0)) & F_NOT_SHOWN,
+                      state.encode('latin-1') if state else None, on_state, appearances)
+
+    @staticmethod
+    def _appearance(ref, stream):
+        x1, y1, x2, y2 = (float(value) for value in _get(stream, '/BBox', (0, 0, 1, 1)))
+        a, b, c, d, e, f = (float(value) for value in _get(stream, '/Matrix', (1, 0, 0, 1, 0, 0)))
+        corners = [(a * x + c * y + e, b * x + d * y + f) for x in (x1, x2) for y in (y1, y2)]
+        xs, ys = [x for x, _ in corners], [y for _, y in corners]
+        return Appearance(_serialize(ref), (min(xs), min(ys), max(xs), max(ys)))
+
+    def _remember_page(self, index, page):
+        ref = page.indirect_reference
+        entries = _entries(page)
+        resources = _get(page, '/Resources') or DictionaryObject()
+        xobjects = _get(resources, '/XObject') or DictionaryObject()
+        self._store(ref, entries)
+        contents = entries.get(b'/Contents', b'')
+        self.pages[index] = {
+            'num': ref.idnum,
+            'annots': [(annot.idnum if isinstance(annot, IndirectObject) else None, _serialize(annot))
+                       for annot in _get(page, '/Annots') or []],
+            'resources': {key: value for key, value in _entries(resources).items() if key != b'/XObject'},
+            'xobjects': b''.join(key + b' ' + value for key, value in _entries(xobjects).items()),
+            # Content stream references, without the array brackets
+            'contents': contents[1:-1] if contents.startswith(b'[') else contents,
+        }
+
+    # -- Filling ---------------------------------------------------------
+
+    def lookup(self, key):
+        """Fields for a payload key: a full field name or a short name"""
+        field = self.fields.get(key)
+        return [field] if field is not None else self.by_short_name.get(key, [])
+
+    def fill(self, values, flatten=False, strict=True):
+        """Filled (and optionally flattened) PDF bytes for {field name: value}
+
+        strict=False skips keys that name no field, for payloads that carry
+        other data too (a PassportApplication, an intake questionnaire).
+        """
+        update = _Update(self)
+        unknown = [key for key in values if not self.lookup(key)]
+        if unknown and strict:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown)[:10])}")
+
+        for key, value in values.items():
+            for field in self.lookup(key):
+                if value is None or field.kind in ('button', 'signature'):
+                    continue
+                if isinstance(value, (dict, list)):
+                    raise ValueError(f'{key}: expected a string, number or boolean')
+                if field.kind in ('checkbox', 'radio'):
+                    update.set_state(field, self._state_for(field, value))
+                else:
+                    update.set_text(field, str(value))
+
+        if flatten:
+            update.flatten()
+        else:
+            update.patch(self.root_num, b'/AcroForm', _dictionary(self.acroform))
+        update.patch(self.root_num, b'/Perms', None)
+        return update.write()
+
+    @staticmethod
+    def _state_for(field, value):
+        """On-state name (bytes) for a check box or radio value, None to clear it"""
+        text = '' if value is False else str(value).strip()
+        for widget in field.widgets:
+            if widget.on_state and text.lower() == widget.on_state.decode('latin-1')[1:].lower():
+                return widget.on_state
+        for option, widget in zip(field.options, field.widgets):
+            if text.lower() == option.lower() and widget.on_state:
+                return widget.on_state
+        states = [w.on_state for w in field.widgets if w.on_state]
+        if value is False or text.lower() in FALSE_VALUES:
+            return None
+        if (value is True or text.lower() in TRUE_VALUES) and len(set(states)) == 1:
+            return states[0]
+        raise ValueError(f"{field.name}: expected one of {', '.join(field.states + field.options) or 'true, false'}")
+
+    def text_appearance(self, field, widget, text):
+        """Content stream (bytes) showing a text value inside a widget"""
+        width, height = widget.width, widget.height
+        inner = width - 2 * PADDING
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        multiline = field.flags & FF_MULTILINE
+
+        size = field.font_size
+        if multiline:
+            auto = not size
+            size = size or min(10.0, max(4.0, height - 2 * PADDING))
+            while True:
+                lines = [line for paragraph in text.split('\n')
+                         for line in (simpleSplit(paragraph, field.metrics, size, inner) or [''])]
+                # Auto size: shrink until every line fits the height
+                if not auto or size <= 4 or len(lines) * size * 1.15 <= height - 2 * PADDING:
+                    break
+                size = max(4.0, size - 1)
+        else:
+            lines = [text.replace('\n', ' ')]
+            if not size:
+                # Auto size: fit the height, then shrink to the width
+                size = max(4.0, min(12.0, (height - 2 * PADDING) * 0.85))
+                text_width = stringWidth(lines[0], field.metrics, size)
+                if text_width > inner > 0:
+                    size = max(4.0, size * inner / text_width)
+
+        da = _DA_FONT.sub(b'/' + field.font + b' ' + _number(size) + b' Tf', field.da, count=1)
+        ops = [b'/Tx BMC', b'q', b'1 1 %s %s re W n' % (_number(width - 2), _number(height - 2)), b'BT', da]
+        comb = field.flags & FF_COMB and field.max_len and not multiline
+        if comb:
+            cell = width / field.max_len
+            y = (height - size) / 2 + 0.22 * size
+            for position, char in enumerate(lines[0][:field.max_len]):
+                x = position * cell + (cell - stringWidth(char, field.metrics, size)) / 2
+                ops.append(b'1 0 0 1 %s %s Tm %s Tj' % (
+                    _number(x), _number(y), _literal(char.encode('latin-1', 'replace'))))
+        else:
+            leading = size * 1.15
+            y = height - PADDING - size if multiline else (height - size) / 2 + 0.22 * size
+            for line in lines:
+                line_width = stringWidth(line, field.metrics, size)
+                x = PADDING if field.align == 0 else (width - line_width) / 2 if field.align == 1 \
+                    else width - PADDING - line_width
+                ops.append(b'1 0 0 1 %s %s Tm %s Tj' % (
+                    _number(x), _number(y), _literal(line.encode('latin-1', 'replace'))))
+                y -= leading
+        ops += [b'ET', b'Q', b'EMC']
+        return b'\n'.join(ops)
+
+    def font_resource(self, field):
+        """Serialized font reference for a field's DA font, if the form defines it"""
+        return self._fonts.get(field.font, (None, None))[0]
+
+
+class _Update:
+    """Objects changed and added by one fill, written as an incremental update"""
+
+    def __init__(self, template):
+        self.template = template
+        self.patches = {}  # number -> {name: serialized value or None to remove}
+        self.objects = []  # bodies of new objects, numbered from template.size
+        self.drawn = {}  # widget number -> Appearance now shown (text widgets that got a new stream)
+        self.states = {}  # widget number -> state name now selected
+        self._fallback_font = None
+
+    def add(self, body):
+        self.objects.append(body)
+        return b'%d 0 R' % (self.template.size + len(self.objects) - 1)
+
+    def patch(self, number, key, value):
+        self.patches.setdefault(number, {})[key] = value
+
+    def set_state(self, field, state):
+        name = state or b'/Off'
+        for number in field.nums:
+            self.patch(number, b'/V', name)
+        for widget in field.widgets:
+            selected = name if widget.on_state == state and state else b'/Off'
+            self.patch(widget.num, b'/AS', selected)
+            self.states[widget.num] = selected
+
+    def set_text(self, field, text):
+        template = self.template
+        value = pdf_string(text)
+        for number in field.nums:
+            self.patch(number, b'/V', value)
+        font = template.font_resource(field) or self.fallback_font()
+        for widget in field.widgets:
+            content = template.text_appearance(field, widget, text)
+            ref = self.add(
+                b'<</Type /XObject /Subtype /Form /BBox [0 0 %s] /Resources <</Font <</%s %s>>>> /Length %d>>\n'
+                b'stream\n%s\nendstream' % (widget.size, field.font, font, len(content), content))
+            self.patch(widget.num, b'/AP', b'<</N ' + ref + b'>>')
+            self.drawn[widget.num] = Appearance(ref, (0.0, 0.0, widget.width, widget.height))
+
+    def fallback_font(self):
+        if self._fallback_font is None:
+            self._fallback_font = self.add(b'<</Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                                           b'/Encoding /WinAnsiEncoding>>')
+        return self._fallback_font
+
+    def flatten(self):
+        """Draw every shown widget into its page and remove the form"""
+        template = self.template
+        by_page = {}
+        for field in template.fields.values():
+            for widget in field.widgets:
+                if widget.page is not None:
+                    by_page.setdefault(widget.page, []).append(widget)
+
+        save = None
+        for index, widgets in by_page.items():
+            page = template.pages[index]
+            names, draws = [], [b'Q']
+            for widget in widgets:
+                appearance = self.drawn.get(widget.num)
+                if appearance is None:
+                    state = self.states.get(widget.num, widget.state)
+                    appearance = widget.appearances.get(None) or widget.appearances.get(state)
+                if appearance is None or not widget.shown:
+                    continue
+                bx1, by1, bx2, by2 = appearance.box
+                sx = widget.width / (bx2 - bx1) if bx2 > bx1 else 1
+                sy = widget.height / (by2 - by1) if by2 > by1 else 1
+                name = b'/Flat%d' % len(names)
+                names.append(name + b' ' + appearance.ref)
+                draws.append(b'q %s 0 0 %s %s %s cm %s Do Q' % (
+                    _number(sx), _number(sy), _number(widget.rect[0] - bx1 * sx),
+                    _number(widget.rect[1] - by1 * sy), name))
+
+            if save is None:
+                save = self.add(b'<</Length 2>>\nstream\nq\n\nendstream')
+            content = b'\n'.join(draws)
+            drawn = self.add(b'<</Length %d>>\nstream\n%s\nendstream' % (len(content), content))
+            resources = dict(page['resources'])
+            resources[b'/XObject'] = b'<<' + page['xobjects'] + b' ' + b' '.join(names) + b'>>'
+            widget_numbers = {widget.num for widget in widgets}
+            annots = [annot for number, annot in page['annots'] if number not in widget_numbers]
+
+            self.patch(page['num'], b'/Contents', b'[' + save + b' ' + page['contents'] + b' ' + drawn + b']')
+            self.patch(page['num'], b'/Resources', _dictionary(resources))
+            self.patch(page['num'], b'/Annots', b'[' + b' '.join(annots) + b']' if annots else None)
+        self.patch(template.root_num, b'/AcroForm', None)
+
+    def write(self):
+        """Template bytes followed by this update"""
+        template = self.template
+        out = [template.data]
+        offset = len(template.data)
+        offsets = {}
+
+        def emit(number, generation, body):
+            nonlocal offset
+            chunk = b'%d %d obj\n%s\nendobj\n' % (number, generation, body)
+            offsets[number] = (offset, generation)
+            out.append(chunk)
+            offset += len(chunk)
+
+        for number, changes in self.patches.items():
+            generation, fixed, patchable = template._objects[number]
+            changes = {**patchable, **changes}
+            emit(number, generation, b'<<' + fixed + b''.join(
+                key + b' ' + value for key, value in changes.items() if value is not None) + b'>>')
+        for position, body in enumerate(self.objects):
+            emit(template.size + position, 0, body)
+
+        xref = [b'xref\n0 1\n0000000000 65535 f \n']
+        numbers = sorted(offsets)
+        start = 0
+        while start < len(numbers):
+            end = start
+            while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+                end += 1
+            xref.append(b'%d %d\n' % (numbers[start], end - start + 1))
+            xref.extend(b'%010d %05d n \n' % offsets[number] for number in numbers[start:end + 1])
+            start = end + 1
+
+        trailer = dict(template.trailer)
+        trailer[b'/Size'] = b'%d' % (template.size + len(self.objects))
+        trailer[b'/Prev'] = b'%d' % template.startxref
+        out += xref
+        out.append(b'trailer\n' + _dictionary(trailer) + b'\nstartxref\n%d\n%%%%EOF\n' % offset)
+        return b''.join(out)
+
+
+def _read_template(url):
+    """Raw bytes of an official PDF from static/ or a public http(s) URL"""
+    return safe_fetch.read_source(url, STATIC_ROOT, Config.FORM_TEMPLATE_MAX_BYTES,
+                                  Config.FORM_TEMPLATE_FETCH_TIMEOUT, 'ImmigrationTemplates form filler')
+
+
+class TemplateStore:
+    """Normalized templates on disk, with an LRU of parsed ones in front"""
+
+    def __init__(self, directory, max_size, max_age):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # url -> (template, expires)
+
+    def _path(self, url):
+        return os.path.join(self.directory, f'{hashlib.sha256(url.encode()).hexdigest()[:32]}.pdf')
+
+    def _download(self, url, path):
+        data = normalize(_read_template(url))
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, url):
+        """Parsed template for a PDF URL, fetched and parsed only when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and time.time() < entry[1]:
+                self._entries.move_to_end(url)
+                return entry[0]
+
+        path = self._path(url)
+        try:
+            fresh = time.time() - os.path.getmtime(path) < self.max_age
+        except OSError:
+            fresh = False
+        if not fresh:
+            try:
+                self._download(url, path)
+            except Exception as e:
+                if not os.path.exists(path):
+                    raise ValueError(f'Could not load form PDF: {str(e)}')
+                # Keep filling from the previous edition until the fetch works again
+                logger.warning(f"Could not refresh form PDF {url}: {str(e)}")
+                os.utime(path)
+
+        with open(path, 'rb') as f:
+            template = FormTemplate(f.read())
+        with self._lock:
+            self._entries[url] = (template, os.path.getmtime(path) + self.max_age)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+store = TemplateStore(Config.FORM_TEMPLATE_DIR, Config.FORM_TEMPLATE_CACHE_SIZE, Config.FORM_TEMPLATE_MAX_AGE)
+
+
+def get_template(url):
+    """Parsed fillable template for a form's pdf_url"""
+    return store.get(url)
+
+
+def fill_form(url, values, flatten=False, strict=True):
+    """Filled PDF bytes for a form's pdf_url and {field name: value}"""
+    return get_template(url).fill(values, flatten, strict)
@@ -1,7 +1,13 @@
 """
 Form Filling Guides - Step-by-step instructions, common mistakes, and tips
 for the most popular immigration forms
+
+FORM_GUIDES is compiled once at import into GUIDE_REGISTRY, keyed by exact
+form code, with each guide's JSON already serialized. The outline and single
+filling_steps parts are serialized the first time they are requested.
 """
+import json
+import hashlib
 
 FORM_GUIDES = {
     'I-130': {
@@ -509,13 +515,77 @@ FORM_GUIDES = {
 }
 
 
-def get_form_guide(form_title):
+def dumps(payload):
+    """Serialize like Flask's default JSON provider (sorted keys, ASCII-escaped)"""
+    return json.dumps(payload, sort_keys=True).encode()
+
+
+class CompiledGuide:
+    """One guide with its JSON pre-serialized"""
+    __slots__ = ('form_code', 'data', 'body', 'part_titles', '_outline', '_parts')
+
+    def __init__(self, form_code, data):
+        self.form_code = form_code
+        self.data = data
+        self.body = dumps(data)
+        self.part_titles = tuple(step['part'] for step in data.get('filling_steps', []))
+        self._outline = None
+        self._parts = {}
+
+    def outline(self):
+        """Serialized guide with each filling_steps part reduced to its title"""
+        if self._outline is None:
+            outline = {key: value for key, value in self.data.items() if key != 'filling_steps'}
+            outline['form_code'] = self.form_code
+            outline['parts'] = [
+                {'index': index, 'part': title, 'instruction_count': len(step.get('instructions', []))}
+                for index, (title, step) in enumerate(zip(self.part_titles, self.data.get('filling_steps', [])))
+            ]
+            self._outline = dumps(outline)
+        return self._outline
+
+    def part(self, index):
+        """Serialized filling_steps part, or None if index is out of range"""
+        if not 0 <= index < len(self.part_titles):
+            return None
+        body = self._parts.get(index)
+        if body is None:
+            body = self._parts[index] = dumps({
+                'form_code': self.form_code,
+                'index': index,
+                'total': len(self.part_titles),
+                'part': self.data['filling_steps'][index],
+            })
+        return body
+
+
+def compile_guides(guides):
+    """Registry of CompiledGuide keyed by exact (upper-case) form code"""
+    return {form_code.upper(): CompiledGuide(form_code.upper(), data) for form_code, data in guides.items()}
+
+
+GUIDE_REGISTRY = compile_guides(FORM_GUIDES)
+
+# Changes whenever any guide's content changes (used to version derived indexes)
+GUIDES_VERSION = hashlib.sha1(b''.join(
+    GUIDE_REGISTRY[form_code].body for form_code in sorted(GUIDE_REGISTRY)
+)).hexdigest()[:12]
+
+
+def get_compiled_guide(form_number):
+    """
+    Get the compiled guide for a form number (e.g. "I-130")
+    Returns None if guide not available
+    """
+    if not form_number:
+        return None
+    return GUIDE_REGISTRY.get(form_number.upper())
+
+
+def get_form_guide(form_number):
     """
-    Get the filling guide for a specific form
+    Get the filling guide for a form number (e.g. "I-130")
     Returns None if guide not available
     """
-    # Extract form number from title (e.g., "Form I-130" -> "I-130")
-    for form_code in FORM_GUIDES.keys():
-        if form_code in form_title:
-            return FORM_GUIDES[form_code]
-    return None
+    guide = get_compiled_guide(form_number)
+    return guide.data if guide else None
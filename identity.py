@@ -0,0 +1,111 @@
+"""
+Request-scoped identity loader
+
+Loads the current user, their active team membership and the set of
+standalone tools they have purchased in a single query, and memoizes the
+result on flask.g so every hook, decorator and route in a request shares it.
+"""
+from flask import g, session
+from sqlalchemy import and_
+from models import db, User, OneTimePurchase
+from team_models import TeamMembership
+import entitlements
+
+
+class Identity:
+    """Current user plus the related rows access checks need"""
+
+    def __init__(self, user=None, membership=None, purchased_tools=()):
+        self.user = user
+        self.membership = membership
+        self.purchased_tools = frozenset(purchased_tools)
+        self._entitlements = None
+
+    def __repr__(self):
+        return f'<Identity {self.user.email if self.user else "anonymous"}>'
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None
+
+    def has_purchased(self, tool_type):
+        """Check if the user completed a one-time purchase of a tool"""
+        return tool_type in self.purchased_tools
+
+    @property
+    def entitlements(self):
+        """Compiled capability set for the user (see entitlements.py)"""
+        if self._entitlements is None:
+            self._entitlements = entitlements.for_user(self.user, self.purchased_tools)
+        return self._entitlements
+
+
+ANONYMOUS = Identity()
+
+
+def _query_identity(clerk_user_id):
+    """Load user, active membership and completed purchases in one round trip"""
+    rows = db.session.query(User, TeamMembership, OneTimePurchase.tool_type).outerjoin(
+        TeamMembership,
+        and_(TeamMembership.user_id == User.id, TeamMembership.status == 'active')
+    ).outerjoin(
+        OneTimePurchase,
+        and_(OneTimePurchase.user_id == User.id, OneTimePurchase.status == 'completed')
+    ).filter(
+        User.clerk_user_id == clerk_user_id
+    ).order_by(TeamMembership.id).all()
+
+    if not rows:
+        return ANONYMOUS
+
+    user, membership, _ = rows[0]
+    purchased_tools = {tool_type for _, _, tool_type in rows if tool_type}
+    return Identity(user, membership, purchased_tools)
+
+
+def _query_user_only(clerk_user_id):
+    """Fallback for databases that predate the team/purchase tables"""
+    try:
+        user = User.query.filter_by(clerk_user_id=clerk_user_id).first()
+        return Identity(user) if user else ANONYMOUS
+    except Exception:
+        # Database tables don't exist yet
+        db.session.rollback()
+        return ANONYMOUS
+
+
+def load_identity():
+    """Get the identity for the current request, loading it at most once"""
+    clerk_user_id = session.get('clerk_user_id')
+
+    # Re-load if the session changed mid-request (login/logout)
+    if getattr(g, '_identity_key', None) == clerk_user_id and '_identity' in g:
+        return g._identity
+
+    identity = ANONYMOUS
+    if clerk_user_id:
+        try:
+            identity = _query_identity(clerk_user_id)
+        except Exception:
+            db.session.rollback()
+            identity = _query_user_only(clerk_user_id)
+
+    g._identity = identity
+    g._identity_key = clerk_user_id
+    return identity
+
+
+def reset_identity():
+    """Drop the memoized identity (after changing the user's rows mid-request)"""
+    g.pop('_identity', None)
+    g.pop('_identity_key', None)
+
+
+def get_current_user():
+    """Get current user from session"""
+    return load_identity().user
+
+
+def get_entitlements():
+    """Get the compiled entitlements for the current request"""
+    return load_identity().entitlements
@@ -1,11 +1,12 @@
 from app import create_app
 from models import db, ImmigrationForm
-from document_models import PassportApplication, DocumentProcessingTransaction, FileCompressionJob
+from document_models import PassportApplication, DocumentProcessingTransaction, FileCompressionJob, RenderJob
 from datetime import datetime
 
-def init_database():
+def init_database(app=None):
     """Initialize database and migrate existing forms data"""
-    app, limiter = create_app()
+    if app is None:
+        app, limiter = create_app()
 
     with app.app_context():
         # Drop all tables and recreate (for development)
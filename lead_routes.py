@@ -1,6 +1,7 @@
 """Routes for lead generation and email capture"""
 from flask import render_template, jsonify, request, send_file
 from models import db, EmailLead
+from page_cache import cached_page
 from datetime import datetime
 import re
 import os
@@ -21,6 +22,7 @@ def register_lead_routes(app, limiter):
             print(f"⚠️ Warning: Could not generate PDF: {e}", flush=True)
 
     @app.route('/free-i130-checklist')
+    @cached_page
     def free_i130_checklist():
         """Landing page for free I-130 checklist"""
         return render_template('free_i130_checklist.html')
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the composite indexes behind the hot lookups
+
+Covers compression usage limits, one-time purchase checks, team membership
+and invitation lookups, Stripe webhook lookups and passport listings.
+On PostgreSQL the indexes are built CONCURRENTLY so production tables stay
+writable while the migration runs. Safe to re-run (IF NOT EXISTS).
+"""
+from app import app
+from models import db, User, Subscription, OneTimePurchase
+from team_models import TeamMembership, TeamInvitation
+from document_models import PassportApplication, FileCompressionJob
+
+INDEXED_MODELS = [
+    User,
+    Subscription,
+    OneTimePurchase,
+    TeamMembership,
+    TeamInvitation,
+    PassportApplication,
+    FileCompressionJob,
+]
+
+
+def index_ddl(index, concurrently=False):
+    """Build a CREATE INDEX statement for a model index"""
+    columns = ', '.join(column.name for column in index.columns)
+    unique = 'UNIQUE ' if index.unique else ''
+    concurrent = 'CONCURRENTLY ' if concurrently else ''
+    return (
+        f'CREATE {unique}INDEX {concurrent}IF NOT EXISTS {index.name} '
+        f'ON {index.table.name} ({columns})'
+    )
+
+
+def migrate():
+    """Create any missing indexes declared on the models"""
+    with app.app_context():
+        # Create any missing tables first (their indexes come with them)
+        db.create_all()
+
+        is_postgres = db.engine.dialect.name == 'postgresql'
+
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for model in INDEXED_MODELS:
+                for index in sorted(model.__table__.indexes, key=lambda i: i.name):
+                    try:
+                        conn.execute(db.text(index_ddl(index, concurrently=is_postgres)))
+                        print(f"✓ {index.name}")
+                    except Exception as e:
+                        print(f"❌ Error creating {index.name}: {e}")
+
+            # Refresh planner statistics so the new indexes get picked up
+            conn.execute(db.text('ANALYZE'))
+
+        print("\n✅ Index migration complete!")
+
+
+if __name__ == '__main__':
+    migrate()
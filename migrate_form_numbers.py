@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Migration script to add form_number and checklist_count to immigration_forms
+
+Both columns are derived (from the title and the checklist JSON) and are kept
+up to date by ImmigrationForm on every write; this script adds them to
+existing databases and backfills the rows already there. Safe to re-run.
+"""
+from app import app
+from models import db, ImmigrationForm, extract_form_number
+
+
+def add_column(name, ddl):
+    """Add a column to immigration_forms if it doesn't exist yet"""
+    try:
+        db.session.execute(db.text(f'ALTER TABLE immigration_forms ADD COLUMN {name} {ddl}'))
+        db.session.commit()
+        print(f"✓ Added {name} column to immigration_forms table")
+    except Exception as e:
+        db.session.rollback()
+        if 'already exists' in str(e) or 'duplicate column' in str(e).lower():
+            print(f"⚠️  {name} column already exists")
+        else:
+            raise
+
+
+def migrate():
+    """Add the derived columns, index form_number and backfill existing rows"""
+    with app.app_context():
+        db.create_all()
+
+        try:
+            add_column('form_number', 'VARCHAR(20)')
+            add_column('checklist_count', 'INTEGER DEFAULT 0')
+        except Exception as e:
+            print(f"❌ Error adding columns: {e}")
+            return
+
+        db.session.execute(db.text(
+            'CREATE INDEX IF NOT EXISTS ix_immigration_forms_form_number ON immigration_forms (form_number)'
+        ))
+        db.session.commit()
+        print("✓ ix_immigration_forms_form_number")
+
+        # Backfill from the source columns
+        updated = 0
+        for form in ImmigrationForm.query.all():
+            form_number = extract_form_number(form.title) or None
+            checklist_count = len(form.get_checklist())
+            if form.form_number != form_number or form.checklist_count != checklist_count:
+                form.form_number = form_number
+                form.checklist_count = checklist_count
+                updated += 1
+        db.session.commit()
+        print(f"✓ Backfilled {updated} form(s)")
+
+        print("\n✅ Form number migration complete!")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Migration script to move JSON text columns to native JSON storage
+
+Converts immigration_forms.checklist, passport_applications.additional_data
+and document_processing_transactions.extra_metadata:
+  - PostgreSQL: TEXT -> JSONB (USING col::jsonb), plus GIN indexes on
+    checklist and additional_data
+  - SQLite: already stored as JSON1 text; empty strings become NULL so the
+    JSON type can load every row
+Safe to re-run.
+"""
+from app import app
+from models import db, ImmigrationForm
+from document_models import PassportApplication
+
+JSON_COLUMNS = [
+    ('immigration_forms', 'checklist'),
+    ('passport_applications', 'additional_data'),
+    ('document_processing_transactions', 'extra_metadata'),
+]
+
+GIN_INDEXED_MODELS = [ImmigrationForm, PassportApplication]
+
+
+def column_type(table, column):
+    """Current PostgreSQL data type of a column"""
+    return db.session.execute(db.text(
+        'SELECT data_type FROM information_schema.columns '
+        'WHERE table_name = :table AND column_name = :column'
+    ), {'table': table, 'column': column}).scalar()
+
+
+def migrate_postgresql():
+    for table, column in JSON_COLUMNS:
+        if column_type(table, column) == 'jsonb':
+            print(f"⚠️  {table}.{column} is already JSONB")
+            continue
+        db.session.execute(db.text(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING NULLIF({column}, '')::jsonb"
+        ))
+        db.session.commit()
+        print(f"✓ Converted {table}.{column} to JSONB")
+
+    for model in GIN_INDEXED_MODELS:
+        for index in model.__table__.indexes:
+            if index.kwargs.get('postgresql_using') != 'gin':
+                continue
+            columns = ', '.join(column.name for column in index.columns)
+            db.session.execute(db.text(
+                f'CREATE INDEX IF NOT EXISTS {index.name} ON {index.table.name} USING gin ({columns})'
+            ))
+            db.session.commit()
+            print(f"✓ {index.name}")
+
+
+def migrate_sqlite():
+    for table, column in JSON_COLUMNS:
+        result = db.session.execute(db.text(f"UPDATE {table} SET {column} = NULL WHERE {column} = ''"))
+        invalid = db.session.execute(db.text(
+            f'SELECT COUNT(*) FROM {table} WHERE {column} IS NOT NULL AND NOT json_valid({column})'
+        )).scalar()
+        db.session.commit()
+        print(f"✓ {table}.{column}: cleared {result.rowcount} empty value(s)")
+        if invalid:
+            print(f"❌ {table}.{column}: {invalid} row(s) hold invalid JSON - fix them by hand")
+
+
+def migrate():
+    """Convert the JSON text columns in place"""
+    with app.app_context():
+        db.create_all()
+
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                migrate_postgresql()
+            else:
+                migrate_sqlite()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error migrating JSON columns: {e}")
+            return
+
+        print("\n✅ JSON column migration complete!")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Migration script to point passport applications at the streamed PDF endpoint
+
+Passport PDFs used to be written to static/uploads/passports/ and linked by
+their public static URL. They are now rendered by a background job and
+served by /api/passport/applications/<id>/pdf, so this script rewrites the
+stored pdf_url of existing applications to that endpoint. The old files can be
+deleted afterwards. Safe to re-run.
+"""
+from flask import url_for
+from app import app
+from models import db
+from document_models import PassportApplication
+
+STATIC_PREFIX = '/static/uploads/passports/'
+
+
+def migrate():
+    """Rewrite static pdf_url values to the streaming endpoint"""
+    with app.app_context(), app.test_request_context():
+        applications = PassportApplication.query.filter(
+            PassportApplication.pdf_url.like(f'{STATIC_PREFIX}%')
+        ).all()
+        for application in applications:
+            application.pdf_url = url_for('download_passport_pdf', app_id=application.id)
+        db.session.commit()
+        print(f"✓ Updated pdf_url for {len(applications)} passport application(s)")
+
+        print("\n✅ Passport PDF URL migration complete!")
+        print(f"⚠️  Files under static{STATIC_PREFIX[len('/static'):]} are no longer used and can be removed")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,14 @@
+"""Migration script to create the render_jobs table (see render_jobs.py)"""
+from app import app
+from models import db
+from document_models import RenderJob
+
+def migrate():
+    """Create render_jobs table"""
+    with app.app_context():
+        # Creates only missing tables
+        db.create_all()
+        print("✅ render_jobs table created successfully!")
+
+if __name__ == '__main__':
+    migrate()
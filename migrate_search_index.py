@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Migration script to create and fill the full-text search index
+
+Creates search_documents (PostgreSQL: tsvector column with a GIN index;
+SQLite: FTS5 table) and indexes every form, filling guide and template.
+The app rebuilds the index by itself when the catalog changes, so this only
+avoids doing the first build inside a request. Safe to re-run.
+"""
+from app import app
+import search
+
+
+def migrate():
+    """Create the search tables and build the index"""
+    with app.app_context():
+        try:
+            count = search.rebuild()
+        except Exception as e:
+            print(f"❌ Error building search index: {e}")
+            return
+
+        print(f"✓ Indexed {count} document(s)")
+        print("\n✅ Search index migration complete!")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -1,9 +1,50 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
 from datetime import datetime
-import json
+import re
+import entitlements
 
 db = SQLAlchemy()
 
+# Native JSON storage: JSONB on PostgreSQL, JSON1 text on SQLite
+JSONType = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
+
+class json_array_head(FunctionElement):
+    """SQL expression for the first n items of a JSON array column"""
+    type = JSONType
+    inherit_cache = True
+
+    def __init__(self, column, n):
+        self.n = n
+        super().__init__(column)
+
+
+@compiles(json_array_head, 'postgresql')
+def _json_array_head_postgresql(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"jsonb_path_query_array({column}, '$[0 to {int(element.n) - 1}]')"
+
+
+@compiles(json_array_head)
+def _json_array_head_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"(SELECT json_group_array(value) FROM json_each({column}) WHERE key < {int(element.n)})"
+
+
+# "Form I-130 - Description" -> "I-130"
+FORM_NUMBER_RE = re.compile(r'Form\s+([\w-]+)')
+
+
+def extract_form_number(title):
+    """Extract the form number from a form title (empty string if none)"""
+    match = FORM_NUMBER_RE.search(title or '')
+    return match.group(1) if match else ''
+
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -16,7 +57,7 @@ class User(db.Model):
     subscription_tier = db.Column(db.String(50), default='free')  # free, complete, agency (+ legacy: basic, pro, enterprise)
     subscription_status = db.Column(db.String(50), default='inactive')  # active, inactive, cancelled, past_due
     stripe_customer_id = db.Column(db.String(255), unique=True)
-    stripe_subscription_id = db.Column(db.String(255))
+    stripe_subscription_id = db.Column(db.String(255), index=True)  # Webhook lookups
     subscription_ends_at = db.Column(db.DateTime)
 
     # Timestamps
@@ -44,50 +85,23 @@ class User(db.Model):
 
     def can_access_form(self, form):
         """Check if user can access a specific form based on their subscription"""
-        if form.access_level == 'free':
-            return True
-
-        tier_hierarchy = {
-            'free': 0,
-            'complete': 2,      # Complete Package: full access (one-time payment)
-            'agency': 3,        # Immigration Preparer: full access + team features
-            # Legacy tiers (backward compatibility)
-            'basic': 1,
-            'pro': 2,
-            'enterprise': 3
-        }
-
-        user_tier = tier_hierarchy.get(self.subscription_tier, 0)
-        required_tier = tier_hierarchy.get(form.access_level, 0)
-
-        return user_tier >= required_tier and self.has_active_subscription()
+        return entitlements.for_user(self).can_access_level(form.access_level)
 
     def can_access_template(self, template):
         """Check if user can access a specific template based on their subscription"""
-        if template.access_level == 'free':
-            return True
-
-        tier_hierarchy = {
-            'free': 0,
-            'complete': 2,      # Complete Package: full access (one-time payment)
-            'agency': 3,        # Immigration Preparer: full access + team features
-            # Legacy tiers (backward compatibility)
-            'basic': 1,
-            'pro': 2,
-            'enterprise': 3
-        }
-
-        user_tier = tier_hierarchy.get(self.subscription_tier, 0)
-        required_tier = tier_hierarchy.get(template.access_level, 0)
-
-        return user_tier >= required_tier and self.has_active_subscription()
+        return entitlements.for_user(self).can_access_level(template.access_level)
 
 
 class ImmigrationForm(db.Model):
     __tablename__ = 'immigration_forms'
+    __table_args__ = (
+        # Containment/key queries on checklist items (JSONB only)
+        db.Index('ix_immigration_forms_checklist_gin', 'checklist', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(500), nullable=False)
+    form_number = db.Column(db.String(20), index=True)  # Derived from title, e.g. "I-130"
     category = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
     pdf_url = db.Column(db.String(500))
@@ -102,7 +116,8 @@ class ImmigrationForm(db.Model):
     access_level = db.Column(db.String(50), default='free')  # free, basic (paid access)
 
     # Checklist stored as JSON
-    checklist = db.Column(db.Text)  # JSON array of checklist items
+    checklist = db.Column(JSONType)  # JSON array of checklist items
+    checklist_count = db.Column(db.Integer, default=0)  # Derived from checklist
 
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -111,15 +126,28 @@ class ImmigrationForm(db.Model):
     def __repr__(self):
         return f'<ImmigrationForm {self.title}>'
 
+    @validates('title')
+    def _derive_form_number(self, key, title):
+        self.form_number = extract_form_number(title) or None
+        return title
+
+    @validates('checklist')
+    def _derive_checklist_count(self, key, checklist):
+        self.checklist_count = len(checklist) if checklist else 0
+        return checklist
+
+    @classmethod
+    def checklist_preview(cls, n):
+        """SQL expression for the first n checklist items (computed by the database)"""
+        return json_array_head(cls.checklist, n)
+
     def get_checklist(self):
-        """Parse checklist JSON to Python list"""
-        if self.checklist:
-            return json.loads(self.checklist)
-        return []
+        """Get checklist items as a Python list"""
+        return self.checklist or []
 
     def set_checklist(self, checklist_items):
-        """Convert Python list to JSON for storage"""
-        self.checklist = json.dumps(checklist_items)
+        """Replace the checklist (assign a new list so the change is tracked)"""
+        self.checklist = list(checklist_items)
 
     def to_dict(self, include_checklist=True):
         """Convert form to dictionary"""
@@ -134,6 +162,8 @@ class ImmigrationForm(db.Model):
             'fee': self.fee,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None,
             'access_level': self.access_level,
+            'form_number': self.form_number,
+            'checklist_count': self.checklist_count,
         }
 
         if include_checklist:
@@ -145,6 +175,10 @@ class ImmigrationForm(db.Model):
 class Subscription(db.Model):
     """Track subscription history and changes"""
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        # Webhooks look up the latest record for a Stripe subscription
+        db.Index('ix_subscriptions_stripe_sub_started', 'stripe_subscription_id', 'started_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -164,6 +198,10 @@ class Subscription(db.Model):
 class OneTimePurchase(db.Model):
     """Track one-time purchases of standalone tools (passport, travel history, etc.)"""
     __tablename__ = 'one_time_purchases'
+    __table_args__ = (
+        # Access checks filter on (user_id, tool_type, status)
+        db.Index('ix_one_time_purchases_user_tool_status', 'user_id', 'tool_type', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
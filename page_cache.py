@@ -0,0 +1,138 @@
+"""
+Rendered-output cache for the public marketing pages
+
+/, /forms, /pricing, /privacy, /terms, /templates and /free-i130-checklist
+render the same HTML for every anonymous visitor, so their output is rendered
+once per (path, branding, templates version) and kept in memory as raw bytes
+plus one precompressed copy per encoding (see compression.py), each with its
+own strong ETag.
+
+Logged-in requests always render: the navbar shows the user's name and tier
+(and team owners' white-label branding), so those pages are not shareable.
+
+Cached pages are dropped when:
+- any file in the templates folder changes (mtime re-checked at most once
+  per PAGE_CACHE_CHECK_INTERVAL; a deploy also starts with an empty cache),
+- branding.invalidate_all() bumps the branding generation, or
+- invalidate() is called.
+"""
+import os
+import time
+import hashlib
+import threading
+from functools import wraps
+from flask import current_app, request, session, g
+from config import Config
+import branding
+import compression
+
+
+class CachedPage:
+    """One rendered page as raw and precompressed bytes"""
+    __slots__ = ('body', 'encoded', 'etag', 'mimetype')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.encoded = {
+            encoding: compression.compress(body, encoding, 'static')
+            for encoding in compression.available_encodings()
+        }
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.mimetype = mimetype
+
+
+class PageCache:
+    """Thread-safe store of rendered pages, emptied whenever its version changes"""
+
+    def __init__(self, max_pages=200):
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._version = None
+        self._templates_mtime = None
+        self._next_check = 0.0
+
+    def templates_mtime(self, app):
+        """Newest mtime in the templates folder (re-scanned at most once per check interval)"""
+        now = time.monotonic()
+        if self._templates_mtime is None or now >= self._next_check:
+            folder = os.path.join(app.root_path, app.template_folder)
+            self._templates_mtime = max(
+                (entry.stat().st_mtime for entry in os.scandir(folder) if entry.is_file()),
+                default=0
+            )
+            self._next_check = now + Config.PAGE_CACHE_CHECK_INTERVAL
+        return self._templates_mtime
+
+    def version(self, app):
+        return self.templates_mtime(app), branding.generation()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._pages.clear()
+                self._version = version
+            return self._pages.get(key)
+
+    def set(self, key, version, page):
+        with self._lock:
+            if version != self._version:
+                return
+            if len(self._pages) >= self.max_pages:
+                # Only reachable through unexpected key churn; start over rather than track recency
+                self._pages.clear()
+            self._pages[key] = page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._version = None
+
+
+cache = PageCache()
+
+
+def invalidate():
+    """Drop every cached page"""
+    cache.clear()
+
+
+def respond(page, hit=True):
+    """Response for a cached page (compressed if accepted), or a 304 if the caller's copy is current"""
+    encoding = compression.negotiate(request.accept_encodings)
+    if encoding:
+        response = current_app.response_class(page.encoded[encoding], mimetype=page.mimetype)
+        response.content_encoding = encoding
+        response.set_etag(f'{page.etag}-{compression.SUFFIXES[encoding]}')
+    else:
+        response = current_app.response_class(page.body, mimetype=page.mimetype)
+        response.set_etag(page.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.PAGE_CACHE_MAX_AGE
+    response.vary.update(['Cookie', 'Accept-Encoding'])
+    response.headers['X-Page-Cache'] = 'hit' if hit else 'miss'
+    return response.make_conditional(request)
+
+
+def cached_page(view):
+    """Serve a view's anonymous output from the page cache"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        if not Config.PAGE_CACHE_ENABLED or request.method != 'GET' or 'clerk_user_id' in session:
+            return view(*args, **kwargs)
+
+        app = current_app._get_current_object()
+        version = cache.version(app)
+        page_branding = getattr(g, 'branding', branding.DEFAULT_BRANDING)
+        key = (request.path, tuple(sorted(page_branding.items())))
+        page = cache.get(key, version)
+        if page is not None:
+            return respond(page)
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+        page = CachedPage(response.get_data(), response.mimetype)
+        cache.set(key, version, page)
+        return respond(page, hit=False)
+    return decorated_function
@@ -1,22 +1,17 @@
 """Routes for passport application processing"""
-from flask import jsonify, request, render_template, session
+from flask import jsonify, request, render_template, session, url_for
 from functools import wraps
 from datetime import datetime
 from document_models import PassportApplication, DocumentProcessingTransaction
 from models import db, User
 from config import Config
+from identity import load_identity, get_current_user
+import pdf_delivery
 import stripe
 
 def register_passport_routes(app, limiter):
     """Register all passport-related routes"""
 
-    def get_current_user():
-        """Get current user from session"""
-        clerk_user_id = session.get('clerk_user_id')
-        if clerk_user_id:
-            return User.query.filter_by(clerk_user_id=clerk_user_id).first()
-        return None
-
     def login_required(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -29,25 +24,13 @@ def register_passport_routes(app, limiter):
         """Check if user has subscription tier that allows document processing OR purchased standalone tool"""
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            from models import OneTimePurchase
-
-            user = get_current_user()
+            identity = load_identity()
+            user = identity.user
             if not user:
                 return jsonify({'error': 'Authentication required'}), 401
 
-            # Check if user's tier allows document processing
-            tier_info = Config.SUBSCRIPTION_TIERS.get(user.subscription_tier, {})
-            has_subscription_access = tier_info.get('document_processing', False)
-
-            # Check if user purchased passport tool as standalone
-            has_passport_purchase = OneTimePurchase.query.filter_by(
-                user_id=user.id,
-                tool_type='passport',
-                status='completed'
-            ).first() is not None
-
-            # Allow access if either subscription or standalone purchase
-            if not has_subscription_access and not has_passport_purchase:
+            # Allow access if the tier includes document processing or the tool was purchased standalone
+            if not identity.entitlements.can_use_tool('passport'):
                 return jsonify({
                     'error': 'Access required',
                     'message': 'Purchase Passport Application Processing ($12) or upgrade to Complete Package to access this tool',
@@ -296,13 +279,20 @@ def register_passport_routes(app, limiter):
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    def passport_job_inputs(application):
+        """Render job inputs for an application's DS-11 guide"""
+        # The job marks the application completed and sets pdf_url once rendered
+        return {
+            'application_id': application.id,
+            'pdf_url': url_for('download_passport_pdf', app_id=application.id)
+        }
+
     @app.route('/api/passport/applications/<int:app_id>/generate-pdf', methods=['POST'])
     @login_required
     @subscription_required_for_doc_processing
     def generate_passport_pdf(app_id):
-        """Generate PDF for paid passport application"""
-        from pdf_generator import PassportPDFGenerator
-        import os
+        """Queue PDF generation for a paid passport application"""
+        import render_jobs
 
         user = get_current_user()
         application = PassportApplication.query.filter_by(id=app_id, user_id=user.id).first_or_404()
@@ -312,31 +302,37 @@ def register_passport_routes(app, limiter):
             return jsonify({'error': 'Application must be paid before generating PDF'}), 400
 
         try:
-            # Create uploads directory if it doesn't exist
-            uploads_dir = os.path.join(app.root_path, 'static', 'uploads', 'passports')
-            os.makedirs(uploads_dir, exist_ok=True)
-
-            # Generate PDF
-            generator = PassportPDFGenerator()
-            pdf_elements = generator.generate(application.to_dict())
-
-            # Save PDF
-            filename = f"passport_application_{application.id}_{user.id}.pdf"
-            filepath = os.path.join(uploads_dir, filename)
-            generator.save_to_file(pdf_elements, filepath)
-
-            # Update application with PDF URL
-            application.pdf_url = f"/static/uploads/passports/{filename}"
-            application.status = 'completed'
-            application.completed_at = datetime.utcnow()
-            db.session.commit()
+            job = render_jobs.submit('passport', user.id, passport_job_inputs(application),
+                                     f"passport_application_{application.id}.pdf")
+            return jsonify(render_jobs.job_status(job)), 202
 
-            return jsonify({
-                'success': True,
-                'message': 'PDF generated successfully',
-                'pdf_url': application.pdf_url,
-                'application': application.to_dict()
-            })
+        except Exception as e:
+            return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
+    @app.route('/api/passport/applications/<int:app_id>/pdf')
+    @login_required
+    @subscription_required_for_doc_processing
+    def download_passport_pdf(app_id):
+        """Serve the PDF rendered by the application's latest job (re-queued once it has expired)
+
+        Answers 202 with the job status while a render is pending; the PDF is
+        never rendered inside this request.
+        """
+        import render_jobs
+
+        user = get_current_user()
+        application = PassportApplication.query.filter_by(id=app_id, user_id=user.id).first_or_404()
+
+        if application.payment_status != 'paid':
+            return jsonify({'error': 'Application must be paid before generating PDF'}), 400
+
+        filename = f"passport_application_{application.id}.pdf"
+        inputs = passport_job_inputs(application)
+        pdf = render_jobs.stored_output(user.id, 'passport', inputs)
+        if pdf is not None:
+            return pdf_delivery.pdf_response(pdf, filename, as_attachment=False)
+        try:
+            job = render_jobs.submit('passport', user.id, inputs, filename)
         except Exception as e:
             return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+        return jsonify(render_jobs.job_status(job)), 202
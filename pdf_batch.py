@@ -0,0 +1,141 @@
+"""
+Batch document generation across a process pool
+
+Agency-tier firms prepare the same packet for many clients. POST
+/api/documents/batch takes a list of inputs for one generator (cover
+letters, I-94 histories or checklists), renders them in parallel in a pool
+of BATCH_RENDER_PROCESSES processes and answers with either one combined PDF
+with a bookmark per document or a ZIP that is streamed as documents finish.
+Items are type-checked before anything is rendered; a render that still
+fails once the ZIP has started is written into the archive as an error note
+in place of its PDF, so the archive stays valid.
+
+reportlab layout is pure Python and holds the GIL, so threads would not
+render in parallel; separate processes scale with cores (see
+python benchmarks.py batch). The pool is started on first use in each
+gunicorn worker, with forkserver where available so children do not inherit
+the worker's threads. Children only import the PDF modules: items are plain
+dicts and the results are PDF bytes.
+"""
+import re
+import logging
+import zipfile
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader, PdfWriter
+from config import Config
+from pdf_generator import ChecklistPDFGenerator, CoverLetterGenerator, I94HistoryGenerator
+import pdf_branding
+
+BATCH_TYPES = ('cover_letter', 'i94_history', 'checklist')
+FORMATS = ('pdf', 'zip')
+FAILED_NOTE = 'This document could not be generated. Please try it again on its own.\n'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _render(generator, *args):
+    return generator.save_to_bytes(generator.generate(*args)).getvalue()
+
+
+def render_item(job_type, inputs):
+    """Render one batch item to PDF bytes (runs in a pool process)"""
+    # Profiles (and their decoded logos) are cached per pool process
+    branding = pdf_branding.profile_for_branding(inputs.get('branding'))
+    if job_type == 'cover_letter':
+        return _render(CoverLetterGenerator(branding=branding), inputs['user_data'], inputs['form_info'])
+    if job_type == 'i94_history':
+        return _render(I94HistoryGenerator(branding=branding), inputs['user_data'], inputs['travel_history'], inputs.get('summary'))
+    if job_type == 'checklist':
+        generator = ChecklistPDFGenerator(branding=branding)
+        return _render(generator, inputs['form_title'], inputs['checklist_items'], inputs.get('user_name'))
+    raise ValueError(f'Unknown batch type: {job_type}')
+
+
+def create_executor(processes):
+    """A process pool for batch rendering"""
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = create_executor(Config.BATCH_RENDER_PROCESSES)
+    return _executor
+
+
+def render_all(job_type, items, executor=None):
+    """Render items in parallel, yielding PDF bytes in input order"""
+    executor = executor or get_executor()
+    return executor.map(render_item, [job_type] * len(items), items)
+
+
+def submit_all(job_type, items, executor=None):
+    """Start rendering items in parallel, returning one future per item in input order"""
+    executor = executor or get_executor()
+    return [executor.submit(render_item, job_type, item) for item in items]
+
+
+def combine(titles, documents):
+    """One PDF with every document, bookmarked by title"""
+    writer = PdfWriter()
+    for title, body in zip(titles, documents):
+        writer.append(PdfReader(BytesIO(body)), outline_item=title)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class _ChunkBuffer:
+    """Write-only sink that hands out what has been written so far"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(filenames, renders):
+    """Yield a ZIP archive of the rendered documents as each future finishes"""
+    buffer = _ChunkBuffer()
+    try:
+        # PDFs are already compressed, so entries are stored as-is
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for filename, render in zip(filenames, renders):
+                try:
+                    archive.writestr(filename, render.result())
+                except Exception as e:
+                    logger.error(f"Batch item {filename} failed: {str(e)}")
+                    archive.writestr(error_filename(filename), FAILED_NOTE)
+                yield buffer.take()
+        yield buffer.take()
+    finally:
+        # Client went away: don't keep the pool busy with renders nobody will read
+        for render in renders:
+            render.cancel()
+
+
+def error_filename(filename):
+    """Archive name of the note written in place of a failed PDF"""
+    return filename[:-len('.pdf')] + '_FAILED.txt'
+
+
+def filename_for(index, title):
+    """Numbered, filesystem-safe PDF name for a batch entry"""
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', title).strip('_')[:60] or 'document'
+    return f'{index:03d}_{slug}.pdf'
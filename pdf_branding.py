@@ -0,0 +1,207 @@
+"""
+Branding profiles for generated PDFs
+
+White-label tenants (see branding.py) get their EnterpriseSettings logo,
+primary color, site name and footer on checklist, cover letter and I-94
+exports. profile_for_branding() turns a resolved branding dict into a
+BrandingProfile: the shared theme for the primary color (see pdf_styles.py),
+the escaped footer lines and the logo.
+
+Profiles are cached per tenant in an LRU of PDF_THEME_CACHE_SIZE, keyed by
+the settings' updated_at and the branded fields. An edit saved through
+/api/enterprise/settings changes the key, so the next export builds a new
+profile and never reuses the old logo. A profile whose logo could not be
+loaded (host down, file not uploaded yet) is only kept for
+PDF_LOGO_RETRY_INTERVAL, then the logo is tried again.
+
+A logo is fetched (from static/ or over http(s), at most PDF_LOGO_MAX_BYTES)
+and decoded once per profile. Logo URLs are tenant input, so remote logos
+are only fetched from public hosts (see safe_fetch.py). It is scaled down
+to print resolution and flattened to a JPEG under PDF_LOGO_DIR, which the
+workers on a host share.
+reportlab embeds JPEG data as-is, so a branded export draws its logo from
+the cached JPEG bytes without decoding it again (see pdf_generator.LogoImage).
+A logo that cannot be loaded is logged and left out.
+"""
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from html import escape
+from functools import lru_cache
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from config import Config
+from pdf_styles import get_theme
+import safe_fetch
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # Logos are skipped without Pillow
+    PILImage = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DEFAULT_FOOTER_SITE = 'ImmigrationTemplates.com'
+
+# Largest logo box in the header, and the resolution logos are kept at
+LOGO_MAX_WIDTH = 2.5 * inch
+LOGO_MAX_HEIGHT = 0.6 * inch
+LOGO_DPI = 200
+
+
+class Logo:
+    """A normalized logo file, its JPEG data and its size on the page (points)"""
+    __slots__ = ('path', 'width', 'height', 'data')
+
+    def __init__(self, path, width, height):
+        self.path = path
+        self.width = width
+        self.height = height
+        with open(path, 'rb') as f:
+            self.data = f.read()
+
+    @property
+    def reader(self):
+        """An ImageReader for canvas.drawImage over the cached JPEG data
+
+        Each document gets its own: ImageReader seeks and reads one file
+        object, so a shared one is not safe across render threads.
+        """
+        return ImageReader(BytesIO(self.data))
+
+
+class BrandingProfile:
+    """Theme, logo and footer for one tenant's PDFs"""
+    __slots__ = ('key', 'theme', 'logo', 'site_name', 'footer_text', 'show_powered_by', 'is_default')
+
+    def __init__(self, key, theme, logo=None, site_name=None, footer_text=None, show_powered_by=True,
+                 is_default=False):
+        self.key = key
+        self.theme = theme
+        self.logo = logo
+        self.site_name = site_name
+        self.footer_text = footer_text
+        self.show_powered_by = show_powered_by
+        self.is_default = is_default
+
+    def footer_lines(self, generated_on):
+        """Footer paragraphs (markup) for a document generated on a date"""
+        if self.is_default:
+            return [f"Generated on {generated_on} | {DEFAULT_FOOTER_SITE}"]
+        lines = [f"Generated on {generated_on} | {escape(self.site_name or DEFAULT_FOOTER_SITE)}"]
+        if self.footer_text:
+            lines.append(escape(self.footer_text).replace('\n', '<br/>'))
+        if self.show_powered_by:
+            lines.append(f"Powered by {DEFAULT_FOOTER_SITE}")
+        return lines
+
+
+def _read_logo(url):
+    """Raw bytes of a logo from static/ or a public http(s) URL"""
+    return safe_fetch.read_source(url, STATIC_ROOT, Config.PDF_LOGO_MAX_BYTES, Config.PDF_LOGO_FETCH_TIMEOUT,
+                                  'ImmigrationTemplates PDF branding')
+
+
+def load_logo(url):
+    """Fetch, decode and normalize a logo once; None if it cannot be used"""
+    if not url or PILImage is None:
+        return None
+    try:
+        raw = _read_logo(url)
+
+        image = PILImage.open(BytesIO(raw))
+        image.load()
+        # Points per pixel: fit the header box, but never enlarge past screen size (96 dpi)
+        scale = min(LOGO_MAX_WIDTH / image.width, LOGO_MAX_HEIGHT / image.height, inch / 96)
+        width, height = image.width * scale, image.height * scale
+        path = os.path.join(Config.PDF_LOGO_DIR, f'{hashlib.sha256(raw).hexdigest()[:32]}.jpg')
+
+        if not os.path.exists(path):
+            # Print resolution is plenty; transparent areas go onto the white page
+            pixels = (max(1, round(width / inch * LOGO_DPI)), max(1, round(height / inch * LOGO_DPI)))
+            image.thumbnail(pixels)
+            image = image.convert('RGBA')
+            flattened = PILImage.new('RGB', image.size, 'white')
+            flattened.paste(image, mask=image.getchannel('A'))
+
+            os.makedirs(Config.PDF_LOGO_DIR, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=Config.PDF_LOGO_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                flattened.save(f, 'JPEG', quality=90)
+            os.replace(temp_path, path)
+        return Logo(path, width, height)
+    except Exception as e:
+        logger.warning(f"Could not load PDF logo {url}: {str(e)}")
+        return None
+
+
+def _build_profile(updated_at, logo_url, primary_color, site_name, footer_text, show_powered_by):
+    logo = load_logo(logo_url)
+    # The logo file name is a hash of its bytes, so PDFs cached without a logo are not reused once it loads
+    key = hashlib.sha256('\0'.join(
+        str(value) for value in (updated_at, logo_url, primary_color, site_name, footer_text, show_powered_by,
+                                 logo and os.path.basename(logo.path))
+    ).encode()).hexdigest()[:16]
+    return BrandingProfile(key, get_theme(primary_color), logo, site_name, footer_text, show_powered_by)
+
+
+class ProfileCache:
+    """LRU of branding profiles; a profile whose logo failed to load is rebuilt after a retry interval"""
+
+    def __init__(self, max_size, retry_interval):
+        self.max_size = max_size
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # fields -> (profile, retry_at or None)
+
+    def get(self, *fields):
+        """Profile for (updated_at, logo_url, primary_color, site_name, footer_text, show_powered_by)"""
+        with self._lock:
+            entry = self._entries.get(fields)
+            if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+                self._entries.move_to_end(fields)
+                return entry[0]
+
+        profile = _build_profile(*fields)
+        # A missing or unusable logo URL is retried later, not on every export
+        failed = fields[1] and profile.logo is None
+        retry_at = time.monotonic() + self.retry_interval if failed else None
+        with self._lock:
+            self._entries[fields] = (profile, retry_at)
+            self._entries.move_to_end(fields)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return profile
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+profiles = ProfileCache(Config.PDF_THEME_CACHE_SIZE, Config.PDF_LOGO_RETRY_INTERVAL)
+
+
+def default_profile():
+    """Profile for unbranded PDFs"""
+    return _default_profile()
+
+
+@lru_cache(maxsize=1)
+def _default_profile():
+    return BrandingProfile('default', get_theme(), is_default=True)
+
+
+def profile_for_branding(branding):
+    """Cached profile for a branding dict from branding.get_branding (default when unbranded)"""
+    if not branding or branding.get('updated_at') is None:
+        # DEFAULT_BRANDING: no EnterpriseSettings behind it
+        return default_profile()
+    return profiles.get(branding.get('updated_at'), branding.get('logo_url'), branding.get('primary_color'),
+                        branding.get('site_name'), branding.get('footer_text'),
+                        bool(branding.get('show_powered_by', True)))
@@ -0,0 +1,196 @@
+"""
+Render cache for generated PDFs
+
+A checklist PDF only depends on the form (its checklist and updated_at), the
+name it is prepared for, the tenant's branding profile (theme, logo and
+footer, versioned by its settings' updated_at, see pdf_branding.py) and the
+filing registry version (fee and mailing address, see filing_registry.py),
+so the rendered bytes are cached under a key built from those inputs instead
+of running reportlab on every download. Entries live in a per-worker LRU in
+front of PDF_CACHE_DIR, which all workers on a host share; files are written
+atomically, so a reader never sees a partial PDF. Entries expire after
+PDF_CACHE_MAX_AGE and are then pruned from the directory, so renders for
+old form versions, registry versions and branding settings do not pile up.
+
+The name is not part of the key. A personalized download takes the cached
+render with a "Prepared for" placeholder and writes the name over it (see
+pdf_generator.PreparedForSlot), so it costs a bytes.replace and nothing is
+stored per user. The rare name that does not fit in place is rendered in
+full and not cached.
+
+Admin form edits call warm_checklist(), which drops the form's old renders
+and pre-renders both default-theme variants (without a name, and with the
+placeholder), so downloads of an edited form never reach reportlab. A
+changed form also gets a new updated_at, so stale entries are never served
+even when a form changes outside the admin endpoints (migration scripts).
+"""
+import os
+import glob
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from config import Config
+from pdf_generator import ChecklistPDFGenerator
+import filing_registry
+import pdf_branding
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered PDFs backed by a shared directory
+
+    With max_age (seconds) entries expire, and expired files are pruned from
+    the directory on the first write of each process and then at most once
+    per PRUNE_INTERVAL (or max_age, if shorter).
+    """
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, directory, max_size, max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pruned_at = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _expired(self, created):
+        return self.max_age is not None and time.time() - created > self.max_age
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                created, body = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(name)
+                    return body
+                del self._entries[name]
+                return None
+        try:
+            path = self._path(name)
+            created = os.path.getmtime(path)
+            if self._expired(created):
+                return None
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        self._remember(name, body, created)
+        return body
+
+    def set(self, name, body):
+        self._remember(name, body, time.time())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(temp_path, self._path(name))
+        except OSError:
+            # The disk copy only saves other workers a render
+            pass
+        if self.max_age is not None and (
+                self._pruned_at is None or time.time() - self._pruned_at > min(self.max_age, self.PRUNE_INTERVAL)):
+            self.prune()
+
+    def purge(self, prefix):
+        """Drop every entry whose name starts with prefix"""
+        with self._lock:
+            for name in [name for name in self._entries if name.startswith(prefix)]:
+                del self._entries[name]
+        for path in glob.glob(os.path.join(glob.escape(self.directory), glob.escape(prefix) + '*')):
+            self._remove(path)
+
+    def prune(self):
+        """Remove expired files from the directory"""
+        self._pruned_at = time.time()
+        for path in glob.glob(os.path.join(glob.escape(self.directory), '*')):
+            try:
+                expired = self._expired(os.path.getmtime(path))
+            except OSError:
+                continue
+            if expired:
+                self._remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, name, body, created):
+        with self._lock:
+            self._entries[name] = (created, body)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+cache = RenderCache(Config.PDF_CACHE_DIR, Config.PDF_CACHE_SIZE, max_age=Config.PDF_CACHE_MAX_AGE)
+
+
+def _checklist_prefix(form_id):
+    return f'checklist-{form_id}-'
+
+
+def checklist_key(form, theme=None, branding=None, name_slot=False):
+    """Cache entry name for a checklist render (without a name, or with the name placeholder)"""
+    branding = branding or pdf_branding.default_profile()
+    theme = theme or branding.theme
+    updated_at = form.updated_at.isoformat() if form.updated_at else ''
+    filings_version = filing_registry.get_filings().version
+    digest = hashlib.sha256('\0'.join(
+        [updated_at, 'slot' if name_slot else '', theme.primary_color, branding.key, filings_version]
+    ).encode()).hexdigest()[:24]
+    return f'{_checklist_prefix(form.id)}{digest}.pdf'
+
+
+def render_checklist(form, user_name=None, theme=None, branding=None, name_slot=False):
+    """Render a checklist PDF with reportlab (uncached)"""
+    generator = ChecklistPDFGenerator(theme, branding)
+    elements = generator.generate(form.title, form.get_checklist(), user_name, name_slot)
+    return generator.save_to_bytes(elements).getvalue()
+
+
+def _cached_checklist(form, theme, branding, name_slot):
+    name = checklist_key(form, theme, branding, name_slot)
+    body = cache.get(name)
+    if body is None:
+        body = render_checklist(form, None, theme, branding, name_slot)
+        cache.set(name, body)
+    return body
+
+
+def get_checklist_pdf(form, user_name=None, theme=None, branding=None):
+    """Checklist PDF bytes for a form, rendered only on a cache miss"""
+    user_name = (user_name or '').strip()
+    if not user_name:
+        return _cached_checklist(form, theme, branding, False)
+
+    base = _cached_checklist(form, theme, branding, True)
+    body = ChecklistPDFGenerator(theme, branding).prepared_for_slot().fill(base, user_name)
+    if body is None:
+        # Too long for the placeholder, or outside the standard fonts' encoding
+        body = render_checklist(form, user_name, theme, branding)
+    return body
+
+
+def purge_checklist(form_id):
+    """Drop every cached render of a form's checklist"""
+    cache.purge(_checklist_prefix(form_id))
+
+
+def warm_checklist(form):
+    """Replace a form's cached renders with fresh default-theme renders (with and without a name)"""
+    purge_checklist(form.id)
+    _cached_checklist(form, None, None, False)
+    _cached_checklist(form, None, None, True)
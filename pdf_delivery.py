@@ -0,0 +1,71 @@
+"""
+Delivery of generated PDFs
+
+Generated documents are rendered into memory (PDFGenerator.save_to_bytes)
+and never written under static/, where they used to pile up as public files.
+Documents rendered by a background job (see render_jobs.py) are put in a
+short-lived store and downloaded through a download_url carrying a signed
+token: it names the stored PDF, the user it was generated for and the
+download filename, and expires after PDF_DOWNLOAD_MAX_AGE. The store is a
+RenderCache (see pdf_cache.py) under PDF_DOWNLOAD_DIR, shared by the workers
+on a host and pruned as entries expire.
+
+Documents built inside the request (filled USCIS forms) are sent in the
+response itself to clients that ask for application/pdf, and nothing is
+stored.
+"""
+import hashlib
+from io import BytesIO
+from flask import current_app, request, send_file, url_for
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from config import Config
+from pdf_cache import RenderCache
+
+TOKEN_SALT = 'pdf-download'
+
+store = RenderCache(Config.PDF_DOWNLOAD_DIR, Config.PDF_DOWNLOAD_CACHE_SIZE, max_age=Config.PDF_DOWNLOAD_MAX_AGE)
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt=TOKEN_SALT)
+
+
+def pdf_response(body, download_name, as_attachment=True):
+    """Stream PDF bytes as a response"""
+    return send_file(BytesIO(body), mimetype='application/pdf',
+                     as_attachment=as_attachment, download_name=download_name)
+
+
+def wants_pdf():
+    """Check whether the client asked for the PDF itself rather than JSON"""
+    return request.accept_mimetypes.best_match(['application/json', 'application/pdf']) == 'application/pdf'
+
+
+def store_pdf(body):
+    """Put a generated PDF in the short-lived store; returns its key"""
+    name = f'{hashlib.sha256(body).hexdigest()[:32]}.pdf'
+    store.set(name, body)
+    return name
+
+
+def download_url(key, user_id, download_name):
+    """Signed, expiring URL for a stored PDF"""
+    token = _serializer().dumps({'pdf': key, 'user': user_id, 'name': download_name})
+    return url_for('download_generated_pdf', token=token)
+
+
+def issue_download_url(body, user_id, download_name):
+    """Store a generated PDF and return a signed, expiring URL for it"""
+    return download_url(store_pdf(body), user_id, download_name)
+
+
+def read_download(token, user_id):
+    """(body, download name) for a valid token issued to user_id, or None"""
+    try:
+        claims = _serializer().loads(token, max_age=Config.PDF_DOWNLOAD_MAX_AGE)
+    except BadSignature:  # Also raised for expired tokens
+        return None
+    if claims.get('user') != user_id:
+        return None
+    body = store.get(claims['pdf'])
+    return (body, claims['name']) if body is not None else None
@@ -1,66 +1,257 @@
 """PDF Generation utilities for immigration documents"""
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, PageBreak, Flowable
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib import colors
 from datetime import datetime
+from bisect import bisect_right
+from itertools import accumulate
+from collections import OrderedDict
 import os
+import copy
+import threading
 from io import BytesIO
+from html import escape
+from config import Config
+from models import extract_form_number
+from pdf_styles import get_theme, FONT_BOLD
+import filing_registry
+import pdf_branding
+
+class PagedTable(Flowable):
+    """Table that is laid out one page at a time
+
+    reportlab splits a long Table by copying all remaining rows into a new
+    table on every page, so layout time grows quadratically with the rows.
+    Row heights are measured once here, and each page gets a LongTable of only
+    the rows that fit there, with the header row repeated at the top.
+    """
+
+    def __init__(self, header, rows, col_widths, style, start=0, offsets=None):
+        Flowable.__init__(self)
+        self.header = header
+        self.rows = rows
+        self.col_widths = col_widths
+        self.style = style
+        self.start = start
+        if offsets is None:
+            offsets = self._measure()
+        # offsets[0] is the header height, offsets[i + 1] - offsets[i] the height of rows[i]
+        self.offsets = offsets
+
+    def _row_heights(self, rows):
+        table = Table([self.header] + rows, colWidths=self.col_widths)
+        table.setStyle(self.style)
+        table.wrap(0, 0)
+        return table._rowHeights
+
+    def _measure(self):
+        # Rows of single-line text all have the body row height, so only other rows are measured
+        header_height, line_height = self._row_heights([[''] * len(self.header)])
+        heights = [header_height]
+        for row in self.rows:
+            if all(isinstance(cell, str) and '\n' not in cell for cell in row):
+                heights.append(line_height)
+            else:
+                heights.append(self._row_heights([row])[1])
+        return list(accumulate(heights))
+
+    def _table(self, stop):
+        table = LongTable([self.header] + self.rows[self.start:stop], colWidths=self.col_widths, repeatRows=1)
+        table.setStyle(self.style)
+        return table
+
+    def _height(self, stop):
+        return self.offsets[0] + self.offsets[stop] - self.offsets[self.start]
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.col_widths)
+        self.height = self._height(len(self.rows))
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Last row whose bottom edge still fits below the header
+        limit = availHeight - self.offsets[0] + self.offsets[self.start]
+        stop = bisect_right(self.offsets, limit, lo=self.start + 1) - 1
+        if stop <= self.start:
+            return []
+        return [self._table(stop),
+                PagedTable(self.header, self.rows, self.col_widths, self.style, stop, self.offsets)]
+
+    def draw(self):
+        table = self._table(len(self.rows))
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+
+class FragmentCache:
+    """LRU of laid-out Paragraphs keyed by (style, text, width)
+
+    Styles belong to a shared theme (see pdf_styles.py), so each branding
+    variant gets its own entries. Keys hold the style itself, which keeps an
+    evicted theme's styles from being confused with a new theme's.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def layout(self, text, style, width, height):
+        """A wrapped Paragraph for this text, parsed and line-broken once"""
+        key = (style, text, width)
+        with self._lock:
+            paragraph = self._entries.get(key)
+            if paragraph is not None:
+                self._entries.move_to_end(key)
+        if paragraph is None:
+            paragraph = Paragraph(text, style)
+            paragraph.wrap(width, height)
+            if self.max_size > 0:
+                with self._lock:
+                    self._entries[key] = paragraph
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+        # Drawing sets attributes on the paragraph, so every use gets its own copy
+        return copy.copy(paragraph)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+fragments = FragmentCache(Config.PDF_FRAGMENT_CACHE_SIZE)
+
+
+class StaticParagraph(Flowable):
+    """Paragraph of constant text (labels, notes, boilerplate) laid out once
+
+    Markup parsing and line breaking are most of a Paragraph's cost, and for
+    fixed text they give the same result on every render. The laid-out
+    paragraph comes from the fragment cache; only drawing happens per
+    document.
+    """
+
+    def __init__(self, text, style):
+        Flowable.__init__(self)
+        self.text = text
+        self.style = style
+        self._paragraph = None
+
+    def wrap(self, availWidth, availHeight):
+        self._paragraph = fragments.layout(self.text, self.style, availWidth, availHeight)
+        self.width, self.height = self._paragraph.width, self._paragraph.height
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Rare (a long block at a page end): fall back to reportlab's own split
+        return Paragraph(self.text, self.style).split(availWidth, availHeight)
+
+    def draw(self):
+        # Already positioned by our own drawOn; draw without another translate
+        self._paragraph._drawOn(self.canv)
+
+
+class PreparedForSlot(Flowable):
+    """"Prepared for: <name>" line whose name is written into the finished PDF
+
+    The line is drawn with a fixed-size placeholder on an uncompressed page,
+    so a render without the name can be cached and personalized per download
+    by overwriting the placeholder's bytes (see fill() and pdf_cache.py).
+    The replacement is padded to the same length, so no offset in the file
+    moves. Names that do not fit, or that the standard fonts cannot encode,
+    are left to a full render.
+    """
+    LABEL = 'Prepared for: '
+    PLACEHOLDER = 'PREPARED-FOR-' + 'N' * 83
+    LINE_WIDTH = letter[0] - 1.5 * inch  # PDFGenerator.save_to_bytes margins
+
+    def __init__(self, style):
+        Flowable.__init__(self)
+        self.style = style
+
+    def wrap(self, availWidth, availHeight):
+        return availWidth, self.style.leading
+
+    def draw(self):
+        style = self.style
+        # One text object, so the line is extracted as "Prepared for: <name>"
+        text = self.canv.beginText(0, style.leading - style.fontSize)
+        text.setFillColor(style.textColor)
+        text.setFont(style.fontName, style.fontSize)
+        text.textOut(self.LABEL)
+        text.setFont(FONT_BOLD, style.fontSize)
+        text.textOut(self.PLACEHOLDER)
+        self.canv.drawText(text)
+
+    def fill(self, body, name):
+        """body with the placeholder replaced by name, or None if it cannot be done in place"""
+        name = ' '.join(name.split())
+        try:
+            encoded = name.encode('cp1252')  # WinAnsiEncoding of the standard fonts
+        except UnicodeEncodeError:
+            return None
+        width = stringWidth(self.LABEL, self.style.fontName, self.style.fontSize) + \
+            stringWidth(name, FONT_BOLD, self.style.fontSize)
+        escaped = b''.join(
+            b'\\' + bytes([byte]) if byte in b'()\\' else
+            bytes([byte]) if 32 <= byte < 127 else b'\\%03o' % byte
+            for byte in encoded
+        )
+        placeholder = f'({self.PLACEHOLDER})'.encode()
+        if width > self.LINE_WIDTH or len(escaped) + 2 > len(placeholder) or body.count(placeholder) != 1:
+            return None
+        return body.replace(placeholder, b'(' + escaped + b')' + b' ' * (len(placeholder) - len(escaped) - 2))
 
-class PDFGenerator:
-    """Base class for generating immigration-related PDFs"""
 
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles"""
-        # Title style
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#667eea'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
+class LogoImage(Flowable):
+    """A tenant's logo, drawn from its flattened JPEG
 
-        # Section header
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#667eea'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        ))
+    The logo is decoded and flattened to a JPEG once per profile (see
+    pdf_branding.py). reportlab embeds JPEG data without decoding it, so
+    drawing it only reads the header and encodes the cached bytes.
+    """
 
-        # Field label
-        self.styles.add(ParagraphStyle(
-            name='FieldLabel',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.grey,
-            spaceAfter=2,
-            fontName='Helvetica-Bold'
-        ))
+    def __init__(self, logo):
+        Flowable.__init__(self)
+        self.logo = logo
+        self.width, self.height = logo.width, logo.height
+        self.hAlign = 'LEFT'
 
-        # Field value
-        self.styles.add(ParagraphStyle(
-            name='FieldValue',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=10,
-            fontName='Helvetica'
-        ))
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.logo.reader, 0, 0, self.width, self.height)
+
+
+class PDFGenerator:
+    """Base class for generating immigration-related PDFs"""
+
+    def __init__(self, theme=None, branding=None):
+        # Logo, colors and footer of a white-label tenant (see pdf_branding.py)
+        self.branding = branding or pdf_branding.default_profile()
+        # Styles are shared by every generator (see pdf_styles.py)
+        self.theme = theme or self.branding.theme
+        self.styles = self.theme.styles
+        # None: reportlab's default (compressed); 0 keeps page content editable (see PreparedForSlot)
+        self.page_compression = None
+
+    def _static(self, text, style_name='Normal'):
+        """Paragraph for constant text, laid out once per theme (see StaticParagraph)"""
+        return StaticParagraph(text, self.styles[style_name])
+
+    def _add_logo(self, elements):
+        """Add the tenant's logo, if it has one"""
+        logo = self.branding.logo
+        if logo is not None:
+            elements.append(LogoImage(logo))
+            elements.append(Spacer(1, 0.15*inch))
 
     def _add_header(self, elements, title, subtitle=None):
         """Add standard header to PDF"""
+        self._add_logo(elements)
         elements.append(Paragraph(title, self.styles['CustomTitle']))
         if subtitle:
             elements.append(Paragraph(subtitle, self.styles['Normal']))
@@ -70,20 +261,13 @@ class PDFGenerator:
     def _add_footer(self, elements):
         """Add standard footer"""
         elements.append(Spacer(1, 0.5*inch))
-        footer_style = ParagraphStyle(
-            name='Footer',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            textColor=colors.grey,
-            alignment=TA_CENTER
-        )
-        footer_text = f"Generated on {datetime.now().strftime('%B %d, %Y')} | ImmigrationTemplates.com"
-        elements.append(Paragraph(footer_text, footer_style))
+        for line in self.branding.footer_lines(datetime.now().strftime('%B %d, %Y')):
+            elements.append(self._static(line, 'Footer'))
 
     def _add_field(self, elements, label, value):
         """Add a labeled field to the PDF"""
         if value:
-            elements.append(Paragraph(label, self.styles['FieldLabel']))
+            elements.append(self._static(label, 'FieldLabel'))
             elements.append(Paragraph(str(value), self.styles['FieldValue']))
 
     def save_to_file(self, elements, filename):
@@ -99,7 +283,8 @@ class PDFGenerator:
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter,
                               rightMargin=0.75*inch, leftMargin=0.75*inch,
-                              topMargin=0.75*inch, bottomMargin=0.75*inch)
+                              topMargin=0.75*inch, bottomMargin=0.75*inch,
+                              pageCompression=self.page_compression)
         doc.build(elements)
         buffer.seek(0)
         return buffer
@@ -120,24 +305,15 @@ class PassportPDFGenerator(PDFGenerator):
         )
 
         # Important notice
-        notice_style = ParagraphStyle(
-            name='Notice',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=colors.red,
-            spaceAfter=20,
-            leftIndent=20,
-            rightIndent=20
-        )
-        elements.append(Paragraph(
+        elements.append(self._static(
             "<b>IMPORTANT:</b> This is a pre-filled guide. You must still complete the official DS-11 form "
             "and submit it in person at an acceptance facility or passport agency.",
-            notice_style
+            'Notice'
         ))
         elements.append(Spacer(1, 0.3*inch))
 
         # Personal Information
-        elements.append(Paragraph("PERSONAL INFORMATION", self.styles['SectionHeader']))
+        elements.append(self._static("PERSONAL INFORMATION", 'SectionHeader'))
         self._add_field(elements, "Full Legal Name", application_data.get('full_name'))
         self._add_field(elements, "Date of Birth", application_data.get('date_of_birth'))
         self._add_field(elements, "Place of Birth", application_data.get('place_of_birth'))
@@ -147,7 +323,7 @@ class PassportPDFGenerator(PDFGenerator):
         elements.append(Spacer(1, 0.2*inch))
 
         # Physical Description
-        elements.append(Paragraph("PHYSICAL DESCRIPTION", self.styles['SectionHeader']))
+        elements.append(self._static("PHYSICAL DESCRIPTION", 'SectionHeader'))
         self._add_field(elements, "Height", application_data.get('height'))
         self._add_field(elements, "Hair Color", application_data.get('hair_color'))
         self._add_field(elements, "Eye Color", application_data.get('eye_color'))
@@ -155,7 +331,7 @@ class PassportPDFGenerator(PDFGenerator):
         elements.append(Spacer(1, 0.2*inch))
 
         # Contact Information
-        elements.append(Paragraph("CONTACT INFORMATION", self.styles['SectionHeader']))
+        elements.append(self._static("CONTACT INFORMATION", 'SectionHeader'))
         self._add_field(elements, "Email Address", application_data.get('email'))
         self._add_field(elements, "Phone Number", application_data.get('phone'))
 
@@ -178,7 +354,7 @@ class PassportPDFGenerator(PDFGenerator):
 
         # Emergency Contact
         if application_data.get('emergency_contact_name'):
-            elements.append(Paragraph("EMERGENCY CONTACT", self.styles['SectionHeader']))
+            elements.append(self._static("EMERGENCY CONTACT", 'SectionHeader'))
             self._add_field(elements, "Contact Name", application_data.get('emergency_contact_name'))
             self._add_field(elements, "Contact Phone", application_data.get('emergency_contact_phone'))
             self._add_field(elements, "Relationship", application_data.get('emergency_contact_relationship'))
@@ -186,21 +362,21 @@ class PassportPDFGenerator(PDFGenerator):
 
         # Employment
         if application_data.get('occupation') or application_data.get('employer'):
-            elements.append(Paragraph("EMPLOYMENT INFORMATION", self.styles['SectionHeader']))
+            elements.append(self._static("EMPLOYMENT INFORMATION", 'SectionHeader'))
             self._add_field(elements, "Occupation", application_data.get('occupation'))
             self._add_field(elements, "Employer", application_data.get('employer'))
             elements.append(Spacer(1, 0.2*inch))
 
         # Travel Plans
         if application_data.get('travel_date') or application_data.get('destination'):
-            elements.append(Paragraph("TRAVEL PLANS", self.styles['SectionHeader']))
+            elements.append(self._static("TRAVEL PLANS", 'SectionHeader'))
             self._add_field(elements, "Expected Travel Date", application_data.get('travel_date'))
             self._add_field(elements, "Destination", application_data.get('destination'))
             elements.append(Spacer(1, 0.2*inch))
 
         # Parent Information
         if application_data.get('parent1_name') or application_data.get('parent2_name'):
-            elements.append(Paragraph("PARENT INFORMATION", self.styles['SectionHeader']))
+            elements.append(self._static("PARENT INFORMATION", 'SectionHeader'))
             if application_data.get('parent1_name'):
                 self._add_field(elements, "Parent 1 Full Name", application_data.get('parent1_name'))
                 self._add_field(elements, "Parent 1 Place of Birth", application_data.get('parent1_birthplace'))
@@ -214,7 +390,7 @@ class PassportPDFGenerator(PDFGenerator):
 
         # Next Steps
         elements.append(PageBreak())
-        elements.append(Paragraph("NEXT STEPS", self.styles['SectionHeader']))
+        elements.append(self._static("NEXT STEPS", 'SectionHeader'))
 
         next_steps = [
             "1. Download the official DS-11 form from travel.state.gov",
@@ -227,13 +403,13 @@ class PassportPDFGenerator(PDFGenerator):
         ]
 
         for step in next_steps:
-            elements.append(Paragraph(step, self.styles['Normal']))
+            elements.append(self._static(step))
             elements.append(Spacer(1, 0.1*inch))
 
         elements.append(Spacer(1, 0.3*inch))
 
         # Required Documents Checklist
-        elements.append(Paragraph("REQUIRED DOCUMENTS CHECKLIST", self.styles['SectionHeader']))
+        elements.append(self._static("REQUIRED DOCUMENTS CHECKLIST", 'SectionHeader'))
 
         checklist_items = [
             ["☐", "Completed DS-11 form (DO NOT SIGN until at facility)"],
@@ -247,15 +423,7 @@ class PassportPDFGenerator(PDFGenerator):
         ]
 
         checklist_table = Table(checklist_items, colWidths=[0.4*inch, 5.5*inch])
-        checklist_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
+        checklist_table.setStyle(self.theme.tables['plain_checklist'])
         elements.append(checklist_table)
 
         # Footer
@@ -267,8 +435,12 @@ class PassportPDFGenerator(PDFGenerator):
 class ChecklistPDFGenerator(PDFGenerator):
     """Generate checklist PDF for immigration forms"""
 
-    def generate(self, form_title, checklist_items, user_name=None):
-        """Generate checklist PDF"""
+    def generate(self, form_title, checklist_items, user_name=None, name_slot=False):
+        """Generate checklist PDF
+
+        With name_slot, the "Prepared for" line holds a placeholder for
+        prepared_for_slot().fill() instead of user_name.
+        """
         elements = []
 
         # Header
@@ -278,14 +450,26 @@ class ChecklistPDFGenerator(PDFGenerator):
             "Document Checklist"
         )
 
-        if user_name:
-            elements.append(Paragraph(f"Prepared for: <b>{user_name}</b>", self.styles['Normal']))
+        if name_slot:
+            self.page_compression = 0
+            elements.append(self.prepared_for_slot())
+            elements.append(Spacer(1, 0.2*inch))
+        elif user_name:
+            elements.append(Paragraph(f"Prepared for: <b>{escape(user_name)}</b>", self.styles['Normal']))
+            elements.append(Spacer(1, 0.2*inch))
+
+        # Fee and mailing address from the filing registry, for registered forms
+        filings = filing_registry.get_filings()
+        form_code = extract_form_number(form_title).upper() or filings.match(form_title)
+        filing = filings.by_code.get(form_code)
+        if filing is not None:
+            self._add_field(elements, "Filing Fee", filing.fee)
+            self._add_field(elements, "Mail To", filing.address)
             elements.append(Spacer(1, 0.2*inch))
 
         # Instructions
-        elements.append(Paragraph(
-            "Check off each item as you gather the required documents. Keep all documents organized and ready for submission.",
-            self.styles['Normal']
+        elements.append(self._static(
+            "Check off each item as you gather the required documents. Keep all documents organized and ready for submission."
         ))
         elements.append(Spacer(1, 0.3*inch))
 
@@ -295,22 +479,7 @@ class ChecklistPDFGenerator(PDFGenerator):
             checklist_data.append(["☐", item])
 
         table = Table(checklist_data, colWidths=[0.4*inch, 5.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f7fa')]),
-        ]))
+        table.setStyle(self.theme.tables['checklist'])
         elements.append(table)
 
         # Footer
@@ -319,130 +488,45 @@ class ChecklistPDFGenerator(PDFGenerator):
         return elements
 
 
+    def prepared_for_slot(self):
+        """The "Prepared for" line of name_slot renders in this generator's theme"""
+        return PreparedForSlot(self.styles['Normal'])
+
+
 class CoverLetterGenerator(PDFGenerator):
     """Generate USCIS cover letter"""
 
-    def _get_form_address(self, form_title):
-        """Get appropriate USCIS address based on form type"""
-        form_upper = form_title.upper()
-
-        if 'I-130' in form_upper:
-            return "USCIS<br/>Attn: I-130<br/>P.O. Box 804625<br/>Chicago, IL 60680-4107"
-        elif 'I-485' in form_upper:
-            return "USCIS<br/>Attn: I-485<br/>P.O. Box 805887<br/>Chicago, IL 60680-4120"
-        elif 'I-765' in form_upper:
-            return "USCIS<br/>Attn: I-765<br/>P.O. Box 805373<br/>Chicago, IL 60680"
-        elif 'I-131' in form_upper:
-            return "USCIS<br/>Attn: I-131<br/>P.O. Box 805625<br/>Chicago, IL 60680"
-        elif 'N-400' in form_upper:
-            return "USCIS<br/>Attn: N-400<br/>P.O. Box 660060<br/>Dallas, TX 75266"
-        elif 'I-864' in form_upper:
-            return "USCIS<br/>Attn: I-864<br/>P.O. Box 804625<br/>Chicago, IL 60680-4107"
-        else:
-            return "U.S. Citizenship and Immigration Services<br/>Appropriate Service Center"
-
-    def _get_document_list(self, form_title):
-        """Get form-specific document checklist"""
-        form_upper = form_title.upper()
-
-        if 'I-130' in form_upper:
-            return [
-                "1. Completed Form I-130, Petition for Alien Relative",
-                "2. Filing fee: Check or money order for $535",
-                "3. Proof of U.S. citizenship (birth certificate or naturalization certificate)",
-                "4. Marriage certificate (if applicable)",
-                "5. Proof of termination of previous marriages (if applicable)",
-                "6. Two passport-style photographs of petitioner",
-                "7. Two passport-style photographs of beneficiary",
-                "8. Proof of bona fide relationship (photos, correspondence, joint accounts)"
-            ]
-        elif 'I-485' in form_upper:
-            return [
-                "1. Completed Form I-485, Application to Register Permanent Residence",
-                "2. Filing fee and biometric fee",
-                "3. Copy of passport biographical pages",
-                "4. Two passport-style photographs",
-                "5. Form I-693, Medical Examination (in sealed envelope)",
-                "6. Birth certificate with certified English translation",
-                "7. Form I-864, Affidavit of Support",
-                "8. Employment authorization documents (if applicable)"
-            ]
-        elif 'N-400' in form_upper:
-            return [
-                "1. Completed Form N-400, Application for Naturalization",
-                "2. Filing fee: Check or money order for $640 ($725 with biometrics)",
-                "3. Copy of Permanent Resident Card (front and back)",
-                "4. Two passport-style photographs",
-                "5. Proof of marital status (marriage certificate, divorce decree)",
-                "6. Evidence of any name changes",
-                "7. Documentation for any trips outside the U.S. over 6 months"
-            ]
-        elif 'I-765' in form_upper:
-            return [
-                "1. Completed Form I-765, Application for Employment Authorization",
-                "2. Filing fee (if required for your category)",
-                "3. Copy of Form I-94, Arrival/Departure Record",
-                "4. Two passport-style photographs",
-                "5. Copy of pending I-485 receipt (if filing based on pending AOS)",
-                "6. Copy of passport biographical pages"
-            ]
-        elif 'I-131' in form_upper:
-            return [
-                "1. Completed Form I-131, Application for Travel Document",
-                "2. Filing fee: $575 (or $630 if under 16)",
-                "3. Two passport-style photographs",
-                "4. Copy of Permanent Resident Card or pending I-485 receipt",
-                "5. Copy of passport biographical pages",
-                "6. Evidence of travel plans (if applicable)"
-            ]
-        else:
-            return [
-                f"1. Completed {form_title}",
-                "2. Filing fee payment (check or money order)",
-                "3. Supporting documents as required by form instructions",
-                "4. Passport-style photographs (if required)",
-                "5. Photocopies of identity documents"
-            ]
+    def _get_filing(self, form_info):
+        """Registry entry for a cover letter's form (the generic default if unknown)"""
+        filings = filing_registry.get_filings()
+        form_number = form_info.get('form_number') or extract_form_number(form_info.get('title', ''))
+        if form_number.upper() in filings.by_code:
+            return filings.get(form_number)
+
+        # Free-text titles ("I-130 petition for my wife") - match known codes anywhere
+        return filings.get(filings.match(form_info.get('title', '')))
 
     def generate(self, user_data, form_info):
         """Generate cover letter PDF"""
         elements = []
+        filing = self._get_filing(form_info)
+        self._add_logo(elements)
 
         # Date and address block
-        date_style = ParagraphStyle(
-            name='Date',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            alignment=TA_RIGHT,
-            spaceAfter=40
-        )
-        elements.append(Paragraph(datetime.now().strftime('%B %d, %Y'), date_style))
+        elements.append(Paragraph(datetime.now().strftime('%B %d, %Y'), self.styles['Date']))
 
         # USCIS address (use custom if provided, otherwise auto-generate)
-        address_style = ParagraphStyle(
-            name='Address',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=30
-        )
         # Use custom mailing address if provided, otherwise auto-generate based on form
         custom_address = form_info.get('mailing_address', '').strip()
         if custom_address:
             # User provided custom address - use it as-is
-            form_address = custom_address.replace('\n', '<br/>')
+            elements.append(Paragraph(custom_address.replace('\n', '<br/>'), self.styles['Address']))
         else:
             # Auto-generate address based on form type
-            form_address = self._get_form_address(form_info.get('title', ''))
-        elements.append(Paragraph(form_address, address_style))
+            elements.append(self._static(filing.address, 'Address'))
 
         # Subject line
-        subject_style = ParagraphStyle(
-            name='Subject',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            fontName='Helvetica-Bold',
-            spaceAfter=20
-        )
+        subject_style = self.styles['Subject']
         elements.append(Paragraph(f"RE: {form_info.get('title', 'Immigration Application')}", subject_style))
         elements.append(Paragraph(f"Applicant: {user_data.get('full_name', 'N/A')}", subject_style))
         if user_data.get('case_number'):
@@ -451,34 +535,27 @@ class CoverLetterGenerator(PDFGenerator):
         elements.append(Spacer(1, 0.2*inch))
 
         # Salutation
-        elements.append(Paragraph("Dear USCIS Officer:", self.styles['Normal']))
+        elements.append(self._static("Dear USCIS Officer:"))
         elements.append(Spacer(1, 0.2*inch))
 
         # Body (fixed wording - not "on behalf of")
-        body_paragraphs = [
+        elements.append(Paragraph(
             f"I am submitting this {form_info.get('title', 'application')}. "
             "Please find enclosed all required forms, supporting documents, and fees as specified in the filing instructions.",
+            self.styles['Normal']
+        ))
+        elements.append(Spacer(1, 0.15*inch))
+        elements.append(self._static("The enclosed package contains the following:"))
+        elements.append(Spacer(1, 0.15*inch))
 
-            "The enclosed package contains the following:",
-        ]
-
-        for para in body_paragraphs:
-            elements.append(Paragraph(para, self.styles['Normal']))
-            elements.append(Spacer(1, 0.15*inch))
-
-        # Document list (form-specific)
-        doc_list_style = ParagraphStyle(
-            name='DocList',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            leftIndent=30,
-            spaceAfter=10
-        )
-
-        documents = self._get_document_list(form_info.get('title', ''))
+        # Document list (form-specific; the generic list quotes the title)
+        documents = filing.document_list(form_info.get('title', ''))
 
         for doc in documents:
-            elements.append(Paragraph(doc, doc_list_style))
+            if filing.form_code:
+                elements.append(self._static(doc, 'DocList'))
+            else:
+                elements.append(Paragraph(doc, self.styles['DocList']))
 
         elements.append(Spacer(1, 0.3*inch))
 
@@ -491,15 +568,15 @@ class CoverLetterGenerator(PDFGenerator):
         ]
 
         for para in closing_para:
-            elements.append(Paragraph(para, self.styles['Normal']))
+            elements.append(self._static(para))
             elements.append(Spacer(1, 0.15*inch))
 
         elements.append(Spacer(1, 0.3*inch))
 
         # Signature block
-        elements.append(Paragraph("Respectfully submitted,", self.styles['Normal']))
+        elements.append(self._static("Respectfully submitted,"))
         elements.append(Spacer(1, 0.5*inch))
-        elements.append(Paragraph("_________________________", self.styles['Normal']))
+        elements.append(self._static("_________________________"))
         elements.append(Paragraph(user_data.get('full_name', 'Applicant Name'), self.styles['Normal']))
         if user_data.get('email'):
             elements.append(Paragraph(user_data.get('email'), self.styles['Normal']))
@@ -515,8 +592,16 @@ class CoverLetterGenerator(PDFGenerator):
 class I94HistoryGenerator(PDFGenerator):
     """Generate I-94 travel history PDF"""
 
-    def generate(self, user_data, travel_history):
-        """Generate I-94 travel history PDF"""
+    TABLE_HEADER = ["Entry Date", "Departure Date", "I-94 Number", "Port of Entry", "Status"]
+    RECORD_FIELDS = ('entry_date', 'departure_date', 'i94_number', 'port_of_entry', 'status')
+    COL_WIDTHS = [1.1*inch, 1.1*inch, 1.2*inch, 1.8*inch, 0.8*inch]
+
+    def generate(self, user_data, travel_history, summary=None):
+        """Generate I-94 travel history PDF
+
+        summary is travel_history.summarize() output; when given, an N-400
+        physical presence section follows the travel table.
+        """
         elements = []
 
         # Header
@@ -527,7 +612,7 @@ class I94HistoryGenerator(PDFGenerator):
         )
 
         # Personal Information
-        elements.append(Paragraph("PERSONAL INFORMATION", self.styles['SectionHeader']))
+        elements.append(self._static("PERSONAL INFORMATION", 'SectionHeader'))
         self._add_field(elements, "Full Name", user_data.get('full_name'))
         self._add_field(elements, "Date of Birth", user_data.get('date_of_birth'))
         self._add_field(elements, "Passport Number", user_data.get('passport_number'))
@@ -536,45 +621,26 @@ class I94HistoryGenerator(PDFGenerator):
         elements.append(Spacer(1, 0.3*inch))
 
         # Travel History Table
-        elements.append(Paragraph("TRAVEL HISTORY", self.styles['SectionHeader']))
+        elements.append(self._static("TRAVEL HISTORY", 'SectionHeader'))
 
         if travel_history:
-            table_data = [["Entry Date", "Departure Date", "I-94 Number", "Port of Entry", "Status"]]
-
-            for record in travel_history:
-                table_data.append([
-                    record.get('entry_date', ''),
-                    record.get('departure_date', ''),
-                    record.get('i94_number', ''),
-                    record.get('port_of_entry', ''),
-                    record.get('status', '')
-                ])
-
-            table = Table(table_data, colWidths=[1.1*inch, 1.1*inch, 1.2*inch, 1.8*inch, 0.8*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f7fa')]),
-            ]))
-            elements.append(table)
+            rows = [
+                [record.get(field, '') for field in self.RECORD_FIELDS]
+                for record in travel_history
+            ]
+            # Frequent travelers have thousands of records: lay them out page by page
+            elements.append(PagedTable(self.TABLE_HEADER, rows, self.COL_WIDTHS, self.theme.tables['travel_history']))
         else:
-            elements.append(Paragraph("No travel history records available.", self.styles['Normal']))
+            elements.append(self._static("No travel history records available."))
 
         elements.append(Spacer(1, 0.3*inch))
 
+        if summary:
+            self._add_presence_summary(elements, summary)
+            elements.append(Spacer(1, 0.3*inch))
+
         # Notes
-        elements.append(Paragraph("NOTES", self.styles['SectionHeader']))
+        elements.append(self._static("NOTES", 'SectionHeader'))
         notes = [
             "• This document is compiled from I-94 Arrival/Departure Records",
             "• Verify all dates and information with official I-94 records at cbp.gov/I94",
@@ -582,10 +648,36 @@ class I94HistoryGenerator(PDFGenerator):
             "• Report any discrepancies to CBP immediately"
         ]
         for note in notes:
-            elements.append(Paragraph(note, self.styles['Normal']))
+            elements.append(self._static(note))
             elements.append(Spacer(1, 0.05*inch))
 
         # Footer
         self._add_footer(elements)
 
         return elements
+
+    def _add_presence_summary(self, elements, summary):
+        """N-400 physical presence and continuous residence figures"""
+        elements.append(self._static("PHYSICAL PRESENCE SUMMARY (N-400)", 'SectionHeader'))
+        self._add_field(elements, "Statutory Period",
+                        f"{summary['period_start']} to {summary['as_of']} ({summary['period_years']} years)")
+        self._add_field(elements, "Days Outside the U.S.", str(summary['days_abroad']))
+        self._add_field(elements, "Days in the U.S.",
+                        f"{summary['days_present']} (at least {summary['required_days_present']} required)")
+        if not summary.get('window_covered', True):
+            self._add_field(elements, "Records Cover",
+                            f"{summary['covered_from']} to {summary['as_of']} ({summary['days_uncovered']} earlier "
+                            f"days in the period are not counted as present)")
+            self._add_field(elements, "Physical Presence", "Not determined (records do not cover the full period)")
+        else:
+            self._add_field(elements, "Physical Presence",
+                            "Met" if summary['meets_physical_presence'] else "Not met")
+        self._add_field(elements, "Continuous Residence Since", summary['continuous_residence_since'])
+        if summary['currently_abroad']:
+            self._add_field(elements, "Note", "The latest trip has no return date; counted up to the period end")
+
+        for label, trips in (("Trips Over 6 Months", summary['trips_over_6_months']),
+                             ("Trips Over 1 Year", summary['trips_over_1_year'])):
+            if trips:
+                self._add_field(elements, label, "; ".join(
+                    f"{trip['departed']} to {trip['returned']} ({trip['days_abroad']} days)" for trip in trips))
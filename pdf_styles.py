@@ -0,0 +1,146 @@
+"""
+Shared reportlab styles for the PDF generators
+
+getSampleStyleSheet() plus the custom paragraph and table styles used to be
+rebuilt for every generated document. They are now built once per theme and
+shared read-only by every PDFGenerator: reportlab only reads a style when it
+lays out a Paragraph or Table, so one set is safe to use from any thread.
+
+The default theme uses the site colors. get_theme() derives per-tenant
+variants from an EnterpriseSettings primary color; variants are cached (LRU
+of PDF_THEME_CACHE_SIZE) since only a handful of tenants brand their PDFs.
+All documents use the standard PDF fonts, so no font files are registered.
+"""
+import re
+from functools import lru_cache
+from collections.abc import Mapping
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import TableStyle
+from config import Config
+
+DEFAULT_PRIMARY_COLOR = '#667eea'
+ROW_STRIPE_COLOR = '#f5f7fa'
+HEX_COLOR_RE = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+FONT_REGULAR = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+
+
+class StyleRegistry(Mapping):
+    """Read-only name -> style map (supports styles['Normal'] like a StyleSheet1)"""
+
+    def __init__(self, styles):
+        self._styles = dict(styles)
+
+    def __getitem__(self, name):
+        return self._styles[name]
+
+    def __iter__(self):
+        return iter(self._styles)
+
+    def __len__(self):
+        return len(self._styles)
+
+
+class PDFTheme:
+    """Paragraph and table styles for one primary color"""
+    __slots__ = ('primary_color', 'styles', 'tables')
+
+    def __init__(self, primary_color):
+        self.primary_color = primary_color
+        accent = colors.HexColor(primary_color)
+        self.styles = StyleRegistry(self._paragraph_styles(accent))
+        self.tables = StyleRegistry(self._table_styles(accent))
+
+    @staticmethod
+    def _paragraph_styles(accent):
+        sample = getSampleStyleSheet()
+        styles = dict(sample.byName)
+
+        def add(name, parent, **kwargs):
+            styles[name] = ParagraphStyle(name=name, parent=styles[parent], **kwargs)
+
+        add('CustomTitle', 'Heading1', fontSize=18, textColor=accent, spaceAfter=30,
+            alignment=TA_CENTER, fontName=FONT_BOLD)
+        add('SectionHeader', 'Heading2', fontSize=14, textColor=accent, spaceAfter=12,
+            spaceBefore=12, fontName=FONT_BOLD)
+        add('FieldLabel', 'Normal', fontSize=10, textColor=colors.grey, spaceAfter=2, fontName=FONT_BOLD)
+        add('FieldValue', 'Normal', fontSize=11, spaceAfter=10, fontName=FONT_REGULAR)
+        add('Footer', 'Normal', fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
+
+        # Passport guide
+        add('Notice', 'Normal', fontSize=9, textColor=colors.red, spaceAfter=20, leftIndent=20, rightIndent=20)
+
+        # Cover letter
+        add('Date', 'Normal', fontSize=11, alignment=TA_RIGHT, spaceAfter=40)
+        add('Address', 'Normal', fontSize=11, spaceAfter=30)
+        add('Subject', 'Normal', fontSize=11, fontName=FONT_BOLD, spaceAfter=20)
+        add('DocList', 'Normal', fontSize=11, leftIndent=30, spaceAfter=10)
+        return styles
+
+    @staticmethod
+    def _table_styles(accent):
+        stripes = [colors.white, colors.HexColor(ROW_STRIPE_COLOR)]
+        return {
+            # Passport guide "required documents" list (no header row)
+            'plain_checklist': TableStyle([
+                ('FONTNAME', (0, 0), (-1, -1), FONT_REGULAR),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('LEFTPADDING', (0, 0), (-1, -1), 5),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+                ('TOPPADDING', (0, 0), (-1, -1), 8),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ]),
+            'checklist': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), accent),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), FONT_BOLD),
+                ('FONTSIZE', (0, 0), (-1, 0), 11),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('FONTNAME', (0, 1), (-1, -1), FONT_REGULAR),
+                ('FONTSIZE', (0, 1), (-1, -1), 10),
+                ('LEFTPADDING', (0, 0), (-1, -1), 8),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+                ('TOPPADDING', (0, 1), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 1), (-1, -1), 10),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), stripes),
+            ]),
+            'travel_history': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), accent),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), FONT_BOLD),
+                ('FONTSIZE', (0, 0), (-1, 0), 9),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                ('FONTNAME', (0, 1), (-1, -1), FONT_REGULAR),
+                ('FONTSIZE', (0, 1), (-1, -1), 8),
+                ('LEFTPADDING', (0, 0), (-1, -1), 6),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+                ('TOPPADDING', (0, 1), (-1, -1), 8),
+                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), stripes),
+            ]),
+        }
+
+
+@lru_cache(maxsize=Config.PDF_THEME_CACHE_SIZE)
+def _theme_for_color(primary_color):
+    return PDFTheme(primary_color)
+
+
+def get_theme(primary_color=None):
+    """Shared theme for a primary color (the default theme for missing or invalid colors)"""
+    if not primary_color or not HEX_COLOR_RE.match(primary_color):
+        primary_color = DEFAULT_PRIMARY_COLOR
+    return _theme_for_color(primary_color.lower())
+
+
+def theme_for_branding(branding):
+    """Shared theme for a branding dict (see branding.py) or EnterpriseSettings colors"""
+    return get_theme((branding or {}).get('primary_color'))
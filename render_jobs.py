@@ -0,0 +1,183 @@
+"""
+Background rendering of generated documents
+
+Cover letters, I-94 histories and passport PDFs used to be rendered inside
+the request, so a burst of generations (an agency working through a
+caseload) tied up the sync gunicorn workers. Generation endpoints now call
+submit(), which records a RenderJob and hands the inputs to a local thread
+pool (RENDER_WORKERS per process); the endpoint answers 202 with the job ID
+straight away and the client polls /api/documents/jobs/<id>.
+
+Inputs are never stored: the job row only keeps their SHA-256, which is used
+to coalesce identical requests. While a job for the same user, type and
+inputs is pending or processing, submit() returns that job instead of
+queueing another render. A job still unfinished after RENDER_JOB_TIMEOUT is
+assumed lost with its worker: it is no longer joined, and job_status() marks
+it failed so polling clients stop waiting. Any error in a pool thread,
+including database errors before the render starts, is logged and marks
+the job failed. The finished PDF goes into the pdf_delivery
+store under the job's output_key and is downloaded through a signed link.
+Links saved with a record (a passport application's pdf_url) serve the
+stored output of the latest completed job through stored_output(), and
+queue a new job once it has expired; requests never render themselves.
+"""
+import json
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from config import Config
+from models import db
+from document_models import RenderJob, PassportApplication
+from pdf_generator import CoverLetterGenerator, I94HistoryGenerator, PassportPDFGenerator
+import pdf_delivery
+import pdf_branding
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+FAILED = 'failed'
+ACTIVE_STATUSES = (PENDING, PROCESSING)
+
+executor = ThreadPoolExecutor(max_workers=Config.RENDER_WORKERS, thread_name_prefix='render')
+
+# (user_id, job_type, inputs_hash) -> job id, for jobs queued by this process
+_in_flight = {}
+_lock = threading.Lock()
+
+
+def _render(generator, *args):
+    return generator.save_to_bytes(generator.generate(*args)).getvalue()
+
+
+def _branding(inputs):
+    return pdf_branding.profile_for_branding(inputs.get('branding'))
+
+
+def render_cover_letter(inputs):
+    return _render(CoverLetterGenerator(branding=_branding(inputs)), inputs['user_data'], inputs['form_info'])
+
+
+def render_i94_history(inputs):
+    return _render(I94HistoryGenerator(branding=_branding(inputs)), inputs['user_data'], inputs['travel_history'], inputs.get('summary'))
+
+
+def render_passport(inputs):
+    """Render a paid application's DS-11 guide and mark the application completed"""
+    application = db.session.get(PassportApplication, inputs['application_id'])
+    body = _render(PassportPDFGenerator(), application.to_dict())
+    application.pdf_url = inputs['pdf_url']
+    application.status = 'completed'
+    application.completed_at = datetime.utcnow()
+    return body
+
+
+# Job type -> function(inputs) returning PDF bytes
+RENDERERS = {
+    'cover_letter': render_cover_letter,
+    'i94_history': render_i94_history,
+    'passport': render_passport,
+}
+
+
+def inputs_hash(job_type, inputs):
+    """Stable SHA-256 of a job's type and inputs"""
+    payload = json.dumps([job_type, inputs], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def find_active(user_id, job_type, digest):
+    """An identical job that is still pending or processing in any worker"""
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.RENDER_JOB_TIMEOUT)
+    return RenderJob.query.filter(
+        RenderJob.user_id == user_id,
+        RenderJob.job_type == job_type,
+        RenderJob.inputs_hash == digest,
+        RenderJob.status.in_(ACTIVE_STATUSES),
+        RenderJob.created_at >= cutoff
+    ).order_by(RenderJob.created_at.desc()).first()
+
+
+def stored_output(user_id, job_type, inputs):
+    """PDF bytes of the latest completed job for these inputs, if still in the pdf_delivery store"""
+    job = RenderJob.query.filter_by(
+        user_id=user_id, job_type=job_type, inputs_hash=inputs_hash(job_type, inputs), status=COMPLETED
+    ).order_by(RenderJob.completed_at.desc()).first()
+    return pdf_delivery.store.get(job.output_key) if job is not None and job.output_key else None
+
+
+def submit(job_type, user_id, inputs, download_name):
+    """Queue a render (or join an identical one in flight); returns the RenderJob"""
+    digest = inputs_hash(job_type, inputs)
+    key = (user_id, job_type, digest)
+    with _lock:
+        job_id = _in_flight.get(key)
+        job = db.session.get(RenderJob, job_id) if job_id else find_active(*key)
+        if job is not None and job.status in ACTIVE_STATUSES:
+            return job
+
+        job = RenderJob(id=uuid.uuid4().hex, user_id=user_id, job_type=job_type,
+                        inputs_hash=digest, status=PENDING, download_name=download_name)
+        db.session.add(job)
+        db.session.commit()
+        _in_flight[key] = job.id
+
+    executor.submit(_run, current_app._get_current_object(), job.id, key, inputs)
+    return job
+
+
+def _mark_failed(job_id, error):
+    """Record a job that did not finish (unless another worker already has)"""
+    job = db.session.get(RenderJob, job_id)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        job.status = FAILED
+        job.error = error
+        job.completed_at = datetime.utcnow()
+        db.session.commit()
+
+
+def _run(app, job_id, key, inputs):
+    """Render one job in a pool thread; any error marks the job failed"""
+    try:
+        with app.app_context():
+            try:
+                job = db.session.get(RenderJob, job_id)
+                job.status = PROCESSING
+                job.started_at = datetime.utcnow()
+                db.session.commit()
+
+                body = RENDERERS[job.job_type](inputs)
+                job.output_key = pdf_delivery.store_pdf(body)
+                job.status = COMPLETED
+                job.completed_at = datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Render job {job_id} failed: {str(e)}")
+                try:
+                    _mark_failed(job_id, 'PDF generation failed')
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Could not mark render job {job_id} failed: {str(e)}")
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
+
+
+def expire_if_lost(job):
+    """Mark a job failed if it is still unfinished after RENDER_JOB_TIMEOUT (its worker died)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.RENDER_JOB_TIMEOUT)
+    if job.status in ACTIVE_STATUSES and job.created_at < cutoff:
+        _mark_failed(job.id, 'PDF generation timed out')
+    return job
+
+
+def job_status(job):
+    """Status payload for a job, with a signed download_url once it has completed"""
+    data = expire_if_lost(job).to_dict()
+    data['status_url'] = url_for('get_render_job', job_id=job.id)
+    if job.status == COMPLETED:
+        data['download_url'] = pdf_delivery.download_url(job.output_key, job.user_id, job.download_name)
+    return data
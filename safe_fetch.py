@@ -0,0 +1,108 @@
+"""
+Fetching user-supplied URLs without reaching internal hosts
+
+Tenant logos (EnterpriseSettings.logo_url) and official form PDFs
+(ImmigrationForm.pdf_url) are read from URLs that come from user or admin
+input. read_source() serves a /static/ path from disk (never outside the
+static root) or fetches a public http(s) URL, and stops at max_bytes.
+
+A remote host must resolve only to public addresses (no private, loopback,
+link-local, reserved or multicast ranges, including IPv4-mapped IPv6), the
+request is sent to the address that was checked rather than resolved again,
+and each redirect (at most MAX_REDIRECTS) is checked the same way. HTTPS is
+still verified against the host name. Anything unusable raises ValueError.
+"""
+import os
+import ssl
+import socket
+import ipaddress
+import http.client
+from urllib.parse import urlsplit, urljoin
+
+MAX_REDIRECTS = 3
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+def public_address(host, port):
+    """An address host resolves to; ValueError unless every address is public"""
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f'cannot resolve host {host}') from e
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f'host {host} is not a public address')
+    return addresses[0]
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection to an already checked address (no second DNS lookup)"""
+
+    def __init__(self, host, address, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection to an already checked address, verified against the host name"""
+
+    def __init__(self, host, address, **kwargs):
+        self.ssl_context = ssl.create_default_context()
+        super().__init__(host, context=self.ssl_context, **kwargs)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+
+
+def fetch(url, max_bytes, timeout, user_agent):
+    """Body of a GET to a public http(s) URL, following checked redirects"""
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError('unsupported URL')
+        secure = parts.scheme == 'https'
+        port = parts.port or (443 if secure else 80)
+        connection_class = _PinnedHTTPSConnection if secure else _PinnedHTTPConnection
+        connection = connection_class(parts.hostname, public_address(parts.hostname, port), port=port,
+                                      timeout=timeout)
+        try:
+            path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+            connection.request('GET', path, headers={'User-Agent': user_agent})
+            response = connection.getresponse()
+            location = response.getheader('Location')
+            if response.status in REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                continue
+            if response.status != 200:
+                raise ValueError(f'request returned HTTP {response.status}')
+            return _limited(response.read(max_bytes + 1), max_bytes)
+        finally:
+            connection.close()
+    raise ValueError('too many redirects')
+
+
+def read_source(url, static_root, max_bytes, timeout, user_agent):
+    """Bytes of a /static/ path under static_root or of a public http(s) URL"""
+    if url.startswith('/static/'):
+        path = os.path.normpath(os.path.join(static_root, url[len('/static/'):]))
+        if not path.startswith(static_root + os.sep):
+            raise ValueError('path outside static/')
+        with open(path, 'rb') as f:
+            return _limited(f.read(max_bytes + 1), max_bytes)
+    if url.startswith(('http://', 'https://')):
+        return fetch(url, max_bytes, timeout, user_agent)
+    raise ValueError('unsupported URL')
+
+
+def _limited(data, max_bytes):
+    if len(data) > max_bytes:
+        raise ValueError(f'larger than {max_bytes} bytes')
+    return data
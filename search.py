@@ -0,0 +1,279 @@
+"""
+Full-text search across forms, checklists, filling guides and templates
+
+Every searchable thing is one row of the search_documents table:
+- form:     title and form number (A), description and category (B),
+            checklist items (C)
+- guide:    the FORM_GUIDES entry of a catalog form - part titles and
+            instructions (B), tips, common mistakes, before-submit checklist
+            and pro tips (C); results link to /api/form-guide/<form id>
+- template: title (A), description, category and use case (B)
+
+PostgreSQL stores a weighted tsvector generated column with a GIN index and
+ranks with ts_rank. SQLite (local development) uses an FTS5 table ranked with
+bm25 using the same column weights. The last query term always matches as a
+prefix, so the endpoint doubles as autocomplete.
+
+The index follows the catalog: whenever the forms or templates snapshot
+fingerprint (see catalog.py) or the guides change, the first search in each
+worker compares the version stored in search_index_meta and, if it differs,
+rebuilds the index under a lock. Searches between changes cost one indexed
+query.
+"""
+import re
+import threading
+from models import db, ImmigrationForm, FormTemplate
+from form_guides import GUIDES_VERSION, get_form_guide
+import catalog
+
+DOC_TYPES = ('form', 'guide', 'template')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MAX_TERMS = 8
+
+# Relative weight of the A/B/C columns for SQLite's bm25 (PostgreSQL uses ts_rank's defaults)
+FTS5_WEIGHTS = (10.0, 4.0, 1.0)
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+POSTGRES_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS search_documents (
+        id SERIAL PRIMARY KEY,
+        doc_type VARCHAR(20) NOT NULL,
+        doc_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        form_number VARCHAR(20),
+        category VARCHAR(100),
+        access_level VARCHAR(50),
+        weight_a TEXT,
+        weight_b TEXT,
+        weight_c TEXT,
+        document TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(weight_a, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(weight_b, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(weight_c, '')), 'C')
+        ) STORED
+    )""",
+    'CREATE INDEX IF NOT EXISTS ix_search_documents_document ON search_documents USING gin (document)',
+    'CREATE TABLE IF NOT EXISTS search_index_meta (name VARCHAR(50) PRIMARY KEY, version VARCHAR(200) NOT NULL)',
+]
+
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5(
+        weight_a, weight_b, weight_c,
+        doc_type UNINDEXED, doc_id UNINDEXED, title UNINDEXED, form_number UNINDEXED,
+        category UNINDEXED, access_level UNINDEXED,
+        tokenize = 'porter unicode61', prefix = '2 3'
+    )""",
+    'CREATE TABLE IF NOT EXISTS search_index_meta (name VARCHAR(50) PRIMARY KEY, version VARCHAR(200) NOT NULL)',
+]
+
+POSTGRES_SEARCH = """
+    SELECT doc_type, doc_id, title, form_number, category, access_level,
+           ts_rank(document, query) AS score
+    FROM search_documents, to_tsquery('english', :query) AS query
+    WHERE document @@ query {type_filter}
+    ORDER BY score DESC, doc_type, doc_id
+    LIMIT :limit
+"""
+
+SQLITE_SEARCH = """
+    SELECT doc_type, doc_id, title, form_number, category, access_level,
+           -bm25(search_documents, {weights}) AS score
+    FROM search_documents
+    WHERE search_documents MATCH :query {type_filter}
+    ORDER BY score DESC, doc_type, doc_id
+    LIMIT :limit
+"""
+
+
+def is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def query_terms(text):
+    """Lowercased word terms of a search string (punctuation is dropped)"""
+    return TERM_RE.findall((text or '').lower())[:MAX_TERMS]
+
+
+def build_query(terms):
+    """Dialect query string matching all terms, the last one as a prefix"""
+    if is_postgres():
+        parts = list(terms[:-1]) + [f'{terms[-1]}:*']
+        return ' & '.join(parts)
+    parts = [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+    return ' '.join(parts)
+
+
+def joined(*values):
+    """Join the non-empty text values of a column"""
+    return '\n'.join(str(value) for value in values if value)
+
+
+def guide_documents(guide):
+    """(weight_b, weight_c) text of a FORM_GUIDES entry"""
+    steps, notes = [], []
+    for step in guide.get('filling_steps', []):
+        steps.append(step.get('part'))
+        steps.extend(step.get('instructions', []))
+        notes.extend(step.get('tips', []))
+    for key in ('common_mistakes', 'before_submit', 'pro_tips'):
+        notes.extend(guide.get(key, []))
+    return joined(*steps), joined(*notes)
+
+
+def collect_documents():
+    """Every search_documents row built from the current forms, guides and templates"""
+    rows = []
+    for form in ImmigrationForm.query.order_by(ImmigrationForm.id):
+        common = {
+            'doc_id': form.id,
+            'title': form.title,
+            'form_number': form.form_number or None,
+            'category': form.category,
+            'access_level': form.access_level,
+        }
+        rows.append(dict(common, doc_type='form',
+                         weight_a=joined(form.title, form.form_number),
+                         weight_b=joined(form.description, form.category),
+                         weight_c=joined(*form.get_checklist())))
+
+        guide = get_form_guide(form.form_number)
+        if guide:
+            steps, notes = guide_documents(guide)
+            rows.append(dict(common, doc_type='guide',
+                             title=f'{form.form_number} filling guide',
+                             weight_a=joined(form.form_number, 'filling guide'),
+                             weight_b=steps, weight_c=notes))
+
+    for template in FormTemplate.query.order_by(FormTemplate.id):
+        rows.append({
+            'doc_type': 'template',
+            'doc_id': template.id,
+            'title': template.title,
+            'form_number': None,
+            'category': template.category,
+            'access_level': template.access_level,
+            'weight_a': template.title,
+            'weight_b': joined(template.description, template.category, template.use_case),
+            'weight_c': None,
+        })
+    return rows
+
+
+class SearchIndex:
+    """Keeps search_documents in step with the catalog and answers queries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+
+    def source_version(self):
+        """Version string of everything the index is built from"""
+        forms_fingerprint = catalog.forms.get().fingerprint
+        templates_fingerprint = catalog.templates.get().fingerprint
+        return f'{forms_fingerprint!r}|{templates_fingerprint!r}|{GUIDES_VERSION}'
+
+    def ensure_schema(self):
+        for statement in POSTGRES_SCHEMA if is_postgres() else SQLITE_SCHEMA:
+            db.session.execute(db.text(statement))
+        db.session.commit()
+
+    def stored_version(self):
+        return db.session.execute(db.text(
+            "SELECT version FROM search_index_meta WHERE name = 'catalog'"
+        )).scalar()
+
+    def rebuild(self, version=None, force=False):
+        """Replace every indexed document (one transaction, serialized across workers)"""
+        version = version or self.source_version()
+        self.ensure_schema()
+        if is_postgres():
+            db.session.execute(db.text("SELECT pg_advisory_xact_lock(hashtext('search_documents'))"))
+        if not force and self.stored_version() == version:
+            # Another worker rebuilt it while we waited for the lock
+            db.session.commit()
+            return 0
+
+        rows = collect_documents()
+        db.session.execute(db.text('DELETE FROM search_documents'))
+        if rows:
+            db.session.execute(db.text(
+                'INSERT INTO search_documents (doc_type, doc_id, title, form_number, category, '
+                'access_level, weight_a, weight_b, weight_c) VALUES (:doc_type, :doc_id, :title, '
+                ':form_number, :category, :access_level, :weight_a, :weight_b, :weight_c)'
+            ), rows)
+        db.session.execute(db.text("DELETE FROM search_index_meta WHERE name = 'catalog'"))
+        db.session.execute(db.text(
+            "INSERT INTO search_index_meta (name, version) VALUES ('catalog', :version)"
+        ), {'version': version})
+        db.session.commit()
+        return len(rows)
+
+    def ensure_current(self):
+        """Rebuild the index if the catalog changed since it was built"""
+        version = self.source_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            try:
+                current = self.stored_version() == version
+            except Exception:
+                # search_index_meta does not exist yet
+                db.session.rollback()
+                current = False
+            if not current:
+                self.rebuild(version)
+            self._version = version
+
+    def invalidate(self):
+        """Re-check the stored version on the next search in this worker"""
+        with self._lock:
+            self._version = None
+
+    def search(self, text, limit=DEFAULT_LIMIT, doc_types=None):
+        """Ranked documents matching every term of text, the last term as a prefix"""
+        terms = query_terms(text)
+        if not terms:
+            return []
+        self.ensure_current()
+
+        params = {'query': build_query(terms), 'limit': min(max(limit, 1), MAX_LIMIT)}
+        type_filter = ''
+        if doc_types:
+            names = [f'type_{i}' for i in range(len(doc_types))]
+            type_filter = f"AND doc_type IN ({', '.join(':' + name for name in names)})"
+            params.update(zip(names, doc_types))
+
+        if is_postgres():
+            sql = POSTGRES_SEARCH.format(type_filter=type_filter)
+        else:
+            weights = ', '.join(str(weight) for weight in FTS5_WEIGHTS)
+            sql = SQLITE_SEARCH.format(type_filter=type_filter, weights=weights)
+
+        rows = db.session.execute(db.text(sql), params).mappings()
+        return [{
+            'type': row['doc_type'],
+            'id': int(row['doc_id']),
+            'title': row['title'],
+            'form_number': row['form_number'],
+            'category': row['category'],
+            'access_level': row['access_level'],
+            'score': round(float(row['score']), 4),
+        } for row in rows]
+
+
+index = SearchIndex()
+
+
+def search(text, limit=DEFAULT_LIMIT, doc_types=None):
+    """Search the shared index (see SearchIndex.search)"""
+    return index.search(text, limit, doc_types)
+
+
+def rebuild():
+    """Rebuild the index now (migration scripts and benchmarks)"""
+    index.invalidate()
+    return index.rebuild(force=True)
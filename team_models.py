@@ -87,6 +87,8 @@ class TeamMembership(db.Model):
     __tablename__ = 'team_memberships'
     __table_args__ = (
         UniqueConstraint('team_id', 'user_id', name='unique_team_user'),
+        # Branding and team lookups filter on (user_id, status)
+        db.Index('ix_team_memberships_user_status', 'user_id', 'status'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -126,6 +128,9 @@ class TeamMembership(db.Model):
 class TeamInvitation(db.Model):
     """Pending invitations to join a team"""
     __tablename__ = 'team_invitations'
+    __table_args__ = (
+        db.Index('ix_team_invitations_team_status', 'team_id', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
@@ -6,6 +6,8 @@ from functools import wraps
 from models import db, User
 from team_models import Team, TeamMembership, TeamInvitation
 from config import Config
+from identity import load_identity, get_current_user
+import branding
 import secrets
 from datetime import datetime, timedelta
 
@@ -18,13 +20,6 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_current_user():
-    """Get current user from session"""
-    clerk_user_id = session.get('clerk_user_id')
-    if clerk_user_id:
-        return User.query.filter_by(clerk_user_id=clerk_user_id).first()
-    return None
-
 def register_team_routes(app):
     """Register all team-related routes"""
 
@@ -53,10 +48,7 @@ def register_team_routes(app):
 
         if not team:
             # Find first team user is member of
-            membership = TeamMembership.query.filter_by(
-                user_id=user.id,
-                status='active'
-            ).first()
+            membership = load_identity().membership
             if membership:
                 team = membership.team
 
@@ -246,6 +238,7 @@ def register_team_routes(app):
             user.active_team_id = team.id
 
         db.session.commit()
+        branding.invalidate_user(user.clerk_user_id)
 
         return jsonify({
             'message': 'Successfully joined team',
@@ -301,6 +294,7 @@ def register_team_routes(app):
         # Mark as removed instead of deleting
         membership.status = 'removed'
         db.session.commit()
+        branding.invalidate_user(membership.user.clerk_user_id)
 
         return jsonify({'message': 'Member removed successfully'})
 
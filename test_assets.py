@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for inline asset extraction and fingerprinted asset URLs
+"""
+import os
+import json
+import tempfile
+from flask import Flask, render_template_string
+from build_assets import AssetWriter, extract_inline_assets
+import assets
+
+TEMPLATE = """
+<style>
+    body { color: red; }
+</style>
+<style>
+    :root { --brand: {{ g.branding.primary_color }}; }
+</style>
+<style>
+    .hero { background: url('img/hero.png'); }
+</style>
+<script type="application/ld+json">{"@type": "Organization"}</script>
+<script>
+    var a = 1;
+</script>
+"""
+
+
+def test_only_static_blocks_are_extracted():
+    with tempfile.TemporaryDirectory() as dist_dir:
+        writer = AssetWriter(dist_dir)
+        output = extract_inline_assets(TEMPLATE, 'page', writer)
+
+        assert sorted(writer.manifest) == ['page.1.css', 'page.2.js']
+        assert '<link rel="stylesheet" href="{{ asset_url(\'page.1.css\') }}">' in output
+        assert '<script src="{{ asset_url(\'page.2.js\') }}"></script>' in output
+        # Jinja, relative url() and JSON-LD blocks stay inline
+        assert '{{ g.branding.primary_color }}' in output
+        assert "url('img/hero.png')" in output
+        assert 'application/ld+json' in output
+
+        path = os.path.join(dist_dir, os.path.basename(writer.manifest['page.1.css']))
+        with open(path) as f:
+            assert f.read() == 'body { color: red; }\n'
+
+
+def test_asset_url_uses_manifest_and_assets_are_immutable():
+    with tempfile.TemporaryDirectory() as static_folder:
+        app = Flask(__name__, static_folder=static_folder, static_url_path='/static')
+        assets.init_app(app)
+        os.makedirs(os.path.join(static_folder, assets.DIST_DIR))
+        with open(os.path.join(static_folder, assets.DIST_DIR, 'page.1.abc.css'), 'w') as f:
+            f.write('body {}')
+
+        with app.test_request_context():
+            # No manifest yet: plain static URL
+            assert render_template_string("{{ asset_url('page.1.css') }}") == '/static/page.1.css'
+
+        with open(os.path.join(static_folder, assets.DIST_DIR, assets.MANIFEST_NAME), 'w') as f:
+            json.dump({'page.1.css': 'dist/page.1.abc.css'}, f)
+        with app.test_request_context():
+            assert render_template_string("{{ asset_url('page.1.css') }}") == '/static/dist/page.1.abc.css'
+
+        response = app.test_client().get('/static/dist/page.1.abc.css')
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 31536000
+        response.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the branding resolution cache
+"""
+import time
+import branding
+from identity import ANONYMOUS
+
+
+def test_lru_evicts_least_recently_used():
+    cache = branding.BrandingCache(max_size=2, ttl=60)
+    cache.set('a', {'site_name': 'A'})
+    cache.set('b', {'site_name': 'B'})
+    assert cache.get('a') == {'site_name': 'A'}  # 'a' is now most recent
+    cache.set('c', {'site_name': 'C'})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = branding.BrandingCache(max_size=10, ttl=0.01)
+    cache.set('a', {'site_name': 'A'})
+    time.sleep(0.02)
+    assert cache.get('a') is None
+
+
+def test_clear_bumps_generation():
+    cache = branding.BrandingCache(max_size=10, ttl=60)
+    cache.set('a', {'site_name': 'A'})
+    cache.clear()
+    assert cache.generation == 1
+    assert cache.get('a') is None
+
+
+def test_get_branding_resolves_once_per_user():
+    branding.invalidate_all()
+    calls = []
+
+    def load_identity():
+        calls.append(1)
+        return ANONYMOUS
+
+    assert branding.get_branding('user_1', load_identity) == branding.DEFAULT_BRANDING
+    assert branding.get_branding('user_1', load_identity) == branding.DEFAULT_BRANDING
+    assert len(calls) == 1
+
+    branding.invalidate_user('user_1')
+    branding.get_branding('user_1', load_identity)
+    assert len(calls) == 2
+
+    branding.invalidate_all()
+    branding.get_branding('user_1', load_identity)
+    assert len(calls) == 3
+
+
+def test_anonymous_requests_skip_resolution():
+    def load_identity():
+        raise AssertionError('anonymous requests should not load an identity')
+
+    assert branding.get_branding(None, load_identity) == branding.DEFAULT_BRANDING
+
+
+def test_skip_paths():
+    assert branding.should_skip('/static/css/app.css')
+    assert branding.should_skip('/api/documents')
+    assert branding.should_skip('/health')
+    assert not branding.should_skip('/')
+    assert not branding.should_skip('/dashboard')
+    assert not branding.should_skip('/healthcheck-page')
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned forms catalog snapshot
+
+Compares every access variant of the snapshot with the per-request logic
+/api/documents used before catalog.py, and checks version invalidation.
+"""
+import json
+import re
+from flask import Flask
+from models import db, ImmigrationForm, FormTemplate, extract_form_number
+from config import Config
+from form_guides import FORM_GUIDES, get_compiled_guide
+import catalog
+import filing_registry
+import entitlements
+
+app = None
+
+
+def setup_module(module):
+    global app
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        forms = [
+            ('Form I-130 - Petition for Alien Relative', 'free', 6),
+            ('Form I-765 - Application for Employment Authorization', 'free', 5),
+            ('Form I-131 - Application for Travel Document', 'free', 2),
+            ('Form I-864 - Affidavit of Support', 'complete', 8),
+            ('Form I-129F - Petition for Alien Fiance(e)', 'agency', 4),
+            ('Form N-400 - Application for Naturalization', 'free', 0),
+            ('Civil documents by country', 'basic', 3),
+        ]
+        for title, access_level, items in forms:
+            form = ImmigrationForm(title=title, category='Test', description='', access_level=access_level)
+            form.set_checklist([f'{title} item {i}' for i in range(items)])
+            db.session.add(form)
+        for title, access_level in [('Client Intake', 'free'), ('Retainer Agreement', 'agency'), ('Job Offer', 'complete')]:
+            db.session.add(FormTemplate(title=title, category='Test', access_level=access_level))
+        db.session.commit()
+
+
+def teardown_module(module):
+    with app.app_context():
+        db.drop_all()
+
+
+def legacy_documents(forms, user, user_entitlements):
+    """Reference copy of the pre-snapshot get_documents loop"""
+    documents = []
+    FREE_TRIAL_FORMS = ['I-130', 'I-485', 'N-400']
+    for form in forms:
+        form_dict = form.to_dict()
+        form_number_match = re.search(r'Form\s+([\w-]+)', form.title)
+        form_number = form_number_match.group(1) if form_number_match else ''
+        is_free_trial = form_number in FREE_TRIAL_FORMS
+        # Fees now come from the filing registry
+        form_dict['fee'] = filing_registry.get_filings().fee(form_number, form_dict['fee'])
+        if form.access_level == 'free':
+            if is_free_trial:
+                form_dict.update(has_access=True, requires_login=False, is_preview=False, is_free_trial=True)
+            elif user:
+                form_dict.update(has_access=True, requires_login=False, is_preview=False, is_free_trial=False)
+            else:
+                checklist = form.get_checklist()
+                if checklist and len(checklist) > 3:
+                    form_dict['checklist'] = checklist[:3]
+                    form_dict['checklist_total'] = len(checklist)
+                    form_dict['is_preview'] = True
+                else:
+                    form_dict['checklist_total'] = len(checklist) if checklist else 0
+                    form_dict['is_preview'] = False
+                form_dict.update(has_access=True, requires_login=True, is_free_trial=False)
+        elif user and user_entitlements.can_access_level(form.access_level):
+            form_dict.update(has_access=True, requires_login=False, is_preview=False, is_free_trial=False)
+        elif user:
+            form_dict.update(has_access=False, requires_login=False, requires_upgrade=True,
+                             is_preview=False, checklist=[], is_free_trial=False)
+        else:
+            form_dict.update(has_access=False, requires_login=True, is_preview=False,
+                             checklist=[], is_free_trial=False)
+        form_dict['required_tier'] = form.access_level
+        documents.append(form_dict)
+    return documents
+
+
+def test_variants_match_legacy_access_logic():
+    with app.app_context():
+        catalog.invalidate()
+        snapshot = catalog.get_snapshot()
+        forms = ImmigrationForm.query.order_by(ImmigrationForm.id).all()
+
+        assert json.loads(snapshot.variant(None).body) == legacy_documents(forms, None, entitlements.ANONYMOUS)
+        for tier in Config.SUBSCRIPTION_TIERS:
+            for status in ('active', 'cancelled'):
+                ent = entitlements.for_tier(tier, status)
+                expected = legacy_documents(forms, object(), ent)
+                assert json.loads(snapshot.variant(ent).body) == expected, (tier, status)
+
+
+def test_snapshot_is_reused_until_invalidated():
+    with app.app_context():
+        catalog.invalidate()
+        snapshot = catalog.get_snapshot()
+        assert catalog.get_snapshot() is snapshot
+        assert snapshot.variant(None) is snapshot.variant(None)
+
+        form = ImmigrationForm.query.first()
+        form.set_checklist(['Only item'])
+        db.session.commit()
+        catalog.invalidate()
+
+        rebuilt = catalog.get_snapshot()
+        assert rebuilt is not snapshot
+        assert rebuilt.by_id[form.id].preview == ['Only item']
+        assert rebuilt.variant(None).etag != snapshot.variant(None).etag
+
+
+def test_form_number_and_checklist_count_are_derived():
+    assert extract_form_number('Form I-130 - Petition') == 'I-130'
+    assert extract_form_number('Form N-400') == 'N-400'
+    assert extract_form_number('Civil documents') == ''
+    assert extract_form_number(None) == ''
+
+    with app.app_context():
+        form = ImmigrationForm.query.filter_by(form_number='I-864').one()
+        assert form.checklist_count == 8
+        form.title = 'Form I-864A - Contract Between Sponsor and Household Member'
+        form.set_checklist(['One', 'Two'])
+        assert (form.form_number, form.checklist_count) == ('I-864A', 2)
+        db.session.rollback()
+
+        catalog.invalidate()
+        snapshot = catalog.get_snapshot()
+        assert snapshot.by_number['N-400'].checklist_count == 0
+
+
+def test_preview_is_computed_by_the_database():
+    with app.app_context():
+        catalog.invalidate()
+        snapshot = catalog.get_snapshot()
+        entry = snapshot.by_number['I-765']
+        assert entry.preview == ['Form I-765 - Application for Employment Authorization item %d' % i for i in range(3)]
+        assert entry.checklist_count == 5
+
+        # Anonymous visitors only need full checklists for the free trial forms
+        snapshot.variant(None)
+        loaded = {e.form_number for e in snapshot.entries if e.checklist is not None}
+        assert loaded == {'I-130', 'N-400'}
+
+
+def test_keyset_pagination_filters_and_fields():
+    with app.app_context():
+        catalog.invalidate()
+        snapshot = catalog.get_snapshot()
+        all_ids = [entry.id for entry in snapshot.entries]
+
+        # Walk the whole catalog two items at a time
+        seen, after = [], None
+        while True:
+            args = {'limit': '2', 'fields': 'title'}
+            if after:
+                args['after'] = str(after)
+            page = json.loads(snapshot.page(catalog.ListQuery(args)).body)
+            assert all(set(item) == {'id', 'title'} for item in page['items'])
+            seen.extend(item['id'] for item in page['items'])
+            after = page['next_after']
+            if after is None:
+                break
+        assert seen == all_ids
+
+        page = json.loads(snapshot.page(catalog.ListQuery({'access_level': 'free', 'q': 'form i-1'})).body)
+        assert [item['form_number'] for item in page['items']] == ['I-130', 'I-131']
+        assert page['total'] == 2 and page['next_after'] is None
+
+        page = json.loads(snapshot.page(catalog.ListQuery({'category': 'Test', 'access_level': 'agency'})).body)
+        assert [item['form_number'] for item in page['items']] == ['I-129F']
+        assert page['items'][0]['requires_login']
+
+    assert not catalog.ListQuery.requested({})
+    assert catalog.ListQuery.requested({'fields': 'id'})
+    assert catalog.ListQuery({'limit': '100000'}).limit == catalog.MAX_PAGE_SIZE
+
+
+def test_template_variants():
+    with app.app_context():
+        catalog.templates.invalidate()
+        snapshot = catalog.templates.get()
+
+        anonymous = {t['title']: t for t in json.loads(snapshot.variant(None).body)}
+        assert anonymous['Client Intake']['has_access']
+        assert anonymous['Retainer Agreement']['requires_login']
+
+        complete = {t['title']: t for t in json.loads(snapshot.variant(entitlements.for_tier('complete', 'active')).body)}
+        assert complete['Job Offer']['has_access']
+        assert complete['Retainer Agreement']['requires_upgrade']
+
+
+def test_precompiled_guides_match_serialized_dicts():
+    assert get_compiled_guide('i-130') is get_compiled_guide('I-130')
+    assert get_compiled_guide('I-130A') is None and get_compiled_guide(None) is None
+
+    with app.app_context():
+        catalog.invalidate()
+        snapshot = catalog.get_snapshot()
+        entry = snapshot.by_number['I-130']
+        expected = catalog.CatalogVariant({'available': True, 'form_title': entry.title,
+                                           'guide': FORM_GUIDES['I-130']})
+        assert snapshot.guide(entry).body == expected.body
+        assert json.loads(snapshot.guide(snapshot.by_number['I-765']).body)['available'] is False
+
+        outline = json.loads(snapshot.guide_outline(entry).body)
+        assert 'filling_steps' not in outline
+        assert [part['part'] for part in outline['parts']] == [
+            step['part'] for step in FORM_GUIDES['I-130']['filling_steps']]
+
+        part = json.loads(snapshot.guide_part(entry, 1).body)
+        assert part['part'] == FORM_GUIDES['I-130']['filling_steps'][1]
+        assert part['total'] == len(outline['parts'])
+        assert snapshot.guide_part(entry, len(outline['parts'])) is None
+        assert snapshot.guide_part(entry, -1) is None
+
+
+def test_conditional_get_returns_304_from_memory():
+    with app.app_context():
+        catalog.invalidate()
+        variant = catalog.get_snapshot().variant(None)
+
+    with app.test_request_context('/api/documents', headers={'If-None-Match': f'"{variant.etag}"'}):
+        response = catalog.respond(variant, public=True)
+        assert response.status_code == 304
+        assert response.get_etag() == (variant.etag, False)
+        assert 'public' in response.headers['Cache-Control']
+        assert 'Cookie' in response.headers['Vary']
+
+    with app.test_request_context('/api/documents', headers={'If-None-Match': '"stale"'}):
+        response = catalog.respond(variant, public=False)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] in ('private, no-cache', 'no-cache, private')
+
+
+if __name__ == '__main__':
+    setup_module(None)
+    try:
+        for name, test in list(globals().items()):
+            if name.startswith('test_'):
+                test()
+                print(f"✓ {name}")
+    finally:
+        teardown_module(None)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for response compression and the template minifier
+"""
+import gzip
+from flask import Flask, Response, request
+from build_assets import minify_html
+import compression
+
+app = Flask(__name__)
+compression.init_app(app)
+
+BODY = b'{"items": [' + b', '.join(b'"item %d"' % i for i in range(200)) + b']}'
+
+
+@app.route('/json')
+def json_body():
+    response = Response(BODY, mimetype='application/json')
+    response.set_etag('abc')
+    return response.make_conditional(request)
+
+
+@app.route('/pdf')
+def pdf_body():
+    return Response(b'%PDF-1.4' + b' ' * 2000, mimetype='application/pdf')
+
+
+@app.route('/small')
+def small_body():
+    return Response('tiny', mimetype='text/html')
+
+
+def test_negotiation_prefers_highest_quality():
+    from werkzeug.http import parse_accept_header
+    from werkzeug.datastructures import Accept
+    accept = parse_accept_header('gzip;q=0.5, br', Accept)
+    assert compression.negotiate(accept, ('br', 'gzip')) == 'br'
+    assert compression.negotiate(parse_accept_header('gzip', Accept), ('br', 'gzip')) == 'gzip'
+    assert compression.negotiate(parse_accept_header('identity', Accept), ('br', 'gzip')) is None
+
+
+def test_cacheable_responses_are_compressed_once():
+    compression.cache.clear()
+    client = app.test_client()
+    response = client.get('/json', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == BODY
+    assert response.get_etag() == ('abc-gz', False)
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert compression.cache.get(('abc', 'gzip')) == response.data
+
+    again = client.get('/json', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"abc-gz"'})
+    assert again.status_code == 304
+
+    plain = client.get('/json')
+    assert 'Content-Encoding' not in plain.headers and plain.data == BODY
+
+
+def test_pdfs_and_small_bodies_pass_through():
+    client = app.test_client()
+    assert 'Content-Encoding' not in client.get('/pdf', headers={'Accept-Encoding': 'gzip'}).headers
+    assert client.get('/small', headers={'Accept-Encoding': 'gzip'}).data == b'tiny'
+
+
+def test_minifier_keeps_script_lines_and_jinja_comments():
+    source = """
+    <div>
+        <!-- drop me -->
+        <!-- {% if user %} keep me {% endif %} -->
+        <p>Hello</p>
+    </div>
+    <pre>
+      keep   indentation
+    </pre>
+    <script>
+        var a = 1 // comment
+        var b = 2
+    </script>
+    """
+    output = minify_html(source)
+    assert 'drop me' not in output
+    assert '{% if user %} keep me' in output
+    assert '<pre>\n      keep   indentation\n    </pre>' in output
+    assert 'var a = 1 // comment\nvar b = 2' in output
+    assert '-->\n<p>Hello</p>\n</div>' in output
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
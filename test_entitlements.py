@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the entitlement engine
+
+Every compiled check is compared with the inline tier logic the routes used
+before entitlements.py existed, across all tiers (plus an unknown one),
+subscription statuses, access levels and combinations of purchased tools.
+"""
+from itertools import combinations, product
+from config import Config
+import entitlements
+
+TIERS = list(Config.SUBSCRIPTION_TIERS) + ['legacy_unknown', None]
+STATUSES = ['active', 'inactive', 'cancelled', 'past_due', None]
+LEVELS = list(Config.SUBSCRIPTION_TIERS) + ['unknown_level']
+TOOLS = list(Config.DOCUMENT_TYPES)
+TOOL_SETS = [set(c) for n in range(len(TOOLS) + 1) for c in combinations(TOOLS, n)]
+
+
+# ---- Reference implementations copied from the route modules ----
+
+def legacy_has_active_subscription(tier, status):
+    return status == 'active' and tier != 'free'
+
+
+def legacy_can_access_form(tier, status, access_level):
+    if access_level == 'free':
+        return True
+    tier_hierarchy = {'free': 0, 'complete': 2, 'agency': 3, 'basic': 1, 'pro': 2, 'enterprise': 3}
+    user_tier = tier_hierarchy.get(tier, 0)
+    required_tier = tier_hierarchy.get(access_level, 0)
+    return user_tier >= required_tier and legacy_has_active_subscription(tier, status)
+
+
+def legacy_passport_access(tier, status, purchased):
+    tier_info = Config.SUBSCRIPTION_TIERS.get(tier, {})
+    return tier_info.get('document_processing', False) or 'passport' in purchased
+
+
+def legacy_i94_access(tier, status, purchased):
+    has_subscription = tier != 'free' and legacy_has_active_subscription(tier, status)
+    return has_subscription or 'travel_history' in purchased
+
+
+def legacy_all_tools(tier, status):
+    return tier in ['complete', 'agency', 'basic', 'pro', 'enterprise'] and status == 'active'
+
+
+def legacy_compression_tier(tier):
+    return tier if tier in ['complete', 'agency', 'basic', 'pro', 'enterprise'] else 'free'
+
+
+def cases():
+    for tier, status in product(TIERS, STATUSES):
+        for purchased in TOOL_SETS:
+            yield tier, status, purchased, entitlements.for_tier(tier, status, purchased)
+
+
+def test_access_levels_match_legacy_hierarchy():
+    for tier, status, _, ent in cases():
+        for level in LEVELS:
+            assert ent.can_access_level(level) == legacy_can_access_form(tier, status, level), (tier, status, level)
+
+
+def test_subscription_capabilities_match_legacy_checks():
+    for tier, status, _, ent in cases():
+        key = (tier, status)
+        assert ent.has(entitlements.PAID_TIER) == (tier != 'free'), key
+        assert ent.has(entitlements.ACTIVE_SUBSCRIPTION) == legacy_has_active_subscription(tier, status), key
+        assert ent.includes_all_tools == legacy_all_tools(tier, status), key
+        assert ent.has(entitlements.AGENCY_TEMPLATES) == (tier in ['agency', 'pro', 'enterprise']), key
+        assert ent.has(entitlements.ADMIN) == (tier == 'enterprise'), key
+        assert ent.has(entitlements.BATCH_DOCUMENTS) == (tier in ['agency', 'pro', 'enterprise'] and status == 'active'), key
+        includes_tools = ent.has(entitlements.INCLUDES_TOOLS)
+        assert (tier if includes_tools else 'free') == legacy_compression_tier(tier), key
+
+
+def test_tool_access_matches_legacy_checks():
+    for tier, status, purchased, ent in cases():
+        key = (tier, status, tuple(sorted(purchased)))
+        assert ent.can_use_tool('passport') == legacy_passport_access(tier, status, purchased), key
+        assert ent.can_use_tool('travel_history') == legacy_i94_access(tier, status, purchased), key
+        for tool in TOOLS:
+            assert ent.has_purchased(tool) == (tool in purchased), key
+        assert not ent.has_purchased('unknown_tool')
+        assert not ent.can_use_tool('unknown_tool')
+
+
+def test_anonymous_is_free_profile():
+    ent = entitlements.for_user(None)
+    assert ent is entitlements.ANONYMOUS
+    assert ent.can_access_level('free')
+    assert not ent.can_access_level('complete')
+    assert not ent.has(entitlements.PAID_TIER)
+    assert not ent.can_use_tool('passport')
+
+
+def test_entitlements_are_immutable():
+    ent = entitlements.for_tier('complete', 'active')
+    try:
+        ent.caps = 0
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError('Entitlements should reject attribute assignment')
+    assert ent == entitlements.for_tier('complete', 'active')
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the USCIS filing registry
+"""
+import os
+import json
+import tempfile
+from io import BytesIO
+from PyPDF2 import PdfReader
+from config import Config
+from pdf_generator import CoverLetterGenerator
+import filing_registry
+
+DATA = {
+    'default': {'address': ['USCIS'], 'documents': ['Completed {title}', 'Filing fee']},
+    'forms': {
+        'I-130': {'fee': '$535', 'address': ['USCIS', 'Attn: I-130'], 'documents': ['Form I-130', 'Fee of {fee}']},
+        'I-130A': {'fee': 'No fee'},
+    },
+}
+
+
+def write(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def test_lookup_and_free_text_match():
+    filings = filing_registry.Filings(DATA, 'v1')
+    assert filings.get('i-130').address == 'USCIS<br/>Attn: I-130'
+    assert filings.get('I-130').document_list('Form I-130') == ['1. Form I-130', '2. Fee of $535']
+    assert filings.get('I-130A').address_lines == ('USCIS',)
+    assert filings.get('I-999').document_list('My form') == ['1. Completed My form', '2. Filing fee']
+
+    assert filings.match('I-130A supplement for my wife') == 'I-130A'
+    assert filings.match('my i-130 petition') == 'I-130'
+    assert filings.match('DI-1300') == ''
+    assert filings.fee('I-130', '$1') == '$535' and filings.fee('I-999', '$1') == '$1'
+
+
+def test_edited_file_is_reloaded():
+    original = Config.FILING_REGISTRY_CHECK_INTERVAL
+    Config.FILING_REGISTRY_CHECK_INTERVAL = 0
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'filings.json')
+            write(path, DATA)
+            registry = filing_registry.FilingRegistry(path)
+            first = registry.get()
+            assert registry.get() is first
+
+            write(path, {'forms': {'I-130': {'fee': '$600'}}})
+            os.utime(path, (0, 1))
+            assert registry.get().fee('I-130') == '$600'
+
+            # A broken edit keeps the last good snapshot
+            with open(path, 'w') as f:
+                f.write('{not json')
+            os.utime(path, (0, 2))
+            assert registry.get().fee('I-130') == '$600'
+    finally:
+        Config.FILING_REGISTRY_CHECK_INTERVAL = original
+
+
+def test_cover_letter_uses_registry():
+    generator = CoverLetterGenerator()
+    elements = generator.generate({'full_name': 'Ana Silva'}, {'title': 'N-400 for Ana'})
+    text = PdfReader(BytesIO(generator.save_to_bytes(elements).getvalue())).pages[0].extract_text()
+    fee = filing_registry.get_filings().fee('N-400')
+    assert 'Attn: N-400' in text and f'Check or money order for {fee}' in text
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the AcroForm filling engine
+"""
+import os
+import tempfile
+from io import BytesIO
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+from reportlab.lib.pdfencrypt import StandardEncryption
+import form_filler
+import safe_fetch
+
+NAME = 'form1[0].#subform[0].Pt1Line1a_FamilyName[0]'
+
+
+def make_template(encrypt=False):
+    """A small fillable PDF laid out like a USCIS form"""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, encrypt=StandardEncryption('', ownerPassword='owner') if encrypt else None)
+    for page in range(2):
+        pdf.drawString(72, 750, f'Part {page + 1}')
+        pdf.acroForm.textfield(name=f'form1[0].#subform[{page}].AlienNumber[0]', x=400, y=740, width=150,
+                               height=20)
+        if page == 0:
+            pdf.acroForm.textfield(name=NAME, x=72, y=700, width=200, height=20)
+            pdf.acroForm.checkbox(name='Pt1Line2_Married', x=72, y=650, buttonStyle='check')
+            pdf.acroForm.radio(name='Pt1Line3_Sex', value='M', x=72, y=600)
+            pdf.acroForm.radio(name='Pt1Line3_Sex', value='F', x=100, y=600)
+            pdf.acroForm.choice(name='Pt1Line4_State', options=['CA', 'NY'], x=72, y=550, width=100, height=20,
+                                value='CA')
+        pdf.showPage()
+    pdf.save()
+    return form_filler.FormTemplate(form_filler.normalize(buffer.getvalue()))
+
+
+def read_fields(body):
+    return {name: field.get('/V') for name, field in PdfReader(BytesIO(body)).get_fields().items()}
+
+
+def test_field_tree_is_parsed_once():
+    template = make_template(encrypt=True)
+    fields = {field.name: field for field in template.fields.values()}
+    assert fields[NAME].kind == 'text' and fields[NAME].short_name == 'Pt1Line1a_FamilyName'
+    assert fields['Pt1Line2_Married'].to_dict()['states'] == ['Yes']
+    assert fields['Pt1Line3_Sex'].kind == 'radio' and fields['Pt1Line3_Sex'].states == ['M', 'F']
+    assert fields['Pt1Line4_State'].options == ['CA', 'NY']
+    assert len(template.lookup('AlienNumber')) == 2
+
+
+def test_fill_sets_values_without_reparsing():
+    template = make_template()
+    reader = form_filler.PdfReader
+    form_filler.PdfReader = None  # A fill must not parse the template again
+    try:
+        body = template.fill({'Pt1Line1a_FamilyName': 'Silva (José)', 'AlienNumber': 'A123456789',
+                              'Pt1Line2_Married': True, 'Pt1Line3_Sex': 'f', 'Pt1Line4_State': 'NY'})
+    finally:
+        form_filler.PdfReader = reader
+
+    assert body.startswith(template.data)
+    values = read_fields(body)
+    assert values[NAME] == 'Silva (José)' and values['Pt1Line4_State'] == 'NY'
+    assert values['form1[0].#subform[1].AlienNumber[0]'] == 'A123456789'
+    assert values['Pt1Line2_Married'] == '/Yes' and values['Pt1Line3_Sex'] == '/F'
+
+    # Unicode outside Latin-1 is kept in the value
+    assert read_fields(template.fill({NAME: 'Nguyễn'}))[NAME] == 'Nguyễn'
+
+
+def test_bad_payloads_are_rejected():
+    template = make_template()
+    for values in ({'Pt1Line9_Unknown': 'x'}, {'Pt1Line3_Sex': 'X'}, {NAME: ['a']}):
+        try:
+            template.fill(values)
+        except ValueError:
+            continue
+        raise AssertionError(f'{values} should be rejected')
+
+    body = template.fill({'full_name': 'Jane', 'Pt1Line1a_FamilyName': 'Doe'}, strict=False)
+    assert read_fields(body)[NAME] == 'Doe'
+
+
+def test_flatten_draws_values_into_pages():
+    template = make_template()
+    body = template.fill({NAME: 'Silva', 'AlienNumber': 'A123456789', 'Pt1Line2_Married': 'yes'}, flatten=True)
+    reader = PdfReader(BytesIO(body))
+    assert not reader.get_fields() and '/AcroForm' not in reader.trailer['/Root']
+    assert all('/Annots' not in page for page in reader.pages)
+    assert 'Silva' in reader.pages[0].extract_text() and 'A123456789' in reader.pages[1].extract_text()
+
+
+def test_store_fetches_and_parses_once():
+    template = make_template()
+    calls = []
+    read_template = form_filler._read_template
+
+    def counting(url):
+        calls.append(url)
+        return template.data
+
+    form_filler._read_template = counting
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            store = form_filler.TemplateStore(directory, max_size=2, max_age=60)
+            first = store.get('/static/i-130.pdf')
+            assert store.get('/static/i-130.pdf') is first and len(calls) == 1
+
+            # Other workers read the normalized copy from disk
+            assert form_filler.TemplateStore(directory, 2, 60).get('/static/i-130.pdf').fields.keys() == \
+                first.fields.keys()
+            assert len(calls) == 1 and len(os.listdir(directory)) == 1
+
+            # An expired template is fetched again
+            expired = form_filler.TemplateStore(directory, 2, max_age=0)
+            expired.get('/static/i-130.pdf')
+            assert len(calls) == 2
+    finally:
+        form_filler._read_template = read_template
+
+
+def test_templates_on_internal_hosts_are_not_fetched():
+    connect = safe_fetch.socket.create_connection
+
+    def refuse(*args, **kwargs):
+        raise AssertionError('internal address was contacted')
+
+    safe_fetch.socket.create_connection = refuse
+    try:
+        for url in ('http://169.254.169.254/latest/meta-data/', 'http://localhost:5000/static/i-130.pdf'):
+            try:
+                form_filler._read_template(url)
+            except ValueError as e:
+                assert 'not a public address' in str(e)
+            else:
+                raise AssertionError(f'{url} should be rejected')
+    finally:
+        safe_fetch.socket.create_connection = connect
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
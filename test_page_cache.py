@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the anonymous marketing page cache
+"""
+import gzip
+from flask import Flask, session
+import branding
+import page_cache
+
+renders = []
+
+app = Flask(__name__)
+app.secret_key = 'test'
+
+
+@app.route('/page')
+@page_cache.cached_page
+def page():
+    renders.append(session.get('clerk_user_id'))
+    return f'<html>render {len(renders)}</html>'
+
+
+@app.route('/missing')
+@page_cache.cached_page
+def missing():
+    renders.append('missing')
+    return 'not found', 404
+
+
+def setup_function(function):
+    renders.clear()
+    page_cache.invalidate()
+
+
+def test_anonymous_pages_render_once():
+    client = app.test_client()
+    first = client.get('/page')
+    second = client.get('/page')
+    assert (first.headers['X-Page-Cache'], second.headers['X-Page-Cache']) == ('miss', 'hit')
+    assert second.data == first.data == b'<html>render 1</html>'
+    assert len(renders) == 1
+    assert 'public' in second.headers['Cache-Control']
+
+
+def test_gzip_variant_and_conditional_get():
+    client = app.test_client()
+    compressed = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == b'<html>render 1</html>'
+
+    plain = client.get('/page')
+    assert plain.get_etag()[0] != compressed.get_etag()[0]
+    assert client.get('/page', headers={'If-None-Match': plain.headers['ETag']}).status_code == 304
+    assert client.get('/page', headers={'Accept-Encoding': 'gzip',
+                                        'If-None-Match': compressed.headers['ETag']}).status_code == 304
+
+
+def test_logged_in_users_and_errors_bypass_the_cache():
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['clerk_user_id'] = 'user_1'
+    client.get('/page')
+    client.get('/page')
+    assert renders == ['user_1', 'user_1']
+
+    anonymous = app.test_client()
+    anonymous.get('/missing')
+    anonymous.get('/missing')
+    assert renders.count('missing') == 2
+
+
+def test_branding_edits_drop_cached_pages():
+    client = app.test_client()
+    client.get('/page')
+    branding.invalidate_all()
+    assert client.get('/page').data == b'<html>render 2</html>'
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            setup_function(test)
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for batch document generation
+"""
+import zipfile
+from io import BytesIO
+from concurrent.futures import Future
+from PyPDF2 import PdfReader
+import pdf_batch
+
+def finished(body=None, error=None):
+    future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(body)
+    return future
+
+
+ITEMS = [{
+    'form_title': 'Form I-130',
+    'checklist_items': ['Passport', 'Birth certificate'],
+    'user_name': name
+} for name in ('Ana Silva', 'Ben Okafor', None)]
+
+
+def test_pool_renders_in_input_order():
+    executor = pdf_batch.create_executor(2)
+    try:
+        documents = list(pdf_batch.render_all('checklist', ITEMS, executor))
+    finally:
+        executor.shutdown()
+    texts = [PdfReader(BytesIO(body)).pages[0].extract_text() for body in documents]
+    assert 'Ana Silva' in texts[0] and 'Ben Okafor' in texts[1]
+    assert 'Prepared for' not in texts[2]
+
+
+def test_combined_pdf_has_a_bookmark_per_document():
+    documents = [pdf_batch.render_item('checklist', item) for item in ITEMS]
+    reader = PdfReader(BytesIO(pdf_batch.combine(['Ana', 'Ben', 'Form I-130'], documents)))
+    assert len(reader.pages) == sum(len(PdfReader(BytesIO(body)).pages) for body in documents)
+    assert [item.title for item in reader.outline] == ['Ana', 'Ben', 'Form I-130']
+
+
+def test_zip_is_streamed_per_document():
+    documents = [pdf_batch.render_item('checklist', item) for item in ITEMS[:2]]
+    filenames = [pdf_batch.filename_for(1, 'Ana Silva / I-130'), pdf_batch.filename_for(2, '')]
+    assert filenames == ['001_Ana_Silva_I_130.pdf', '002_document.pdf']
+
+    chunks = list(pdf_batch.stream_zip(filenames, [finished(body) for body in documents]))
+    assert len(chunks) == 3  # One per document, then the central directory
+    archive = zipfile.ZipFile(BytesIO(b''.join(chunks)))
+    assert archive.namelist() == filenames
+    assert archive.read(filenames[1]) == documents[1]
+
+
+
+def test_failed_item_leaves_a_valid_zip():
+    body = pdf_batch.render_item('checklist', ITEMS[0])
+    filenames = [pdf_batch.filename_for(index, title) for index, title in enumerate(['Ana', 'Ben', 'Cy'], 1)]
+    renders = [finished(body), finished(error=TypeError('bad item')), finished(body)]
+
+    archive = zipfile.ZipFile(BytesIO(b''.join(pdf_batch.stream_zip(filenames, renders))))
+    assert archive.testzip() is None
+    assert archive.namelist() == ['001_Ana.pdf', '002_Ben_FAILED.txt', '003_Cy.pdf']
+    assert archive.read('002_Ben_FAILED.txt').decode() == pdf_batch.FAILED_NOTE
+    assert archive.read('003_Cy.pdf') == body
+
+
+def test_pool_failures_are_reported_per_item():
+    executor = pdf_batch.create_executor(2)
+    try:
+        items = [ITEMS[0], dict(ITEMS[1], checklist_items=None)]
+        renders = pdf_batch.submit_all('checklist', items, executor)
+        archive = zipfile.ZipFile(BytesIO(b''.join(pdf_batch.stream_zip(['a.pdf', 'b.pdf'], renders))))
+    finally:
+        executor.shutdown()
+    assert archive.namelist() == ['a.pdf', 'b_FAILED.txt']
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
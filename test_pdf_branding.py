@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for branded PDF profiles
+"""
+import os
+import re
+import tempfile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from PyPDF2 import PdfReader
+from config import Config
+from pdf_generator import ChecklistPDFGenerator, CoverLetterGenerator
+from pdf_styles import get_theme
+import pdf_branding
+import safe_fetch
+from test_safe_fetch import INTERNAL_URLS
+
+BRANDING = {
+    'site_name': 'Acme & Partners',
+    'logo_url': None,
+    'primary_color': '#123456',
+    'footer_text': 'Acme Immigration Law\nSuite <100>',
+    'show_powered_by': False,
+    'updated_at': '2026-01-01T00:00:00',
+}
+
+
+def pdf_text(generator, elements):
+    reader = PdfReader(BytesIO(generator.save_to_bytes(elements).getvalue()))
+    return reader, ''.join(page.extract_text() for page in reader.pages)
+
+
+def test_default_footer_is_unchanged():
+    profile = pdf_branding.profile_for_branding({'site_name': 'Ignored', 'updated_at': None})
+    assert profile is pdf_branding.default_profile() and profile.theme is get_theme()
+    assert profile.footer_lines('May 1, 2026') == ['Generated on May 1, 2026 | ImmigrationTemplates.com']
+
+
+def test_branded_footer_is_escaped():
+    profile = pdf_branding.profile_for_branding(BRANDING)
+    assert profile is pdf_branding.profile_for_branding(dict(BRANDING))
+    assert profile.theme is get_theme('#123456')
+    assert profile.footer_lines('May 1, 2026') == [
+        'Generated on May 1, 2026 | Acme &amp; Partners', 'Acme Immigration Law<br/>Suite &lt;100&gt;']
+
+    powered = pdf_branding.profile_for_branding(dict(BRANDING, show_powered_by=True))
+    assert powered.key != profile.key
+    assert powered.footer_lines('May 1, 2026')[-1] == 'Powered by ImmigrationTemplates.com'
+
+
+def test_logo_is_decoded_once_per_settings_version():
+    original = Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as static_root:
+        Config.PDF_LOGO_DIR = directory
+        pdf_branding.STATIC_ROOT = static_root
+        os.mkdir(os.path.join(static_root, 'uploads'))
+        try:
+            Image.new('RGBA', (1200, 300), (200, 20, 20, 128)).save(os.path.join(static_root, 'uploads', 'logo.png'))
+            url = '/static/uploads/logo.png'
+            profile = pdf_branding.profile_for_branding(dict(BRANDING, logo_url=url))
+            assert profile.logo is not None and os.path.dirname(profile.logo.path) == directory
+            assert profile.logo.width <= pdf_branding.LOGO_MAX_WIDTH
+            assert profile.logo.height <= pdf_branding.LOGO_MAX_HEIGHT
+            with Image.open(profile.logo.path) as normalized:
+                assert normalized.format == 'JPEG' and normalized.width <= 2.5 * pdf_branding.LOGO_DPI
+
+            # Same settings version: cached profile, no second decode
+            assert pdf_branding.profile_for_branding(dict(BRANDING, logo_url=url)) is profile
+
+            generator = ChecklistPDFGenerator(branding=profile)
+            reader, text = pdf_text(generator, generator.generate('I-130 Petition', [], 'Jane Doe'))
+            assert 'Acme &' in text and 'Suite <100>' in text and 'ImmigrationTemplates' not in text
+            resources = reader.pages[0]['/Resources']
+            assert any(x.get_object()['/Subtype'] == '/Image' for x in resources['/XObject'].values())
+
+            # An edit saved later gets a new profile
+            edited = dict(BRANDING, logo_url=url, updated_at='2026-02-01T00:00:00')
+            assert pdf_branding.profile_for_branding(edited) is not profile
+        finally:
+            Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT = original
+            pdf_branding.profiles.clear()
+
+
+def test_logo_is_embedded_from_the_cached_jpeg():
+    original = Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as static_root:
+        Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT = directory, static_root
+        Image.effect_noise((600, 150), 60).save(os.path.join(static_root, 'logo.png'))
+        try:
+            profile = pdf_branding.ProfileCache(1, 0).get('2026-01-01', '/static/logo.png', None, 'Acme', None, True)
+
+            def render(_):
+                generator = ChecklistPDFGenerator(branding=profile)
+                reader, _ = pdf_text(generator, generator.generate('I-130 Petition', ['Photo'], 'Jane Doe'))
+                page = reader.pages[0]
+                (name, image), = page['/Resources']['/XObject'].items()
+                return name, image.get_object(), page.get_contents().get_data()
+
+            # Documents rendered at once all embed the same logo
+            with ThreadPoolExecutor(4) as pool:
+                pages = list(pool.map(render, range(8)))
+        finally:
+            Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT = original
+
+    for name, image, content in pages:
+        assert image['/Filter'][-1] == '/DCTDecode' and image.get_data() == profile.logo.data
+        assert re.search(rb'172\.8 0 0 43\.2 0 0 cm\s+' + re.escape(name.encode()) + rb' Do', content)
+
+
+def test_unusable_logo_is_left_out():
+    for url in ('/static/../config.py', '/static/uploads/missing.png', 'ftp://example.com/logo.png'):
+        assert pdf_branding.load_logo(url) is None
+
+    profile = pdf_branding.profile_for_branding(dict(BRANDING, logo_url='/static/favicon.svg'))
+    assert profile.logo is None
+    generator = CoverLetterGenerator(branding=profile)
+    _, text = pdf_text(generator, generator.generate({'full_name': 'Ana Silva'}, {'title': 'N-400'}))
+    assert 'Acme Immigration Law' in text
+
+
+def test_failed_logo_is_retried_later():
+    original = Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as static_root:
+        Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT = directory, static_root
+        fields = ('2026-01-01T00:00:00', '/static/logo.png', '#123456', 'Acme', None, True)
+        try:
+            waiting = pdf_branding.ProfileCache(4, retry_interval=3600)
+            failed = waiting.get(*fields)
+            assert failed.logo is None and waiting.get(*fields) is failed
+
+            retrying = pdf_branding.ProfileCache(4, retry_interval=0)
+            assert retrying.get(*fields).logo is None
+            Image.new('RGB', (300, 100), 'red').save(os.path.join(static_root, 'logo.png'))
+            loaded = retrying.get(*fields)
+            assert loaded.logo is not None and loaded.key != failed.key
+            assert retrying.get(*fields) is loaded
+        finally:
+            Config.PDF_LOGO_DIR, pdf_branding.STATIC_ROOT = original
+
+
+def test_logo_urls_on_internal_hosts_are_not_fetched():
+    connect = safe_fetch.socket.create_connection
+
+    def refuse(*args, **kwargs):
+        raise AssertionError('internal address was contacted')
+
+    safe_fetch.socket.create_connection = refuse
+    try:
+        for url in INTERNAL_URLS:
+            assert pdf_branding.load_logo(url) is None
+    finally:
+        safe_fetch.socket.create_connection = connect
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the checklist PDF render cache
+"""
+import os
+import tempfile
+from io import BytesIO
+from datetime import datetime
+from types import SimpleNamespace
+from PyPDF2 import PdfReader
+import pdf_cache
+from pdf_styles import get_theme
+
+
+def make_form(updated_at=datetime(2024, 1, 1)):
+    return SimpleNamespace(id=7, title='Form I-130', updated_at=updated_at,
+                           get_checklist=lambda: ['Passport', 'Birth certificate'])
+
+
+def with_cache(test):
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            original = pdf_cache.cache
+            pdf_cache.cache = pdf_cache.RenderCache(directory, 8)
+            try:
+                test(directory)
+            finally:
+                pdf_cache.cache = original
+    run.__name__ = test.__name__
+    return run
+
+
+def count_renders():
+    calls = []
+    render = pdf_cache.render_checklist
+
+    def counting(*args):
+        calls.append(args)
+        return render(*args)
+    pdf_cache.render_checklist = counting
+    return calls, lambda: setattr(pdf_cache, 'render_checklist', render)
+
+
+def pdf_text(body):
+    return ''.join(page.extract_text() for page in PdfReader(BytesIO(body)).pages)
+
+
+@with_cache
+def test_repeat_downloads_render_once(directory):
+    calls, restore = count_renders()
+    try:
+        form = make_form()
+        first = pdf_cache.get_checklist_pdf(form, 'Jane Doe')
+        assert first.startswith(b'%PDF')
+        assert pdf_cache.get_checklist_pdf(form, 'Jane Doe') == first
+        assert len(calls) == 1
+
+        # Other workers read the shared directory instead of rendering
+        pdf_cache.cache.clear()
+        assert pdf_cache.get_checklist_pdf(form, 'Jane Doe') == first
+        assert len(calls) == 1
+    finally:
+        restore()
+
+
+@with_cache
+def test_names_are_written_into_one_cached_render(directory):
+    calls, restore = count_renders()
+    try:
+        form = make_form()
+        jane = pdf_cache.get_checklist_pdf(form, 'Jane Doe')
+        other = pdf_cache.get_checklist_pdf(form, '  José (Pepe) O\'Brien\\ ')
+        assert len(calls) == 1 and len(os.listdir(directory)) == 1
+        assert len(other) == len(jane)
+        assert 'Prepared for: Jane Doe' in pdf_text(jane)
+        assert "Prepared for: José (Pepe) O'Brien\\" in pdf_text(other)
+        assert 'Jane Doe' not in pdf_text(other) and 'PREPARED-FOR' not in pdf_text(other)
+
+        # Names that do not fit in place are rendered in full, and not cached
+        for name in ('Nguyễn Văn An', 'Jane ' * 40):
+            assert 'Prepared for' in pdf_text(pdf_cache.get_checklist_pdf(form, name))
+        assert len(calls) == 3 and len(os.listdir(directory)) == 1
+    finally:
+        restore()
+
+
+def test_key_covers_every_input():
+    form = make_form()
+    key = pdf_cache.checklist_key(form)
+    assert key == pdf_cache.checklist_key(make_form())
+    assert key != pdf_cache.checklist_key(make_form(datetime(2024, 1, 2)))
+    assert key != pdf_cache.checklist_key(form, name_slot=True)
+    assert key != pdf_cache.checklist_key(form, get_theme('#123456'))
+    assert key.startswith('checklist-7-')
+
+
+@with_cache
+def test_warm_replaces_old_renders(directory):
+    pdf_cache.get_checklist_pdf(make_form(), 'Jane Doe')
+    edited = make_form(datetime(2024, 2, 1))
+    pdf_cache.warm_checklist(edited)
+    assert sorted(os.listdir(directory)) == sorted(
+        [pdf_cache.checklist_key(edited), pdf_cache.checklist_key(edited, name_slot=True)])
+
+    calls, restore = count_renders()
+    try:
+        pdf_cache.get_checklist_pdf(edited, '  ')
+        pdf_cache.get_checklist_pdf(edited, 'Jane Doe')
+        assert calls == []
+    finally:
+        restore()
+
+
+def test_old_renders_are_pruned_from_disk():
+    with tempfile.TemporaryDirectory() as directory:
+        stale = os.path.join(directory, 'checklist-7-old.pdf')
+        with open(stale, 'wb') as f:
+            f.write(b'%PDF-1.4 old')
+        os.utime(stale, (0, 0))
+
+        cache = pdf_cache.RenderCache(directory, 4, max_age=60)
+        assert cache.get('checklist-7-old.pdf') is None
+        cache.set('checklist-7-new.pdf', b'%PDF-1.4 new')
+        assert os.listdir(directory) == ['checklist-7-new.pdf']
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed PDFs and signed download links
+"""
+import os
+import tempfile
+from flask import Flask, abort
+import pdf_cache
+import pdf_delivery
+
+app = Flask(__name__)
+app.secret_key = 'test'
+
+BODY = b'%PDF-1.4 test document'
+
+
+@app.route('/generate/<int:user_id>')
+def generate(user_id):
+    if pdf_delivery.wants_pdf():
+        return pdf_delivery.pdf_response(BODY, 'letter.pdf')
+    return {'download_url': pdf_delivery.issue_download_url(BODY, user_id, 'letter.pdf')}
+
+
+@app.route('/download/<token>')
+def download_generated_pdf(token):
+    download = pdf_delivery.read_download(token, 1)
+    if download is None:
+        abort(404)
+    return pdf_delivery.pdf_response(*download)
+
+
+def with_store(test):
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            original = pdf_delivery.store
+            pdf_delivery.store = pdf_cache.RenderCache(directory, 4, max_age=60)
+            try:
+                test(directory)
+            finally:
+                pdf_delivery.store = original
+    run.__name__ = test.__name__
+    return run
+
+
+@with_store
+def test_json_clients_get_a_signed_link(directory):
+    client = app.test_client()
+    response = client.get('/generate/1', headers={'Accept': 'application/json'})
+    url = response.json['download_url']
+    assert url.startswith('/download/')
+
+    # Served from the shared directory by any worker
+    pdf_delivery.store.clear()
+    download = client.get(url)
+    assert download.data == BODY
+    assert 'letter.pdf' in download.headers['Content-Disposition']
+
+    assert client.get(url[:-2] + 'xx').status_code == 404
+
+
+@with_store
+def test_links_are_bound_to_user_and_expire(directory):
+    client = app.test_client()
+    url = client.get('/generate/2').json['download_url']
+    assert client.get(url).status_code == 404  # Issued to user 2
+
+    url = client.get('/generate/1').json['download_url']
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (0, 0))
+    pdf_delivery.store.clear()
+    assert client.get(url).status_code == 404
+
+
+@with_store
+def test_pdf_clients_get_the_document_without_storing_it(directory):
+    response = app.test_client().get('/generate/1', headers={'Accept': 'application/pdf'})
+    assert response.mimetype == 'application/pdf'
+    assert response.data == BODY
+    assert os.listdir(directory) == []
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
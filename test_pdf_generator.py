@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for I-94 history page-by-page table layout and cached static paragraphs
+"""
+from io import BytesIO
+from itertools import accumulate
+from PyPDF2 import PdfReader
+from reportlab.platypus import Table, LongTable, Paragraph
+import pdf_generator
+from pdf_generator import I94HistoryGenerator, CoverLetterGenerator, PDFGenerator, PagedTable
+from pdf_styles import get_theme
+
+
+def test_measured_offsets_match_reportlab():
+    generator = I94HistoryGenerator()
+    style = generator.theme.tables['travel_history']
+    rows = [['2020-01-15', '2020-02-20', '1', 'JFK', 'B-2'], ['Line one\nline two', '', '', '', ''], [None, '', '', '', '']]
+    paged = PagedTable(generator.TABLE_HEADER, rows, generator.COL_WIDTHS, style)
+
+    table = Table([generator.TABLE_HEADER] + rows, colWidths=generator.COL_WIDTHS)
+    table.setStyle(style)
+    table.wrap(0, 0)
+    assert paged.offsets == list(accumulate(table._rowHeights))
+
+
+def test_every_page_gets_a_header_and_no_page_is_resplit():
+    splits = []
+    original = LongTable.split
+    LongTable.split = lambda self, *args: splits.append(self) or original(self, *args)
+    try:
+        generator = I94HistoryGenerator()
+        history = [{'entry_date': f'2020-01-{i % 28 + 1:02d}', 'i94_number': f'{i:011d}'} for i in range(400)]
+        pdf = generator.save_to_bytes(generator.generate({'full_name': 'Frequent Traveler'}, history)).getvalue()
+    finally:
+        LongTable.split = original
+
+    pages = [page.extract_text() for page in PdfReader(BytesIO(pdf)).pages]
+    table_pages = [text for text in pages if '2020-01-' in text]
+    assert len(table_pages) > 10
+    assert all(text.count('Entry Date') == 1 for text in table_pages)
+    assert sum(text.count('2020-01-') for text in pages) == 400
+    assert splits == []
+
+
+def page_streams(generator, *inputs):
+    body = generator.save_to_bytes(generator.generate(*inputs)).getvalue()
+    return [page.get_contents().get_data() for page in PdfReader(BytesIO(body)).pages]
+
+
+def test_static_paragraphs_draw_like_plain_paragraphs():
+    inputs = ({'full_name': 'Jane Doe', 'email': 'jane@example.com'}, {'title': 'Form I-130 for my husband'})
+    pdf_generator.fragments.clear()
+    cold = page_streams(CoverLetterGenerator(), *inputs)
+    warm = page_streams(CoverLetterGenerator(), *inputs)
+
+    static = PDFGenerator._static
+    PDFGenerator._static = lambda self, text, style_name='Normal': Paragraph(text, self.styles[style_name])
+    try:
+        plain = page_streams(CoverLetterGenerator(), *inputs)
+    finally:
+        PDFGenerator._static = static
+    assert cold == warm == plain
+
+
+def test_fragments_are_laid_out_once_per_theme():
+    pdf_generator.fragments.clear()
+    for color in ('#667eea', '#667eea', '#123456'):
+        generator = I94HistoryGenerator(get_theme(color))
+        generator.save_to_bytes(generator.generate({'full_name': 'Jane Doe'}, []))
+    entries = pdf_generator.fragments._entries
+    notes = [key for key in entries if key[1] == "• Report any discrepancies to CBP immediately"]
+    assert len(notes) == 2 and notes[0][0] is not notes[1][0]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
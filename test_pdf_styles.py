@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared PDF style registry
+"""
+from pdf_generator import ChecklistPDFGenerator, I94HistoryGenerator
+from pdf_styles import get_theme, theme_for_branding, DEFAULT_PRIMARY_COLOR
+
+
+def test_generators_share_one_theme():
+    first, second = ChecklistPDFGenerator(), I94HistoryGenerator()
+    assert first.styles is second.styles
+    assert first.theme is get_theme()
+    assert first.theme.primary_color == DEFAULT_PRIMARY_COLOR
+
+
+def test_styles_are_read_only():
+    styles = get_theme().styles
+    assert 'CustomTitle' in styles and 'Normal' in styles
+    assert not hasattr(styles, 'add')
+
+
+def test_branded_themes_are_cached_per_color():
+    branded = theme_for_branding({'primary_color': '#1A2B3C'})
+    assert branded is get_theme('#1a2b3c')
+    assert branded is not get_theme()
+    assert theme_for_branding({'primary_color': 'red;'}) is get_theme()
+    assert theme_for_branding(None) is get_theme()
+
+
+def test_branded_pdf_renders():
+    generator = ChecklistPDFGenerator(get_theme('#123456'))
+    pdf = generator.save_to_bytes(generator.generate('Form I-130', ['Passport'], 'Jane Doe')).getvalue()
+    assert pdf.startswith(b'%PDF')
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
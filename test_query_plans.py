@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Query plan regression tests for the hot lookups
+
+Seeds a database with realistic row counts, runs EXPLAIN on the query shapes
+used by the route modules and fails if any of them falls back to a
+sequential scan.
+
+Runs against in-memory SQLite by default. Point QUERY_PLAN_DATABASE_URL at a
+scratch PostgreSQL database to check the production planner:
+    QUERY_PLAN_DATABASE_URL=postgresql://localhost/plan_check python -m pytest test_query_plans.py
+"""
+import os
+from datetime import datetime, timedelta
+from flask import Flask
+from models import db, User, Subscription, OneTimePurchase
+from team_models import Team, TeamMembership, TeamInvitation
+from document_models import PassportApplication, FileCompressionJob
+
+DATABASE_URL = os.getenv('QUERY_PLAN_DATABASE_URL', 'sqlite://')
+SEED_USERS = 400
+
+HOT_TABLES = [
+    'users', 'subscriptions', 'one_time_purchases', 'team_memberships',
+    'team_invitations', 'passport_applications', 'file_compression_jobs',
+]
+
+
+def create_plan_app():
+    """Minimal app bound to the plan-check database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(session):
+    """Insert enough rows that the planner has a real choice to make"""
+    now = datetime.utcnow()
+    users = []
+    for i in range(SEED_USERS):
+        users.append(User(
+            clerk_user_id=f'plan_user_{i}',
+            email=f'plan_user_{i}@example.com',
+            subscription_tier=['free', 'complete', 'agency'][i % 3],
+            subscription_status='active',
+            stripe_subscription_id=f'sub_{i}'
+        ))
+    session.add_all(users)
+    session.flush()
+
+    for i, user in enumerate(users):
+        team = Team(name=f'Team {i}', owner_id=user.id)
+        session.add(team)
+        session.flush()
+        session.add(TeamMembership(team_id=team.id, user_id=user.id, role='owner', status='active'))
+        for n in range(3):
+            session.add(TeamInvitation(
+                team_id=team.id, email=f'invite_{i}_{n}@example.com', token=f'tok_{i}_{n}',
+                status=['pending', 'accepted', 'expired'][n], invited_by_id=user.id
+            ))
+        for tool in ['passport', 'pdf_evidence_pack', 'travel_history']:
+            session.add(OneTimePurchase(
+                user_id=user.id, tool_type=tool, price_paid=12.0,
+                status='completed' if i % 2 else 'pending', purchased_at=now - timedelta(days=i)
+            ))
+        for n in range(2):
+            session.add(Subscription(
+                user_id=user.id, tier='agency', status='active',
+                stripe_subscription_id=f'sub_{i}', started_at=now - timedelta(days=n * 30)
+            ))
+        for n in range(3):
+            session.add(PassportApplication(
+                user_id=user.id, full_name=f'Applicant {i}', date_of_birth=now.date(),
+                email=user.email, created_at=now - timedelta(days=n)
+            ))
+        for n in range(10):
+            session.add(FileCompressionJob(
+                user_id=user.id, original_filename=f'evidence_{n}.pdf',
+                status=['completed', 'pending', 'failed'][n % 3],
+                compression_tier='free', created_at=now - timedelta(days=n * 7)
+            ))
+    session.commit()
+    session.execute(db.text('ANALYZE'))
+    session.commit()
+
+
+def hot_queries():
+    """Query shapes copied from the route modules, keyed by where they run"""
+    user_id = SEED_USERS // 2
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'file_compressor: lifetime usage count': FileCompressionJob.query.filter(
+            FileCompressionJob.user_id == user_id,
+            FileCompressionJob.status == 'completed'
+        ).with_entities(db.func.count()),
+        'file_compressor: monthly free usage count': FileCompressionJob.query.filter(
+            FileCompressionJob.user_id == user_id,
+            FileCompressionJob.created_at >= month_start,
+            FileCompressionJob.compression_tier == 'free'
+        ).with_entities(db.func.count()),
+        'file_compressor: job list': FileCompressionJob.query.filter_by(user_id=user_id).order_by(
+            FileCompressionJob.created_at.desc()
+        ).limit(50),
+        'passport/document routes: standalone purchase check': OneTimePurchase.query.filter_by(
+            user_id=user_id, tool_type='passport', status='completed'
+        ).limit(1),
+        'app: purchased tools': OneTimePurchase.query.filter_by(user_id=user_id, status='completed'),
+        'app: pending purchase for webhook': OneTimePurchase.query.filter_by(
+            user_id=user_id, tool_type='travel_history', status='pending'
+        ).order_by(OneTimePurchase.purchased_at.desc()).limit(1),
+        'app: branding team membership': TeamMembership.query.filter_by(
+            user_id=user_id, status='active'
+        ).limit(1),
+        'team_routes: pending invitations': TeamInvitation.query.filter_by(team_id=user_id, status='pending'),
+        'app: subscription webhook user': User.query.filter_by(stripe_subscription_id=f'sub_{user_id}').limit(1),
+        'passport_routes: application list': PassportApplication.query.filter_by(user_id=user_id).order_by(
+            PassportApplication.created_at.desc()
+        ),
+        'app: subscription history record': Subscription.query.filter_by(
+            stripe_subscription_id=f'sub_{user_id}'
+        ).order_by(Subscription.started_at.desc()).limit(1),
+    }
+
+
+def explain(query):
+    """Return the plan for a query as a list of text lines"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+
+    with db.engine.connect() as conn:
+        if db.engine.dialect.name == 'sqlite':
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+            return [row[-1] for row in rows]
+        rows = conn.exec_driver_sql(f'EXPLAIN {compiled}', params).fetchall()
+        return [row[0] for row in rows]
+
+
+def sequential_scans(plan):
+    """Plan lines that read a hot table without an index"""
+    scans = []
+    for line in plan:
+        for table in HOT_TABLES:
+            if line.startswith(f'SCAN {table}') or f'Seq Scan on {table}' in line:
+                scans.append(line.strip())
+    return scans
+
+
+def setup_module(module):
+    module.app = create_plan_app()
+    module.ctx = module.app.app_context()
+    module.ctx.push()
+    db.drop_all()
+    db.create_all()
+    seed(db.session)
+
+
+def teardown_module(module):
+    db.session.remove()
+    db.drop_all()
+    module.ctx.pop()
+
+
+def test_hot_queries_use_indexes():
+    failures = {}
+    for name, query in hot_queries().items():
+        scans = sequential_scans(explain(query))
+        if scans:
+            failures[name] = scans
+
+    assert not failures, f"Sequential scans on hot lookups: {failures}"
+
+
+if __name__ == '__main__':
+    import sys
+    module = sys.modules[__name__]
+    setup_module(module)
+    try:
+        failed = False
+        for name, query in hot_queries().items():
+            plan = explain(query)
+            scans = sequential_scans(plan)
+            failed = failed or bool(scans)
+            print(f"{'❌' if scans else '✓'} {name}")
+            for line in plan:
+                print(f"    {line}")
+    finally:
+        teardown_module(module)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for background render jobs and request coalescing
+"""
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from flask import Flask
+from config import Config
+from models import db
+from document_models import RenderJob
+import pdf_cache
+import pdf_delivery
+import render_jobs
+
+app = None
+release = threading.Event()
+
+
+def slow_render(inputs):
+    release.wait(5)
+    if inputs.get('fail'):
+        raise ValueError('bad inputs')
+    return b'%PDF-1.4 ' + inputs['text'].encode()
+
+
+def setup_module(module):
+    global app
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    # A file database: in-memory SQLite shares one connection across the pool threads
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tempfile.mkdtemp()}/render_jobs.db"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.add_url_rule('/jobs/<job_id>', 'get_render_job', lambda job_id: '')
+    app.add_url_rule('/download/<token>', 'download_generated_pdf', lambda token: '')
+    render_jobs.RENDERERS['test'] = slow_render
+    pdf_delivery.store = pdf_cache.RenderCache(tempfile.mkdtemp(), 8, max_age=60)
+    with app.app_context():
+        db.create_all()
+
+
+def teardown_module(module):
+    render_jobs.RENDERERS.pop('test', None)
+
+
+def wait_for(job_id):
+    """Wait for the pool to finish a job and return its fresh row"""
+    for _ in range(200):
+        with app.app_context():
+            job = db.session.get(RenderJob, job_id)
+            if job.status not in render_jobs.ACTIVE_STATUSES:
+                return job
+        threading.Event().wait(0.02)
+    raise AssertionError('job did not finish')
+
+
+def test_inputs_hash_ignores_key_order():
+    assert render_jobs.inputs_hash('test', {'a': 1, 'b': [1, 2]}) == render_jobs.inputs_hash('test', {'b': [1, 2], 'a': 1})
+    assert render_jobs.inputs_hash('test', {'a': 1}) != render_jobs.inputs_hash('other', {'a': 1})
+
+
+def test_identical_requests_share_one_job():
+    release.clear()
+    with app.test_request_context():
+        first = render_jobs.submit('test', 1, {'text': 'hello'}, 'a.pdf')
+        again = render_jobs.submit('test', 1, {'text': 'hello'}, 'b.pdf')
+        other_user = render_jobs.submit('test', 2, {'text': 'hello'}, 'a.pdf')
+        first_id, other_id = first.id, other_user.id
+        assert again.id == first_id
+        assert other_id != first_id
+    release.set()
+
+    job = wait_for(first_id)
+    wait_for(other_id)
+    assert job.status == render_jobs.COMPLETED
+    assert pdf_delivery.store.get(job.output_key) == b'%PDF-1.4 hello'
+    with app.test_request_context():
+        assert 'download_url' in render_jobs.job_status(job)
+        # Finished jobs are not reused
+        assert render_jobs.submit('test', 1, {'text': 'hello'}, 'a.pdf').id != first_id
+
+
+def test_failures_are_recorded():
+    release.set()
+    with app.test_request_context():
+        job_id = render_jobs.submit('test', 1, {'fail': True}, 'a.pdf').id
+    job = wait_for(job_id)
+    assert job.status == render_jobs.FAILED
+    assert job.error == 'PDF generation failed'
+    with app.test_request_context():
+        assert 'download_url' not in render_jobs.job_status(job)
+
+
+def test_saved_links_serve_the_stored_output():
+    release.set()
+    with app.test_request_context():
+        assert render_jobs.stored_output(3, 'test', {'text': 'saved'}) is None
+        job_id = render_jobs.submit('test', 3, {'text': 'saved'}, 'a.pdf').id
+    job = wait_for(job_id)
+    with app.app_context():
+        assert render_jobs.stored_output(3, 'test', {'text': 'saved'}) == b'%PDF-1.4 saved'
+        assert render_jobs.stored_output(4, 'test', {'text': 'saved'}) is None
+
+        # Expired from the delivery store: the caller queues a new job
+        pdf_delivery.store.purge(job.output_key)
+        assert render_jobs.stored_output(3, 'test', {'text': 'saved'}) is None
+
+
+def test_lost_jobs_are_failed_when_polled():
+    with app.test_request_context():
+        started = datetime.utcnow() - timedelta(seconds=Config.RENDER_JOB_TIMEOUT + 1)
+        lost = RenderJob(id='lost', user_id=1, job_type='test', inputs_hash='x', status=render_jobs.PROCESSING,
+                         created_at=started)
+        recent = RenderJob(id='recent', user_id=1, job_type='test', inputs_hash='y', status=render_jobs.PENDING)
+        db.session.add_all([lost, recent])
+        db.session.commit()
+
+        status = render_jobs.job_status(lost)
+        assert status['status'] == render_jobs.FAILED and status['error'] == 'PDF generation timed out'
+        assert render_jobs.job_status(recent)['status'] == render_jobs.PENDING
+
+
+def test_errors_before_rendering_fail_the_job():
+    with app.test_request_context():
+        db.session.add(RenderJob(id='early', user_id=1, job_type='test', inputs_hash='z', status=render_jobs.PENDING))
+        db.session.commit()
+
+    class FailingClock:
+        """datetime whose first utcnow() (marking the job started) raises"""
+        calls = 0
+
+        @classmethod
+        def utcnow(cls):
+            cls.calls += 1
+            if cls.calls == 1:
+                raise RuntimeError('database went away')
+            return datetime.utcnow()
+
+    render_jobs.datetime = FailingClock
+    try:
+        render_jobs._run(app, 'early', ('early',), {'text': 'never rendered'})
+    finally:
+        render_jobs.datetime = datetime
+    job = wait_for('early')
+    assert job.status == render_jobs.FAILED and job.error == 'PDF generation failed' and job.output_key is None
+
+
+if __name__ == '__main__':
+    setup_module(None)
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
+    teardown_module(None)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for fetching user-supplied URLs
+"""
+import os
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import safe_fetch
+
+INTERNAL_URLS = ('http://127.0.0.1/logo.png', 'http://169.254.169.254/latest/meta-data/', 'https://10.0.0.8/a.png',
+                 'http://[::1]:8080/logo.png', 'http://[::ffff:192.168.0.1]/logo.png', 'http://0.0.0.0/logo.png',
+                 'http://localhost/logo.png')
+
+
+def read(url, static_root='/nonexistent', max_bytes=1000):
+    return safe_fetch.read_source(url, static_root, max_bytes, 5, 'test')
+
+
+def rejects(url, message, **kwargs):
+    try:
+        read(url, **kwargs)
+    except ValueError as e:
+        assert message in str(e), str(e)
+    else:
+        raise AssertionError(f'{url} should be rejected')
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', 'http://169.254.169.254/latest/meta-data/')
+            self.end_headers()
+            return
+        body = b'x' * int(self.path.strip('/'))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_internal_hosts_are_never_contacted():
+    connect = safe_fetch.socket.create_connection
+
+    def refuse(*args, **kwargs):
+        raise AssertionError('internal address was contacted')
+
+    safe_fetch.socket.create_connection = refuse
+    try:
+        for url in INTERNAL_URLS:
+            rejects(url, 'not a public address')
+    finally:
+        safe_fetch.socket.create_connection = connect
+
+
+def test_redirects_are_checked_and_size_is_limited():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    public_address = safe_fetch.public_address
+    # A stand-in public host that resolves to the local test server
+    safe_fetch.public_address = lambda host, port: '127.0.0.1' if host == 'files.test' else public_address(host, port)
+    try:
+        base = f'http://files.test:{server.server_port}'
+        assert read(f'{base}/1000') == b'x' * 1000
+        rejects(f'{base}/1001', 'larger than 1000 bytes')
+        rejects(f'{base}/redirect', 'not a public address')
+    finally:
+        safe_fetch.public_address = public_address
+        server.shutdown()
+        server.server_close()
+
+
+def test_static_paths_stay_under_the_static_root():
+    with tempfile.TemporaryDirectory() as static_root:
+        with open(os.path.join(static_root, 'logo.png'), 'wb') as f:
+            f.write(b'png')
+        assert read('/static/logo.png', static_root) == b'png'
+        rejects('/static/../config.py', 'outside static/', static_root=static_root)
+        rejects('/static/logo.png', 'larger than 2 bytes', static_root=static_root, max_bytes=2)
+        rejects('ftp://example.com/logo.png', 'unsupported URL', static_root=static_root)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the full-text search index (SQLite FTS5 backend)
+"""
+from flask import Flask
+from models import db, ImmigrationForm, FormTemplate
+import catalog
+import search
+
+app = None
+
+
+def setup_module(module):
+    global app
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        forms = [
+            ('Form I-130 - Petition for Alien Relative', 'Establish a family relationship',
+             ['Marriage certificate', 'Proof of citizenship']),
+            ('Form I-131 - Application for Travel Document', 'Advance parole and reentry permits',
+             ['Two passport photos']),
+            ('Form N-400 - Application for Naturalization', 'Become a U.S. citizen',
+             ['Green card copy']),
+        ]
+        for title, description, checklist in forms:
+            form = ImmigrationForm(title=title, category='Test', description=description, access_level='free')
+            form.set_checklist(checklist)
+            db.session.add(form)
+        db.session.add(FormTemplate(title='Client Intake Questionnaire', category='Intake',
+                                    description='Family petition intake', access_level='free'))
+        db.session.commit()
+        catalog.invalidate()
+        catalog.templates.invalidate()
+        search.index.invalidate()
+
+
+def teardown_module(module):
+    with app.app_context():
+        db.drop_all()
+
+
+def test_query_terms_and_prefix_syntax():
+    assert search.query_terms('Form I-130!') == ['form', 'i', '130']
+    assert search.query_terms('  ') == []
+    with app.app_context():
+        assert search.build_query(['i', '13']) == '"i" "13"*'
+
+
+def test_title_matches_rank_first():
+    with app.app_context():
+        results = search.search('i-130')
+        assert (results[0]['type'], results[0]['form_number']) in {('form', 'I-130'), ('guide', 'I-130')}
+        assert {r['type'] for r in results[:2]} == {'form', 'guide'}
+
+
+def test_checklists_guides_and_templates_are_indexed():
+    with app.app_context():
+        assert [r['form_number'] for r in search.search('passport photos', doc_types=['form'])] == ['I-131']
+        # I-130 guide text mentions the I-94 record; no form does
+        assert [r['type'] for r in search.search('arrival departure record')] == ['guide']
+        assert [r['title'] for r in search.search('intake')] == ['Client Intake Questionnaire']
+        assert [r['type'] for r in search.search('petition', doc_types=['template'])] == ['template']
+
+
+def test_last_term_is_a_prefix():
+    with app.app_context():
+        assert [r['form_number'] for r in search.search('natur', doc_types=['form'])] == ['N-400']
+        assert search.search('naturalization xyz') == []
+
+
+def test_index_follows_catalog_changes():
+    with app.app_context():
+        form = ImmigrationForm(title='Form I-90 - Replace Permanent Resident Card', category='Test',
+                               description='Renew a green card', access_level='free')
+        db.session.add(form)
+        db.session.commit()
+        catalog.invalidate()
+
+        assert [r['form_number'] for r in search.search('replace permanent')] == ['I-90']
+
+        db.session.delete(form)
+        db.session.commit()
+        catalog.invalidate()
+        assert search.search('replace permanent') == []
+
+
+if __name__ == '__main__':
+    setup_module(None)
+    try:
+        for name, test in list(globals().items()):
+            if name.startswith('test_'):
+                test()
+                print(f"✓ {name}")
+    finally:
+        teardown_module(None)
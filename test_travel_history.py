@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the CBP travel history importer and physical presence calculator
+"""
+import time
+from datetime import date, timedelta
+from io import BytesIO
+from PyPDF2 import PdfReader
+import travel_history
+from pdf_generator import I94HistoryGenerator
+
+AS_OF = date(2026, 1, 1)
+
+# CBP lists the newest travel first
+CBP_CSV = """Date,Type,Location
+2025-09-10,Arrival,JFK
+2025-01-05,Departure,JFK
+2023-06-01,Arrival,SFO
+2023-05-01,Departure,SFO
+2015-03-01,Arrival,ORD
+"""
+
+CBP_HTML = """<html><body><table>
+<tr><th>Date</th><th>Type</th><th>Location</th></tr>
+<tr><td>2023-06-01</td><td>Arrival</td><td>San Francisco &amp; Bay</td></tr>
+<tr><td>2023-05-01</td><td>Departure</td><td>SFO</td></tr>
+</table></body></html>"""
+
+STAYS_TSV = """Entry Date\tDeparture Date\tI-94 Number\tPort of Entry\tStatus
+03/01/2015\t05/01/2023\t11111111111\tORD\tH1B
+06/01/2023\t\t22222222222\tSFO\tLPR
+"""
+
+
+def test_csv_events_pair_into_stays():
+    records, summary = travel_history.import_history(CBP_CSV.splitlines(), AS_OF)
+    assert [(r['entry_date'], r['departure_date']) for r in records] == [
+        ('2015-03-01', '2023-05-01'), ('2023-06-01', '2025-01-05'), ('2025-09-10', '')]
+    assert records[1]['port_of_entry'] == 'SFO'
+
+    # 30 days abroad in 2023, 247 in 2025 (departure and return days count as present)
+    assert summary['days_abroad'] == 30 + 247
+    assert summary['days_present'] == (AS_OF - date(2021, 1, 1)).days - 277
+    assert summary['meets_physical_presence']
+    assert [trip['days_abroad'] for trip in summary['trips_over_6_months']] == [247]
+    assert not summary['trips_over_1_year'] and not summary['meets_continuous_residence']
+
+
+def test_html_and_tsv_exports():
+    events = travel_history.sort_events(travel_history.parse_events(CBP_HTML.splitlines(keepends=True)))
+    assert [(e.date, e.kind, e.port) for e in events] == [
+        (date(2023, 5, 1), 'departure', 'SFO'), (date(2023, 6, 1), 'arrival', 'San Francisco & Bay')]
+
+    records, summary = travel_history.import_history(STAYS_TSV.splitlines(), AS_OF)
+    assert records[0]['i94_number'] == '11111111111' and records[1]['status'] == 'LPR'
+    assert summary['days_abroad'] == 30
+
+
+def test_year_long_trip_restarts_continuous_residence():
+    records = [
+        {'entry_date': '2015-01-01', 'departure_date': '2021-02-01'},
+        {'entry_date': '2022-04-01', 'departure_date': ''},
+    ]
+    summary = travel_history.summarize_records(records, AS_OF, years=3)
+    assert summary['period_start'] == '2023-01-01' and summary['days_abroad'] == 0
+
+    summary = travel_history.summarize_records(records, AS_OF)
+    assert summary['days_abroad'] == 423
+    assert summary['continuous_residence_since'] == '2022-04-01'
+    assert summary['meets_physical_presence'] and not summary['meets_continuous_residence']
+
+
+def test_records_starting_with_an_arrival_cover_only_later_days():
+    records, summary = travel_history.import_history(['2024-06-01,Arrival,JFK'], date(2026, 10, 1))
+    assert summary['covered_from'] == '2024-06-01' and not summary['window_covered']
+    assert summary['days_uncovered'] == (date(2024, 6, 1) - date(2021, 10, 1)).days
+    assert summary['days_abroad'] == 0 and summary['days_present'] == (date(2026, 10, 1) - date(2024, 6, 1)).days
+    assert not summary['meets_physical_presence'] and not summary['meets_continuous_residence']
+    assert summary['continuous_residence_since'] == '2024-06-01'
+
+    generator = I94HistoryGenerator()
+    body = generator.save_to_bytes(generator.generate({'full_name': 'Ana Silva'}, records, summary)).getvalue()
+    text = ''.join(page.extract_text() for page in PdfReader(BytesIO(body)).pages)
+    assert 'Not determined' in text and 'Met' not in text.replace('Not met', '')
+
+    # No records: nothing is known about the period
+    summary = travel_history.summarize_records([], AS_OF)
+    assert summary['days_present'] == 0 and not summary['meets_physical_presence']
+
+
+def test_html_rows_split_across_chunks():
+    rows = ''.join(f'<tr><td>2020-01-{day:02d}</td><td>Arrival</td><td>JFK</td></tr>\n' for day in range(1, 29))
+    text = '<table>' + rows + '</table>'
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert len(list(travel_history._html_rows(chunks))) == 28
+
+
+def test_window_queries_clip_trips():
+    events = [travel_history.Event(day, kind, '', '', '') for day, kind in (
+        (date(2020, 12, 1), 'departure'), (date(2021, 1, 11), 'arrival'),
+        (date(2025, 12, 20), 'departure'))]
+    intervals = travel_history.TravelIntervals(events, AS_OF)
+    assert intervals.open_trip
+    assert intervals.days_abroad(date(2021, 1, 1), AS_OF) == 10 + 11
+    assert intervals.days_abroad(date(2021, 1, 5), date(2021, 1, 8)) == 3
+
+
+def test_decades_of_records_summarize_quickly():
+    events, day = [], date(1990, 1, 1)
+    while day < AS_OF:
+        events.append(travel_history.Event(day, 'departure', '', '', ''))
+        events.append(travel_history.Event(day + timedelta(days=3), 'arrival', '', '', ''))
+        day += timedelta(days=5)
+    started = time.perf_counter()
+    summary = travel_history.summarize(events, AS_OF)
+    assert time.perf_counter() - started < 0.5
+
+    # Same count, one day at a time
+    start = date(2021, 1, 1)
+    abroad = {event.date + timedelta(days=offset) for event in events if event.kind == 'departure'
+              for offset in (1, 2)}
+    assert summary['days_abroad'] == sum(1 for day in abroad if start <= day < AS_OF)
+
+
+def test_pdf_includes_summary():
+    records, summary = travel_history.import_history(CBP_CSV.splitlines(), AS_OF)
+    generator = I94HistoryGenerator()
+    body = generator.save_to_bytes(generator.generate({'full_name': 'Ana Silva'}, records, summary)).getvalue()
+    text = ''.join(page.extract_text() for page in PdfReader(BytesIO(body)).pages)
+    assert 'PHYSICAL PRESENCE SUMMARY' in text and '2025-01-05 to 2025-09-10 (247 days)' in text
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
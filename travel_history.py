@@ -0,0 +1,368 @@
+"""
+CBP travel history import and N-400 physical presence calculations
+
+parse_events() reads a CBP "Get Travel History" export one row at a time.
+It accepts CSV, tab-separated text copied from the results table, or the
+saved HTML page, so uploads are never loaded whole. Rows become Events
+(date, arrival/departure, port). Exports that already list stays (entry and
+departure date columns) are read as an arrival plus a departure.
+
+TravelIntervals turns the events into trips abroad. A departure followed by
+the next arrival is a trip, and the days strictly between them count as
+days outside the U.S. (USCIS counts the departure and return days as days
+present). The trips are merged into sorted, non-overlapping day intervals
+with prefix sums. Days abroad in any window is then two bisects, and a
+summary for decades of records takes well under a millisecond after the
+O(n log n) sort.
+
+Records only cover the time after the first event. Before a leading
+arrival the person may have been abroad, so summarize() reports those days
+as uncovered rather than present, and gives no physical presence or
+continuous residence verdict unless the records cover the whole period.
+
+summarize() produces the N-400 figures included in the I-94 history PDF:
+- days outside the U.S. and days present in the statutory period (5 years,
+  or 3 for spouses of U.S. citizens), against the 913/548 days required;
+- trips longer than 6 months, which presume a break in continuous residence;
+- trips of a year or more, which break it, and the date residence restarted.
+"""
+import re
+import csv
+import html
+from functools import lru_cache
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import accumulate
+
+ARRIVAL = 'arrival'
+DEPARTURE = 'departure'
+
+# Physical presence required in the statutory period, by period length in years
+REQUIRED_PRESENCE_DAYS = {5: 913, 3: 548}
+LONG_TRIP_DAYS = 180        # Longer trips presume a break in continuous residence
+BREAKING_TRIP_DAYS = 365    # Trips of a year or more break continuous residence
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y/%m/%d', '%B %d, %Y', '%b %d, %Y', '%d %b %Y', '%d-%b-%Y')
+
+KIND_WORDS = {
+    'arrival': ARRIVAL, 'arrived': ARRIVAL, 'a': ARRIVAL, 'entry': ARRIVAL, 'in': ARRIVAL,
+    'departure': DEPARTURE, 'departed': DEPARTURE, 'd': DEPARTURE, 'exit': DEPARTURE, 'out': DEPARTURE,
+}
+
+# Header cell -> column role (matched after lowercasing and dropping punctuation)
+HEADER_ROLES = {
+    'date': 'date', 'travel date': 'date',
+    'type': 'kind', 'arrivaldeparture': 'kind', 'arrival departure': 'kind', 'direction': 'kind',
+    'location': 'port', 'port': 'port', 'port of entry': 'port', 'port of entry exit': 'port',
+    'entry date': 'entry_date', 'arrival date': 'entry_date', 'date of entry': 'entry_date',
+    'departure date': 'departure_date', 'exit date': 'departure_date', 'date of departure': 'departure_date',
+    'i94 number': 'i94_number', 'admission i94 record number': 'i94_number', 'admission number': 'i94_number',
+    'status': 'status', 'class of admission': 'status',
+}
+
+HTML_ROW_RE = re.compile(r'<tr\b.*?</tr\s*>', re.IGNORECASE | re.DOTALL)
+HTML_ROW_START_RE = re.compile(r'<tr\b', re.IGNORECASE)
+HTML_CELL_RE = re.compile(r'<t[dh]\b[^>]*>(.*?)</t[dh]\s*>', re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r'<[^>]+>')
+HEADER_CLEAN_RE = re.compile(r'[^a-z0-9 ]+')
+
+Event = namedtuple('Event', ['date', 'kind', 'port', 'i94_number', 'status'])
+Trip = namedtuple('Trip', ['departed', 'returned', 'days_abroad'])
+
+
+def parse_date(text):
+    """Date from the formats CBP and browsers produce, or None"""
+    if not isinstance(text, str):
+        return None
+    text = text.strip()
+    return _parse_date(text) if text else None
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(text):
+    # Exports repeat the same few thousand dates, so strptime runs once per date
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _html_rows(chunks):
+    """Cell lists of each <tr> in HTML text, read chunk by chunk"""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        end = 0
+        for match in HTML_ROW_RE.finditer(buffer):
+            yield [html.unescape(TAG_RE.sub('', cell)).strip() for cell in HTML_CELL_RE.findall(match.group(0))]
+            end = match.end()
+        # Keep only the unfinished row, so each chunk is scanned once
+        start = HTML_ROW_START_RE.search(buffer, end)
+        buffer = buffer[start.start():] if start else buffer[max(end, len(buffer) - 3):]
+
+
+def iter_rows(lines):
+    """Cell lists from CSV, tab-separated or HTML table text, one row at a time"""
+    lines = iter(lines)
+    first = ''
+    for line in lines:
+        if line.strip():
+            first = line
+            break
+    if not first:
+        return
+
+    def remaining():
+        yield first
+        yield from lines
+
+    if re.search(r'<(table|tr|html|!doctype)\b', first, re.IGNORECASE) or first.lstrip().startswith('<'):
+        yield from _html_rows(remaining())
+    elif '\t' in first:
+        for line in remaining():
+            if line.strip():
+                yield [cell.strip() for cell in line.rstrip('\r\n').split('\t')]
+    else:
+        for row in csv.reader(remaining()):
+            if any(cell.strip() for cell in row):
+                yield [cell.strip() for cell in row]
+
+
+def _header_roles(row):
+    roles = {}
+    for index, cell in enumerate(row):
+        key = HEADER_CLEAN_RE.sub('', cell.lower().replace('/', ' ').replace('-', '')).strip()
+        key = ' '.join(key.split())
+        role = HEADER_ROLES.get(key) or HEADER_ROLES.get(key.replace(' ', ''))
+        if role and role not in roles:
+            roles[role] = index
+    if 'date' in roles or 'entry_date' in roles:
+        return roles
+    return None
+
+
+def _guess_event(row):
+    """Event from a row without a header: the first date and an arrival/departure word"""
+    event_date = kind = None
+    port = ''
+    for cell in row:
+        if event_date is None and (parsed := parse_date(cell)):
+            event_date = parsed
+        elif kind is None and cell.lower() in KIND_WORDS:
+            kind = KIND_WORDS[cell.lower()]
+        elif event_date is not None and kind is not None and not port:
+            port = cell
+    if event_date and kind:
+        return Event(event_date, kind, port, '', '')
+    return None
+
+
+def parse_events(lines):
+    """Yield travel Events from a CBP history export (an iterable of text lines)"""
+    roles = None
+    for row in iter_rows(lines):
+        if roles is None:
+            roles = _header_roles(row)
+            if roles is not None:
+                continue
+            event = _guess_event(row)
+            if event:
+                yield event
+            continue
+
+        def cell(role):
+            index = roles.get(role)
+            return row[index] if index is not None and index < len(row) else ''
+
+        if 'entry_date' in roles:
+            # One row per stay
+            details = (cell('port'), cell('i94_number'), cell('status'))
+            entered, departed = parse_date(cell('entry_date')), parse_date(cell('departure_date'))
+            if entered:
+                yield Event(entered, ARRIVAL, *details)
+            if departed:
+                yield Event(departed, DEPARTURE, *details)
+        else:
+            event_date = parse_date(cell('date'))
+            kind = KIND_WORDS.get(cell('kind').lower())
+            if event_date and kind:
+                yield Event(event_date, kind, cell('port'), cell('i94_number'), cell('status'))
+
+
+def events_from_records(records):
+    """Events from travel_history records as sent by the I-94 history form"""
+    for record in records:
+        details = (record.get('port_of_entry', ''), record.get('i94_number', ''), record.get('status', ''))
+        entered, departed = parse_date(record.get('entry_date')), parse_date(record.get('departure_date'))
+        if entered:
+            yield Event(entered, ARRIVAL, *details)
+        if departed:
+            yield Event(departed, DEPARTURE, *details)
+
+
+def sort_events(events):
+    """Events in chronological order (same-day events keep their export order)"""
+    events = list(events)
+    # CBP lists the newest travel first
+    if len(events) > 1 and events[0].date > events[-1].date:
+        events.reverse()
+    events.sort(key=lambda event: event.date)
+    return events
+
+
+def to_records(events):
+    """travel_history records (one per stay in the U.S.) for I94HistoryGenerator"""
+    records = []
+    stay = None
+    for event in events:
+        if event.kind == ARRIVAL:
+            if stay is not None:
+                records.append(stay)
+            stay = {'entry_date': event.date.isoformat(), 'departure_date': '', 'i94_number': event.i94_number,
+                    'port_of_entry': event.port, 'status': event.status}
+        elif stay is not None:
+            stay['departure_date'] = event.date.isoformat()
+            records.append(stay)
+            stay = None
+        else:
+            # Departure from a stay that started before the export
+            records.append({'entry_date': '', 'departure_date': event.date.isoformat(), 'i94_number': event.i94_number,
+                            'port_of_entry': event.port, 'status': event.status})
+    if stay is not None:
+        records.append(stay)
+    return records
+
+
+def _trip(departed, returned):
+    return Trip(departed, returned, max(0, (returned - departed).days - 1))
+
+
+class TravelIntervals:
+    """Days abroad from sorted events, answering window queries with bisects"""
+
+    def __init__(self, events, as_of=None):
+        self.as_of = as_of or date.today()
+        self.trips = []
+        # Records say nothing about the days before a leading arrival (or about any
+        # day, without records); a leading departure means the person was here before
+        self.covered_from = self.as_of
+        departed = None
+        for index, event in enumerate(events):
+            if event.date > self.as_of:
+                break
+            if not index:
+                self.covered_from = event.date if event.kind == ARRIVAL else date.min
+            if event.kind == DEPARTURE:
+                # Two departures in a row: the missing arrival is unknown, keep the later one
+                departed = event.date
+            elif departed is not None:
+                self.trips.append(_trip(departed, event.date))
+                departed = None
+        # Still abroad: count up to (not including) as_of
+        if departed is not None:
+            self.trips.append(_trip(departed, self.as_of))
+        self.open_trip = departed is not None
+
+        # Merged half-open day intervals [start, end) of days abroad, as ordinals
+        starts, ends = [], []
+        for trip in self.trips:
+            if not trip.days_abroad:
+                continue
+            start = trip.departed.toordinal() + 1
+            end = start + trip.days_abroad
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._starts = starts
+        self._ends = ends
+        self._before = [0] + list(accumulate(end - start for start, end in zip(starts, ends)))
+
+    def days_abroad(self, start, end):
+        """Days outside the U.S. from start up to (not including) end"""
+        lo, hi = start.toordinal(), end.toordinal()
+        if hi <= lo:
+            return 0
+        first = bisect_right(self._ends, lo)
+        last = bisect_left(self._starts, hi)
+        if first >= last:
+            return 0
+        total = self._before[last] - self._before[first]
+        # Clip the intervals that stick out of the window
+        total -= max(0, lo - self._starts[first])
+        total -= max(0, self._ends[last - 1] - hi)
+        return total
+
+    def trips_between(self, start, end, min_days=0):
+        """Trips with more than min_days abroad that overlap [start, end)"""
+        return [trip for trip in self.trips
+                if trip.days_abroad > min_days and trip.returned > start and trip.departed < end]
+
+
+def years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:  # Feb 29
+        return day.replace(year=day.year - years, day=28)
+
+
+def summarize(events, as_of=None, years=5):
+    """N-400 physical presence and continuous residence summary (JSON-friendly)"""
+    try:
+        years = int(years)
+    except (TypeError, ValueError):
+        years = 5
+    if years not in REQUIRED_PRESENCE_DAYS:
+        years = 5
+    intervals = TravelIntervals(events, as_of)
+    as_of = intervals.as_of
+    window_start = years_before(as_of, years)
+    window_days = (as_of - window_start).days
+    days_abroad = intervals.days_abroad(window_start, as_of)
+    # Days before the records start are not counted as present
+    covered_from = max(window_start, min(intervals.covered_from, as_of))
+    days_uncovered = (covered_from - window_start).days
+    window_covered = not days_uncovered
+    required = REQUIRED_PRESENCE_DAYS[years]
+
+    def trip_dict(trip):
+        return {'departed': trip.departed.isoformat(), 'returned': trip.returned.isoformat(),
+                'days_abroad': trip.days_abroad}
+
+    long_trips = intervals.trips_between(window_start, as_of, LONG_TRIP_DAYS)
+    breaking_trips = [trip for trip in long_trips if trip.days_abroad >= BREAKING_TRIP_DAYS]
+    residence_since = breaking_trips[-1].returned if breaking_trips else covered_from
+
+    return {
+        'as_of': as_of.isoformat(),
+        'period_years': years,
+        'period_start': window_start.isoformat(),
+        'covered_from': covered_from.isoformat(),
+        'days_uncovered': days_uncovered,
+        'window_covered': window_covered,
+        'days_abroad': days_abroad,
+        'days_present': window_days - days_uncovered - days_abroad,
+        'required_days_present': required,
+        'meets_physical_presence': window_covered and window_days - days_abroad >= required,
+        'trips': len(intervals.trips_between(window_start, as_of)),
+        'currently_abroad': intervals.open_trip,
+        'trips_over_6_months': [trip_dict(trip) for trip in long_trips],
+        'trips_over_1_year': [trip_dict(trip) for trip in breaking_trips],
+        'continuous_residence_since': residence_since.isoformat(),
+        'meets_continuous_residence': window_covered and not long_trips,
+    }
+
+
+def import_history(lines, as_of=None, years=5):
+    """(travel_history records, summary) from a CBP history export"""
+    events = sort_events(parse_events(lines))
+    return to_records(events), summarize(events, as_of, years)
+
+
+def summarize_records(records, as_of=None, years=5):
+    """Summary for travel_history records entered in the I-94 history form"""
+    return summarize(sort_events(events_from_records(records)), as_of, years)